@@ -0,0 +1,405 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Local stand-in for the MailStore Server and SPE HTTPS APIs
+
+Implements POST /api/invoke/<Method>, /api/get-status and
+/api/cancel-async with HTTP/1.1 keep-alive and Basic authentication, and
+returns generated data in the JSON format of the MailStore APIs. Latency,
+response sizes and the behavior of long running tasks are configurable:
+
+   $ python benchmarks/mockserver.py --port 8463 --latency 0.002 --messages 100000
+
+Long running methods (TASK_METHODS) return a status token and take
+taskDuration seconds; their statusVersion advances every progressInterval
+seconds. get-status waits up to millisecondsTimeout for the version to
+advance beyond lastKnownStatusVersion, like the real servers.
+
+Responses of at least COMPRESS_MIN_SIZE bytes are compressed with gzip,
+deflate or, if the brotli package is installed, br when the client
+accepts it (--no-compression turns this off). --bandwidth limits the rate
+at which responses are sent, to simulate slow links to remote hosts.
+
+The bundled certificate localhost.pem (key localhost-key.pem) is
+self-signed for localhost and 127.0.0.1; clients trust it with
+caFile=CERT_FILE.
+"""
+
+import argparse
+import base64
+import datetime
+import gzip
+import http.server
+import itertools
+import json
+import os
+import socket
+import ssl
+import sys
+import threading
+import time
+import urllib.parse
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+CERT_FILE = os.path.join(DIRECTORY, "localhost.pem")
+KEY_FILE = os.path.join(DIRECTORY, "localhost-key.pem")
+
+# Methods which are run as long running tasks
+TASK_METHODS = {"CompactMasterDatabase", "CompactStore", "DeleteEmptyFolders",
+                "MaintainFileSystemDatabases", "MergeStore", "RebuildSelectedStoreIndexes",
+                "RebuildStoreIndex", "RefreshAllStoreStatistics", "RunProfile",
+                "RunTemporaryProfile", "SyncUsersWithDirectoryServices", "UpgradeStore",
+                "VerifyStore"}
+
+# Smallest response body which is compressed
+COMPRESS_MIN_SIZE = 1024
+
+# Content coding -> function compressing a body, in order of preference
+COMPRESSORS = {"gzip": lambda body, level: gzip.compress(body, level, mtime=0),
+               "deflate": lambda body, level: zlib.compress(body, level)}
+if brotli is not None:
+    COMPRESSORS = dict(br=lambda body, level: brotli.compress(body, quality=min(level, 11)), **COMPRESSORS)
+
+# Bytes written at once when the bandwidth is limited
+WRITE_SIZE = 16384
+
+
+def contentCoding(acceptEncoding):
+    """Return the preferred content coding accepted by acceptEncoding, or None."""
+    accepted = set()
+    for item in (acceptEncoding or "").split(","):
+        name, _, parameters = item.partition(";")
+        quality = parameters.strip()
+        try:
+            if quality.startswith("q=") and float(quality[2:]) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(name.strip().lower())
+    return next((coding for coding in COMPRESSORS if coding in accepted), None)
+
+
+class Task():
+    """A simulated long running task."""
+    def __init__(self, token, method, arguments, duration, progressInterval):
+        self.token = token
+        self.method = method
+        self.arguments = arguments
+        self.startTime = time.monotonic()
+        self.duration = duration
+        self.progressInterval = progressInterval
+        self.cancelled = False
+
+    def finished(self, now):
+        return self.cancelled or now - self.startTime >= self.duration
+
+    def statusVersion(self, now):
+        elapsed = min(now - self.startTime, self.duration)
+        return 1 + int(elapsed / self.progressInterval) + (1 if self.finished(now) else 0)
+
+    def nextChange(self, lastKnownVersion):
+        """Return the time at which the status version exceeds lastKnownVersion."""
+        return min(self.startTime + lastKnownVersion * self.progressInterval,
+                   self.startTime + self.duration)
+
+    def status(self, now):
+        values = {"error": None,
+                  "token": self.token,
+                  "statusVersion": self.statusVersion(now),
+                  "statusCode": "running",
+                  "percentProgress": min(100, int(100 * (now - self.startTime) / self.duration)) if self.duration else 100,
+                  "statusText": None,
+                  "result": None,
+                  "logOutput": None}
+        if self.cancelled:
+            values.update(statusCode="cancelled")
+        elif self.finished(now):
+            values.update(statusCode="succeeded", percentProgress=100,
+                          result={"method": self.method, "arguments": self.arguments})
+        return values
+
+
+class RequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def sendBody(self, status, body, contentType="application/json; charset=utf-8"):
+        """Send the response with a single write, unless the bandwidth is limited."""
+        server = self.server
+        head = ["HTTP/1.1 {} {}".format(status, self.responses[status][0]),
+                "Content-Type: " + contentType]
+        coding = contentCoding(self.headers.get("Accept-Encoding")) if server.compression else None
+        if coding is not None and len(body) >= COMPRESS_MIN_SIZE:
+            body = COMPRESSORS[coding](body, server.compressionLevel)
+            head += ["Content-Encoding: " + coding, "Vary: Accept-Encoding"]
+        head.append("Content-Length: {}".format(len(body)))
+        self.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+    def write(self, data):
+        bandwidth = self.server.bandwidth
+        if not bandwidth:
+            self.wfile.write(data)
+            return
+        for offset in range(0, len(data), WRITE_SIZE):
+            piece = data[offset:offset + WRITE_SIZE]
+            time.sleep(len(piece) / bandwidth)
+            self.wfile.write(piece)
+
+    def sendJSON(self, values):
+        self.sendBody(200, json.dumps(values).encode("utf-8-sig"))
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        arguments = dict(urllib.parse.parse_qsl(self.rfile.read(length).decode("utf-8")))
+        server.countRequest()
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if self.headers.get("Authorization") != server.authorization:
+            self.sendBody(401, b"")
+            return
+
+        # Empty path segments are ignored, the clients request
+        # e.g. /api//get-status
+        parts = [part for part in self.path.split("/") if part]
+        if len(parts) == 3 and parts[:2] == ["api", "invoke"]:
+            self.sendJSON(server.invoke(parts[2], arguments))
+        elif parts == ["api", "get-status"]:
+            self.sendJSON(server.getStatus(arguments))
+        elif parts == ["api", "cancel-async"]:
+            self.sendJSON(server.cancelAsync(arguments))
+        else:
+            self.sendBody(404, b"")
+
+
+class MockServer(http.server.ThreadingHTTPServer):
+    """Mock MailStore API server.
+
+    latency:           Seconds every request is delayed.
+    messages:          Number of messages returned by GetMessages.
+    subjectSize:       Length of the generated message subjects.
+    folders:           Number of folders (GetChildFolders, GetFolderStatistics).
+    workerResults:     Number of profile executions per day. GetWorkerResults
+                       returns those started within the requested range,
+                       with IDs counting from 2020-01-01.
+    taskDuration:      Seconds a long running task takes; 0 finishes tasks
+                       immediately without returning a token.
+    progressInterval:  Seconds between status version changes of a task.
+    compression:       Compress responses if the client accepts it.
+    compressionLevel:  Level of gzip and deflate, quality of br.
+    bandwidth:         Bytes per second at which responses are sent, 0 for
+                       no limit.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, host="127.0.0.1", port=0, username="admin", password="admin",
+                 latency=0.0, messages=100, subjectSize=40, folders=20, workerResults=100,
+                 taskDuration=1.0, progressInterval=0.25, compression=True, compressionLevel=6,
+                 bandwidth=0, certFile=CERT_FILE, keyFile=KEY_FILE, verbose=False):
+        super().__init__((host, port), RequestHandler)
+        self.sslContext = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        self.sslContext.load_cert_chain(certFile, keyFile)
+        credentials = "{}:{}".format(username, password).encode()
+        self.authorization = "Basic " + base64.b64encode(credentials).decode("ascii")
+
+        self.latency = latency
+        self.messages = messages
+        self.subjectSize = subjectSize
+        self.folders = folders
+        self.workerResults = workerResults
+        self.taskDuration = taskDuration
+        self.progressInterval = progressInterval
+        self.compression = compression
+        self.compressionLevel = compressionLevel
+        self.bandwidth = bandwidth
+        self.verbose = verbose
+
+        self.lock = threading.Lock()
+        self.tokens = itertools.count(1)
+        self.tasks = {}
+        self.requests = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def finish_request(self, request, client_address):
+        # The TLS handshake is done in the connection's own thread
+        try:
+            request = self.sslContext.wrap_socket(request, server_side=True)
+        except (ssl.SSLError, OSError):
+            return
+        super().finish_request(request, client_address)
+
+    def start(self):
+        """Serve in a daemon thread and return the server."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def countRequest(self):
+        with self.lock:
+            self.requests += 1
+
+    # ---------------------------------------------------------------- #
+    # API methods                                                      #
+    # ---------------------------------------------------------------- #
+
+    def response(self, result):
+        return {"error": None, "token": None, "statusVersion": 2, "statusCode": "succeeded",
+                "percentProgress": None, "statusText": None, "result": result, "logOutput": None}
+
+    def invoke(self, method, arguments):
+        if method in TASK_METHODS and self.taskDuration > 0:
+            with self.lock:
+                token = "mock{}".format(next(self.tokens))
+                task = self.tasks[token] = Task(token, method, arguments, self.taskDuration, self.progressInterval)
+            return task.status(time.monotonic())
+        generator = getattr(self, "result" + method, None)
+        if generator is None:
+            return self.response({"method": method, "arguments": arguments})
+        return self.response(generator(arguments))
+
+    def getStatus(self, arguments):
+        task = self.tasks.get(arguments.get("token"))
+        if task is None:
+            return {"error": {"message": "Unknown token"}, "token": None, "statusVersion": 0,
+                    "statusCode": "failed", "result": None}
+        timeout = int(arguments.get("millisecondsTimeout") or 0) / 1000
+        lastKnownVersion = int(arguments.get("lastKnownStatusVersion") or 0)
+        now = time.monotonic()
+        if not task.finished(now) and task.statusVersion(now) <= lastKnownVersion:
+            time.sleep(max(0, min(task.nextChange(lastKnownVersion), now + timeout) - now))
+            now = time.monotonic()
+        status = task.status(now)
+        if status["statusCode"] != "running":
+            with self.lock:
+                self.tasks.pop(task.token, None)
+        return status
+
+    def cancelAsync(self, arguments):
+        task = self.tasks.get(arguments.get("token"))
+        if task is not None:
+            task.cancelled = True
+        return self.response(None)
+
+    def resultGetStores(self, arguments):
+        return [{"id": i, "name": "Store {}".format(i), "requestedState": "current",
+                 "path": "C:\\MailArchive\\Store{}".format(i), "archiveSize": 1000000 * i}
+                for i in range(1, 6)]
+
+    def resultGetInstances(self, arguments):
+        return [{"instanceID": "instance{}".format(i), "instanceHost": "host{}".format(i % 3),
+                 "status": "running"} for i in range(10)]
+
+    def resultGetMessages(self, arguments):
+        folder = arguments.get("folder", "")
+        padding = "x" * max(0, self.subjectSize - 20)
+        return [{"id": "{}:{}".format(1 + i // 10000, i), "folder": folder,
+                 "subject": "Message {} {}".format(i, padding), "from": "sender{}@example.com".format(i % 100),
+                 "date": "2024-01-01T00:00:00", "size": 1000 + i % 50000}
+                for i in range(self.messages)]
+
+    def resultGetChildFolders(self, arguments):
+        parent = arguments.get("folder")
+        if parent and parent.count("/") >= 2:
+            return []
+        names = ["user{}".format(i) for i in range(self.folders)] if not parent else ["Inbox", "Sent Items"]
+        return [{"folder": "{}/{}".format(parent, name) if parent else name, "name": name} for name in names]
+
+    def resultGetFolderStatistics(self, arguments):
+        return [{"folder": "user{}/Inbox/Folder {}".format(i % 10, i), "count": i, "size": 1000 * i}
+                for i in range(self.folders)]
+
+    def resultGetWorkerResults(self, arguments):
+        interval = 86400 / self.workerResults
+        start = (datetime.datetime.fromisoformat(arguments["fromIncluding"]) - WORKER_EPOCH).total_seconds()
+        end = (datetime.datetime.fromisoformat(arguments["toExcluding"]) - WORKER_EPOCH).total_seconds()
+        first = max(0, -int(-start // interval))
+        last = min(max(first, -int(-end // interval)), first + MAX_WORKER_RESULTS)
+        results = []
+        for i in range(first, last):
+            startTime = (WORKER_EPOCH + datetime.timedelta(seconds=i * interval)).strftime("%Y-%m-%dT%H:%M:%S")
+            results.append({"id": i, "profileID": i % 5, "profileName": "Profile {}".format(i % 5),
+                            "userName": "user{}".format(i % 10), "result": "failed" if i % 20 == 0 else "succeeded",
+                            "startTime": startTime, "completeTime": startTime, "itemsArchived": i % 1000,
+                            "itemsExported": 0})
+        return results
+
+
+WORKER_EPOCH = datetime.datetime(2020, 1, 1)
+
+# Upper limit of worker results in a single response
+MAX_WORKER_RESULTS = 1000000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mock MailStore API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--messages", type=int, default=100)
+    parser.add_argument("--subject-size", type=int, default=40)
+    parser.add_argument("--folders", type=int, default=20)
+    parser.add_argument("--worker-results", type=int, default=100)
+    parser.add_argument("--task-duration", type=float, default=1.0)
+    parser.add_argument("--progress-interval", type=float, default=0.25)
+    parser.add_argument("--no-compression", dest="compression", action="store_false")
+    parser.add_argument("--compression-level", type=int, default=6)
+    parser.add_argument("--bandwidth", type=float, default=0, help="bytes per second, 0 for no limit")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    server = MockServer(args.host, args.port, latency=args.latency, messages=args.messages,
+                        subjectSize=args.subject_size, folders=args.folders,
+                        workerResults=args.worker_results, taskDuration=args.task_duration,
+                        progressInterval=args.progress_interval, compression=args.compression,
+                        compressionLevel=args.compression_level, bandwidth=args.bandwidth,
+                        verbose=args.verbose)
+    # The benchmark runner reads the port from the first line
+    print("PORT {}".format(server.port), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Benchmarks of the API clients against the mock server
+
+   $ python benchmarks/run.py
+   $ python benchmarks/run.py --calls 5000 --threads 16 --latency 0.001 --json
+
+Each group of benchmarks starts benchmarks/mockserver.py in a child
+process, so client and server do not compete for the same interpreter, and
+runs it for mailstore.server and mailstore.spe:
+
+   calls     Calls per second and p50/p99 latency of GetStores, made
+             sequentially, from a thread pool and from asyncio tasks.
+   polling   Time spent beyond the task duration and get-status requests
+             needed for long running tasks (VerifyStore), with the fixed
+             waitTime and with AdaptivePolling.
+   memory    Peak memory allocated while fetching a large GetMessages
+             result, completely and streamed, and the time it took.
+   compression
+             Bytes received and time taken for large folder listings
+             (GetFolderStatistics, GetChildFolders) with uncompressed and
+             compressed responses, read completely and incrementally, over
+             a link limited to --bandwidth.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(DIRECTORY))
+
+import mailstore
+import mailstore.metrics
+import mailstore.polling
+import mockserver
+
+
+# Flavor -> (client class, asyncio client class, leading arguments of the
+# store and message methods)
+CLIENTS = {"server": (mailstore.server.Client, mailstore.server.AsyncClient, ()),
+           "spe": (mailstore.spe.Client, mailstore.spe.AsyncClient, ("instance1",))}
+
+
+class ServerProcess():
+    """Mock server running in a child process while used as context manager."""
+    def __init__(self, **options):
+        self.arguments = [sys.executable, os.path.join(DIRECTORY, "mockserver.py")]
+        for name, value in options.items():
+            self.arguments += ["--" + name.replace("_", "-"), str(value)]
+
+    def __enter__(self):
+        self.process = subprocess.Popen(self.arguments, stdout=subprocess.PIPE, text=True)
+        self.port = int(self.process.stdout.readline().split()[1])
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
+
+
+def newClient(clientClass, port, **kwargs):
+    return clientClass(host="127.0.0.1", port=port, caFile=mockserver.CERT_FILE, **kwargs)
+
+
+def percentile(values, q):
+    """Return the q-quantile of values using the nearest-rank method."""
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q * len(values) + 0.5)) - 1))]
+
+
+def summarize(latencies, elapsed):
+    return {"calls": len(latencies),
+            "callsPerSecond": round(len(latencies) / elapsed, 1),
+            "p50ms": round(percentile(latencies, 0.5) * 1000, 3),
+            "p99ms": round(percentile(latencies, 0.99) * 1000, 3)}
+
+
+def benchCalls(call, count, threads=1):
+    """Make count calls, from threads threads, and summarize their latency."""
+    def timedCall(index):
+        start = time.perf_counter()
+        call()
+        return time.perf_counter() - start
+
+    call()
+    start = time.perf_counter()
+    if threads == 1:
+        latencies = [timedCall(i) for i in range(count)]
+    else:
+        with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+            latencies = list(executor.map(timedCall, range(count)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def benchAsyncCalls(clientClass, port, arguments, count, concurrency):
+    """Make count calls with up to concurrency asyncio tasks at a time."""
+    async def run():
+        async with newClient(clientClass, port, poolSize=concurrency) as client:
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def timedCall():
+                async with semaphore:
+                    start = time.perf_counter()
+                    await client.GetStores(*arguments)
+                    return time.perf_counter() - start
+
+            await client.GetStores(*arguments)
+            start = time.perf_counter()
+            latencies = await asyncio.gather(*(timedCall() for i in range(count)))
+            return summarize(latencies, time.perf_counter() - start)
+    return asyncio.run(run())
+
+
+def benchPolling(client, arguments, taskDuration, tasks):
+    """Run tasks long running tasks one after another and report the mean
+    time beyond taskDuration and the get-status requests per task."""
+    metrics = mailstore.metrics.Metrics()
+    client.hooks.append(metrics)
+    overheads = []
+    for i in range(tasks):
+        start = time.perf_counter()
+        client.VerifyStore(*arguments, 1)
+        overheads.append(time.perf_counter() - start - taskDuration)
+    client.hooks.remove(metrics)
+    snapshot = metrics.snapshot()
+    return {"tasks": tasks,
+            "overheadMs": round(sum(overheads) / tasks * 1000, 1),
+            "pollsPerTask": snapshot["VerifyStore"]["polls"] / tasks,
+            "requestsPerTask": (snapshot["VerifyStore"]["calls"] + snapshot["get-status"]["calls"]) / tasks}
+
+
+def benchMemory(client, arguments, stream):
+    """Fetch all messages twice, once timed and once while tracing the
+    peak memory allocated."""
+    def fetch():
+        if stream:
+            return sum(1 for message in client.GetMessages(*arguments, "user1/Inbox", stream=True))
+        return len(client.GetMessages(*arguments, "user1/Inbox")["result"])
+
+    start = time.perf_counter()
+    count = fetch()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    fetch()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"messages": count, "peakMiB": round(peak / 2 ** 20, 1), "seconds": round(elapsed, 3)}
+
+
+def benchCompression(client, arguments, method, option=None, repeat=3):
+    """Fetch the result of method repeat times, completely or with the
+    stream or columnar option, and report the bytes received per call and
+    the fastest time."""
+    metrics = mailstore.metrics.Metrics()
+    client.hooks.append(metrics)
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        if option == "stream":
+            count = sum(1 for item in getattr(client, method)(*arguments, stream=True))
+        elif option == "columnar":
+            count = len(getattr(client, method)(*arguments, columnar=True))
+        else:
+            count = len(getattr(client, method)(*arguments)["result"])
+        times.append(time.perf_counter() - start)
+    client.hooks.remove(metrics)
+    return {"items": count,
+            "receivedMiB": round(metrics.snapshot()[method]["bytesReceived"] / repeat / 2 ** 20, 2),
+            "seconds": round(min(times), 3)}
+
+
+def runCalls(options, report):
+    with ServerProcess(latency=options.latency) as server:
+        for flavor, (clientClass, asyncClientClass, arguments) in CLIENTS.items():
+            with newClient(clientClass, server.port, poolSize=options.threads) as client:
+                call = lambda: client.GetStores(*arguments)
+                report(flavor, "calls", "sequential", benchCalls(call, options.calls))
+                report(flavor, "calls", "{} threads".format(options.threads),
+                       benchCalls(call, options.calls, options.threads))
+            report(flavor, "calls", "asyncio x{}".format(options.concurrency),
+                   benchAsyncCalls(asyncClientClass, server.port, arguments, options.calls, options.concurrency))
+
+
+def runPolling(options, report):
+    with ServerProcess(latency=options.latency, task_duration=options.task_duration,
+                       progress_interval=options.progress_interval) as server:
+        for flavor, (clientClass, asyncClientClass, arguments) in CLIENTS.items():
+            # The server answers status requests as soon as the status changes,
+            # so polls only differ for waits shorter than the progress interval
+            policies = {"fixed waitTime": None, "fixed 250ms": mailstore.polling.FixedPolling(250),
+                        "adaptive": mailstore.polling.AdaptivePolling()}
+            for name, policy in policies.items():
+                with newClient(clientClass, server.port, pollingPolicy=policy) as client:
+                    report(flavor, "polling", name, benchPolling(client, arguments, options.task_duration, options.tasks))
+
+
+def runMemory(options, report):
+    with ServerProcess(latency=options.latency, messages=options.messages) as server:
+        for flavor, (clientClass, asyncClientClass, arguments) in CLIENTS.items():
+            with newClient(clientClass, server.port) as client:
+                report(flavor, "memory", "complete", benchMemory(client, arguments, stream=False))
+                report(flavor, "memory", "streamed", benchMemory(client, arguments, stream=True))
+
+
+def runCompression(options, report):
+    with ServerProcess(latency=options.latency, folders=options.folders, bandwidth=options.bandwidth) as server:
+        for flavor, (clientClass, asyncClientClass, arguments) in CLIENTS.items():
+            for method, option in (("GetFolderStatistics", "columnar"), ("GetChildFolders", "stream")):
+                for compression in (False, True):
+                    with newClient(clientClass, server.port, compression=compression) as client:
+                        for variantOption in (None, option):
+                            variant = "{} {}{}".format(method[3:], "compressed" if compression else "identity",
+                                                       " " + variantOption if variantOption else "")
+                            report(flavor, "compression", variant,
+                                   benchCompression(client, arguments, method, variantOption))
+
+
+BENCHMARKS = {"calls": runCalls, "polling": runPolling, "memory": runMemory, "compression": runCompression}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the API clients against a mock server")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help="benchmarks to run, of {} (default: all)".format(", ".join(BENCHMARKS)))
+    parser.add_argument("--calls", type=int, default=2000, help="calls per throughput benchmark")
+    parser.add_argument("--threads", type=int, default=8, help="threads of the threaded benchmark")
+    parser.add_argument("--concurrency", type=int, default=32, help="tasks of the asyncio benchmark")
+    parser.add_argument("--latency", type=float, default=0.0, help="server latency in seconds")
+    parser.add_argument("--task-duration", type=float, default=2.0, help="duration of long running tasks")
+    parser.add_argument("--progress-interval", type=float, default=0.5, help="seconds between task status changes")
+    parser.add_argument("--tasks", type=int, default=3, help="long running tasks per polling benchmark")
+    parser.add_argument("--messages", type=int, default=200000, help="messages of the memory benchmark")
+    parser.add_argument("--folders", type=int, default=100000, help="folders of the compression benchmark")
+    parser.add_argument("--bandwidth", type=float, default=10e6, help="bytes per second of the compression benchmark")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    options = parser.parse_args(argv)
+    unknown = [name for name in options.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error("unknown benchmarks: {} (choose from {})".format(", ".join(unknown), ", ".join(BENCHMARKS)))
+
+    results = []
+
+    def report(flavor, benchmark, variant, values):
+        results.append(dict(client=flavor, benchmark=benchmark, variant=variant, **values))
+        if not options.json:
+            print("{:<7} {:<8} {:<16} {}".format(flavor, benchmark, variant,
+                                                  "  ".join("{}={}".format(key, value) for key, value in values.items())),
+                  flush=True)
+
+    for name in options.benchmarks or BENCHMARKS:
+        BENCHMARKS[name](options, report)
+
+    if options.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -35,7 +35,11 @@ and for MailStore Service Provider Edition (Managent API) use
 
    >>> api = mailstore.spe.Client(username, password, hostname)
 
-to initialize API client.
+to initialize API client. Both modules also provide an AsyncClient with the
+same methods as coroutines, for use with asyncio:
+
+   >>> api = mailstore.server.AsyncClient(username, password, hostname)
+   >>> stores = await api.GetStores()
 """
 
 import mailstore.server
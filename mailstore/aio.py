@@ -0,0 +1,453 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """asyncio support for the MailStore API clients"""
+
+import asyncio
+import contextlib
+import functools
+import http.client
+import inspect
+import io
+import ssl
+import mailstore.base
+import mailstore.batch
+import mailstore.chunked
+import mailstore.columnar
+import mailstore.methods
+import mailstore.pool
+import mailstore.ratelimit
+import mailstore.tls
+import mailstore.transport
+
+
+class AsyncResponse():
+    """Response of a request sent through an AsyncConnectionPool.
+
+    The body is read with the read() coroutine. Once it has been read
+    completely, the connection is handed back to its pool.
+    """
+    def __init__(self, pool, key, connection, status, reason, headers, willClose):
+        self.pool = pool
+        self.key = key
+        self.connection = connection
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.willClose = willClose
+
+        self.chunked = headers.get("Transfer-Encoding", "").lower() == "chunked"
+        self.chunkLeft = 0
+        length = headers.get("Content-Length")
+        self.length = int(length) if length is not None and not self.chunked else None
+        self.finished = self.length == 0
+
+    def isclosed(self):
+        return self.finished
+
+    async def read(self, amt=None):
+        if self.finished:
+            return b""
+        reader = self.connection.reader
+        if self.chunked:
+            data = await self.readChunked(reader, amt)
+        elif self.length is not None:
+            size = self.length if amt is None else min(amt, self.length)
+            data = await reader.readexactly(size)
+            self.length -= len(data)
+            self.finished = self.length == 0
+        else:
+            data = await (reader.read() if amt is None else reader.read(amt))
+            self.willClose = True
+            self.finished = not data or amt is None
+        if self.finished:
+            self.release()
+        return data
+
+    async def readChunked(self, reader, amt):
+        parts = []
+        while amt is None or amt > 0:
+            if not self.chunkLeft:
+                sizeLine = await reader.readline()
+                self.chunkLeft = int(sizeLine.split(b";", 1)[0], 16)
+                if not self.chunkLeft:
+                    # Skip trailers up to the final empty line
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    self.finished = True
+                    break
+            size = self.chunkLeft if amt is None else min(amt, self.chunkLeft)
+            parts.append(await reader.readexactly(size))
+            self.chunkLeft -= size
+            if amt is not None:
+                amt -= size
+            if not self.chunkLeft:
+                await reader.readline()
+        return b"".join(parts)
+
+    def release(self):
+        """Return the connection to the pool, or close it if it cannot be reused."""
+        if self.connection is None:
+            return
+        if self.willClose or not self.finished:
+            self.connection.close()
+        self.pool.releaseConnection(self.key, self.connection)
+        self.connection = None
+
+    def close(self):
+        self.release()
+
+
+class AsyncConnection():
+    """A single HTTP/1.1 connection based on asyncio streams."""
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.loop = asyncio.get_running_loop()
+
+    def isUsable(self):
+        return (not self.writer.is_closing() and not self.reader.at_eof()
+                and self.loop is asyncio.get_running_loop())
+
+    def close(self):
+        if not self.writer.is_closing():
+            self.writer.close()
+
+
+class AsyncConnectionPool(mailstore.pool.PoolMixin, mailstore.transport.AsyncTransport):
+    """asyncio counterpart of mailstore.pool.ConnectionPool, the default
+    transport of the asyncio clients.
+
+    Idle connections are kept as described in mailstore.pool.PoolMixin,
+    and a request is sent again on a fresh connection only if sending it
+    on a reused one failed. asyncio streams cannot resume TLS sessions, so
+    unlike ConnectionPool every new connection makes a full handshake.
+    """
+    async def newConnection(self, host, port):
+        """Open a new HTTPS connection to host:port."""
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=self.getSSLContext(), server_hostname=host),
+            self.timeout)
+        connection = AsyncConnection(reader, writer)
+        if self.thumbprint is not None:
+            try:
+                mailstore.tls.verifyThumbprint(writer.get_extra_info("ssl_object").getpeercert(binary_form=True), self.thumbprint)
+            except ssl.SSLError:
+                connection.close()
+                raise
+        return connection
+
+    @staticmethod
+    def isDropped(connection):
+        return not connection.isUsable()
+
+    def releaseConnection(self, key, connection):
+        """Put a connection back into the pool, or close it if the pool is full."""
+        if connection.writer.is_closing():
+            return
+        super().releaseConnection(key, connection)
+
+    def formatHeaders(self, headers):
+        """Join the headers into a block of header lines."""
+        return b"".join(b"%s: %s\r\n" % header for header in headers)
+
+    async def sendRequest(self, key, connection, path, body, headers):
+        connection.writer.write(b"".join((b"POST ", path.encode("latin-1"), b" HTTP/1.1\r\n",
+                                          self.encodeHeaders(key, headers),
+                                          b"Content-Length: %d\r\n\r\n" % len(body), body)))
+        await connection.writer.drain()
+
+    async def readResponse(self, key, connection):
+        statusLine = await connection.reader.readline()
+        if not statusLine:
+            raise http.client.RemoteDisconnected("Remote end closed connection without response")
+        version, status, reason = (statusLine.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""])[:3]
+
+        headerLines = []
+        while True:
+            line = await connection.reader.readline()
+            headerLines.append(line)
+            if line in (b"\r\n", b"\n", b""):
+                break
+        responseHeaders = http.client.parse_headers(io.BytesIO(b"".join(headerLines)))
+
+        willClose = (version == "HTTP/1.0"
+                     or responseHeaders.get("Connection", "").lower() == "close")
+        return AsyncResponse(self, key, connection, int(status), reason.strip(), responseHeaders, willClose)
+
+    async def request(self, host, port, path, body=b"", headers={}):
+        """Send a POST request to host:port and return an AsyncResponse."""
+        key = "{}:{}".format(host, port)
+
+        connection = self.getConnection(key)
+        if connection is not None:
+            try:
+                await asyncio.wait_for(self.sendRequest(key, connection, path, body, headers), self.timeout)
+            except OSError:
+                # The server closed the keep-alive connection before it
+                # received the whole request, send it on a new one. Errors
+                # after that are left to the caller (see mailstore.retry).
+                connection.close()
+                connection = None
+
+        try:
+            if connection is None:
+                connection = await self.newConnection(host, port)
+                await asyncio.wait_for(self.sendRequest(key, connection, path, body, headers), self.timeout)
+            return await asyncio.wait_for(self.readResponse(key, connection), self.timeout)
+        except BaseException:
+            if connection is not None:
+                connection.close()
+            raise
+
+
+def coroutineMethod(func):
+    """Wrap a client method, which returns an awaitable once _callMethod
+    is a coroutine function, into an 'async def' method."""
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        result = func(self, *args, **kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+    return wrapper
+
+
+class AsyncClientMixin():
+    """Turns an API client class into an asyncio client.
+
+    The methods doing I/O, such as _callMethod, _handleToken and
+    _iterResult, are replaced by coroutines which use an AsyncConnectionPool.
+    They share the protocol logic with the client class through its helper
+    methods (_beginCall, _finishCall, _checkResponse, ResultStream, ...).
+    Every public method inherited from the client class is exposed as an
+    'async def' method with the same signature.
+    Methods defined by the asyncio client class itself are left as they are:
+
+       >>> class AsyncClient(mailstore.aio.AsyncClientMixin, Client):
+       ...     pass
+       >>> stores = await AsyncClient(username, password, hostname).GetStores()
+    """
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Wrappers of the method table are generated as coroutines directly
+        if getattr(cls, "methodTable", None) is not None:
+            cls.methodTable.install(cls, asynchronous=True)
+        for name in dir(cls):
+            if isinstance(inspect.getattr_static(cls, name), mailstore.methods.Wrapper):
+                continue
+            func = getattr(cls, name)
+            if (name[:1].isupper() and name not in vars(cls) and inspect.isfunction(func)
+                    and not inspect.iscoroutinefunction(func)
+                    and not inspect.isasyncgenfunction(func)):
+                setattr(cls, name, coroutineMethod(func))
+
+    def _newTransport(self, poolSize, poolIdleTimeout, timeout):
+        """Create the default transport, an AsyncConnectionPool."""
+        return AsyncConnectionPool(maxSize=poolSize, idleTimeout=poolIdleTimeout, timeout=timeout,
+                                   sslContext=self.sslContext, thumbprint=self.thumbprint)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close all connections of the client's transport from within the
+        event loop they belong to."""
+        await self.transport.aclose()
+
+    async def _handleToken(self, jsonValues, waitTime=None, method=None, record=None):
+        """Coroutine version of BaseClient._handleToken, awaiting the result
+        of callbackStatus if it is awaitable."""
+
+        poller = self._newPoller(method, waitTime)
+
+        # Execute callback function for initial state
+        result = self._statusCallback(jsonValues, "first")
+        if inspect.isawaitable(result):
+            await result
+
+        while self._pollStatus(jsonValues, record):
+            jsonValues = await self.GetStatus(jsonValues, waitTime=poller.nextWaitTime(jsonValues))
+            self._logPayload("_handleToken:", jsonValues, method=method)
+
+            # Execute callback function for subsequent and final state
+            result = self._statusCallback(jsonValues, "refreshed")
+            if inspect.isawaitable(result):
+                await result
+
+        self.log.info("_handleToken: Task with token %s finished.", jsonValues["token"], extra={"method": method, "token": jsonValues["token"]})
+        return jsonValues
+
+    async def _sendRequest(self, path, url, data):
+        """Coroutine version of BaseClient._sendRequest."""
+
+        # Try making the HTTP request...
+        try:
+            response = await self.transport.request(self.host, self.port, path, body=data.encode(), headers=self.headers)
+            response = mailstore.transport.decodeAsyncResponse(response)
+        # ...and catch exceptions.
+        except Exception as e:
+            raise self._requestError(url, e)
+
+        return self._checkResponse(response, url, data)
+
+    async def _retry(self, method, function):
+        """Coroutine version of BaseClient._retry, function returns an awaitable."""
+        if self.retryPolicy is None:
+            return await function()
+        spec = self.methodTable.get(method)
+        return await self.retryPolicy.callAsync("{}:{}".format(self.host, self.port), method, function, self.log,
+                                                idempotent=spec.idempotent if spec is not None else None)
+
+    def _slot(self, method):
+        """Asynchronous context manager version of BaseClient._slot."""
+        if self.rateLimiter is None:
+            return contextlib.nullcontext(mailstore.ratelimit.Slot())
+        return self.rateLimiter.slotAsync("{}:{}".format(self.host, self.port), method)
+
+    async def _exchange(self, method, request, record):
+        """Coroutine version of BaseClient._exchange."""
+        async with self._slot(method) as slot:
+            response = await self._sendRequest(*request)
+            return self._receiveResponse(response, await response.read(), record, slot)
+
+    async def _send(self, method, request):
+        """Coroutine version of BaseClient._send."""
+        async with self._slot(method):
+            return await self._sendRequest(*request)
+
+    async def _callMethod(self, method, arguments = {}, mode = "invoke", autoHandleToken = None, stream = False, columnar = False, chunked = None):
+        """Coroutine version of BaseClient._callMethod."""
+
+        if stream:
+            return await self._streamMethod(method, arguments, mode)
+        if columnar:
+            builder = mailstore.columnar.ColumnBuilder()
+            async for record in await self._streamMethod(method, arguments, mode, convert=False):
+                builder.add(record)
+            return builder.build()
+
+        if chunked:
+            chunked = mailstore.chunked.ChunkedFetch() if chunked is True else chunked
+            return chunked.iterResultsAsync(self, method, arguments, mode)
+
+        autoHandleToken = autoHandleToken if autoHandleToken is not None else self.autoHandleToken
+
+        record = self._beforeCall(method, arguments)
+        try:
+            returnData = await self._performCall(method, arguments, mode, autoHandleToken, record)
+        except Exception as e:
+            self._afterCall(record, e)
+            raise
+        self._afterCall(record)
+        return returnData
+
+    async def _performCall(self, method, arguments, mode, autoHandleToken, record):
+        """Coroutine version of BaseClient._performCall."""
+
+        request, cachedValues = self._beginCall(method, arguments, mode, record)
+        if cachedValues is not None:
+            return cachedValues
+
+        try:
+            jsonValues = await self._retry(method, lambda: self._exchange(method, request, record))
+        finally:
+            self._invalidateCache(method, arguments)
+
+        if self._autoHandleToken(method, arguments, jsonValues, autoHandleToken):
+            jsonValues = await self._handleToken(jsonValues, method=method, record=record)
+
+        return self._finishCall(method, arguments, mode, request, jsonValues, record)
+
+    async def _streamMethod(self, method, arguments = {}, mode = "invoke", convert = True):
+        """Coroutine version of BaseClient._streamMethod, returning an
+        asynchronous generator over the result items:
+
+           >>> async for message in await api.GetMessages(folder, stream=True):
+           ...     print(message["subject"])
+        """
+        record = self._beforeCall(method, arguments)
+        try:
+            request = self._prepareRequest(method, arguments, mode)
+            if record is not None:
+                record.bytesSent = len(request[2])
+            response = await self._retry(method, lambda: self._send(method, request))
+        except Exception as e:
+            self._afterCall(record, e)
+            raise
+        results = self._iterResult(method, response, convert, record)
+        await results.__anext__()
+        return results
+
+    async def _iterResult(self, method, response, convert = True, record = None):
+        """Asynchronous generator version of BaseClient._iterResult."""
+        stream = mailstore.base.ResultStream(self, method, convert, record)
+        error = None
+        cancelled = False
+        try:
+            yield None
+            while response is not None:
+                stream.begin(response)
+                try:
+                    while True:
+                        chunk = await response.read(self.streamChunkSize)
+                        for item in stream.feed(chunk):
+                            yield item
+                        if not chunk:
+                            break
+                finally:
+                    response.close()
+
+                request = stream.nextRequest()
+                if request is None:
+                    for item in stream.finalItems():
+                        yield item
+                else:
+                    result = self._statusCallback(stream.parser.values, "refreshed")
+                    if inspect.isawaitable(result):
+                        await result
+                response = await self._retry("get-status", lambda: self._sendRequest(*request)) if request else None
+        except (GeneratorExit, asyncio.CancelledError):
+            cancelled = True
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if response is not None:
+                response.close()
+            self._afterCall(record, error, cancelled)
+
+        self.log.info("_iterResult: Finished streaming result of \"%s\"", method, extra={"method": method})
+
+    async def ExecuteBatch(self, calls, maxConcurrency=32, rateLimit=None):
+        """Run many API calls concurrently and return their results in order.
+
+        calls:           Iterable of (method, kwargs) pairs, e.g. ("GetUserInfo", {"userName": "jdoe"}).
+        maxConcurrency:  Number of calls running at the same time.
+        rateLimit:       (optional) Maximum number of calls started per second.
+        """
+        return await mailstore.batch.runBatchAsync(self, calls, maxConcurrency=maxConcurrency, rateLimit=rateLimit)
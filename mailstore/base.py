@@ -0,0 +1,660 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Common implementation of the MailStore API clients"""
+
+import urllib.error
+import base64
+import contextlib
+import json
+import logging
+import mailstore.batch
+import mailstore.cache
+import mailstore.chunked
+import mailstore.columnar
+import mailstore.errors
+import mailstore.jsonstream
+import mailstore.log
+import mailstore.metrics
+import mailstore.methods
+import mailstore.models
+import mailstore.polling
+import mailstore.pool
+import mailstore.ratelimit
+import mailstore.retry
+import mailstore.tls
+import mailstore.transport
+
+class ResultStream():
+    """State of a streamed result (see BaseClient._iterResult), shared by
+    the synchronous and the asyncio clients, which only read the responses
+    and send the status requests."""
+    def __init__(self, client, method, convert=True, record=None):
+        self.client = client
+        self.record = record
+        self.model = mailstore.models.MODELS.get(method) if client.resultModels and convert else None
+        self.poller = client._newPoller(method)
+
+    def begin(self, response):
+        """Start parsing response."""
+        self.response = response
+        self.parser = mailstore.jsonstream.ResultParser()
+        self.received = self.record.bytesReceived if self.record is not None else 0
+        self.size = 0
+
+    def feed(self, chunk):
+        """Parse the next chunk of the response, which is empty at its end,
+        and return the result items it completed."""
+        self.size += len(chunk)
+        if self.record is not None:
+            self.record.bytesReceived = self.received + mailstore.transport.receivedSize(self.response, self.size)
+        items = self.parser.feed(chunk, final=not chunk)
+        return map(self.model, items) if self.model else items
+
+    def nextRequest(self):
+        """Return the get-status request following up on the response, or
+        None if the task finished or the response had no status token."""
+        request = self.client._nextStatusRequest(self.parser.values, self.poller)
+        if request is not None and self.record is not None:
+            self.record.polls += 1
+        return request
+
+    def finalItems(self):
+        """Return a result which is not an array as a single item list."""
+        result = self.parser.values.get("result")
+        if result is None:
+            return []
+        return [self.model(result) if self.model else result]
+
+
+class BaseClient():
+    """Common base class of the API clients.
+
+    Subclasses set defaultPort and install the wrapped API methods of a
+    mailstore.methods.MethodTable, which all dispatch through _callMethod.
+    """
+
+    defaultPort = None
+
+    # Specs of the wrapped API methods, set by MethodTable.install
+    methodTable = mailstore.methods.MethodTable([])
+
+    # Number of bytes read at once when streaming responses
+    streamChunkSize = 65536
+
+    def __init__(self,
+                 username = "admin",
+                 password = "admin",
+                 host = "127.0.0.1",
+                 port = None,
+                 autoHandleToken = True,
+                 waitTime = 1000,
+                 callbackStatus = None,
+                 logLevel = 2,
+                 logPayloadSize = 4096,
+                 poolSize = 10,
+                 poolIdleTimeout = 60,
+                 timeout = None,
+                 transport = None,
+                 sslContext = None,
+                 caFile = None,
+                 thumbprint = None,
+                 cache = None,
+                 resultModels = False,
+                 pollingPolicy = None,
+                 hooks = None,
+                 retryPolicy = None,
+                 rateLimiter = None,
+                 compression = True):
+
+        # Initialize connection settings
+        self.username = username
+        self.password = password
+        self.host = host
+        self.port = port if port is not None else self.defaultPort
+  
+        # If set to true, client handles tokens/long running tasks itself.
+        self.autoHandleToken = autoHandleToken 
+
+        # Time in milliseconds the API should wait before returning a status token.
+        self.waitTime = waitTime               
+
+        # Optional policy choosing the wait time of each status request, like
+        # mailstore.polling.AdaptivePolling. If None, waitTime is always used.
+        self.pollingPolicy = pollingPolicy
+
+        # Instrumentation hooks notified before and after every API call,
+        # like mailstore.metrics.Metrics.
+        self.hooks = list(hooks or [])
+
+        # Optional mailstore.retry.RetryPolicy for calls failing with
+        # transient errors. Pass True for a default policy.
+        self.retryPolicy = mailstore.retry.RetryPolicy() if retryPolicy is True else retryPolicy or None
+
+        # Optional mailstore.ratelimit.RateLimiter limiting the calls per
+        # second and in flight. Pass True for default limits.
+        self.rateLimiter = mailstore.ratelimit.RateLimiter() if rateLimiter is True else rateLimiter or None
+
+        # Define logging parameters. Messages go to the logger of the client's
+        # module, limited by logLevel:
+        #   0: No log output
+        #   1: Log errors only
+        #   2: Log errors and warnings
+        #   3: Log informational about what is being done
+        #   4: Log also send and received data, shortened to logPayloadSize
+        #      characters (None for no limit, 0 to never log payloads)
+        self.log = mailstore.log.ClientLogger(logging.getLogger(type(self).__module__), logLevel, self.host)
+        self.logLevel = logLevel
+        self.logPayloadSize = logPayloadSize
+
+        # Callback Function for status
+        self.callbackStatus = callbackStatus
+
+        # One SSL context is created per client and shared by all its
+        # connections. Server certificates are verified against caFile or
+        # the system's trusted CAs, or must match the pinned thumbprint
+        # (see mailstore.tls).
+        self.sslContext = sslContext if sslContext is not None else mailstore.tls.createContext(caFile=caFile, thumbprint=thumbprint)
+        self.thumbprint = thumbprint
+
+        # Every client owns its transport; no process-wide state such as
+        # the global urllib opener is touched, so clients for different
+        # servers can be used side by side and from several threads.
+        # Unless another transport (see mailstore.transport) is given,
+        # keep-alive connections are reused across calls. Up to poolSize idle
+        # connections are kept, and dropped after poolIdleTimeout seconds.
+        # timeout is the socket timeout in seconds, it must be longer than
+        # the waitTime of status requests. A given transport gets the TLS
+        # settings of the client, see mailstore.transport.applyClientTLS.
+        if transport is not None:
+            mailstore.transport.applyClientTLS(transport, self.sslContext, thumbprint,
+                                               explicit=caFile is not None or sslContext is not None)
+        self.transport = transport if transport is not None else self._newTransport(poolSize, poolIdleTimeout, timeout)
+        credentials = "{}:{}".format(self.username, self.password).encode()
+        self.headers = {"Authorization": "Basic " + base64.b64encode(credentials).decode("ascii"),
+                        "Content-Type": "application/x-www-form-urlencoded"}
+
+        # If compression is true, the server may compress responses with
+        # any of mailstore.transport.CONTENT_CODINGS. They are decompressed
+        # while being read; the sizes in the call records of hooks are those
+        # of the compressed bodies.
+        self.compression = compression
+        self.headers["Accept-Encoding"] = mailstore.transport.ACCEPT_ENCODING if compression else "identity"
+
+        # Optional cache for responses of read-only methods. Pass True for a
+        # default mailstore.cache.ResponseCache or a configured instance.
+        self.cache = mailstore.cache.ResponseCache() if cache is True else cache or None
+
+        # If set to true, result items are returned as mailstore.models objects.
+        self.resultModels = resultModels
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close all idle connections of the client. The client can still be
+        used afterwards and opens new connections as needed."""
+        self.transport.close()
+
+    # ---------------------------------------------------------------- #
+    # Private Methods                                                  #
+    # ---------------------------------------------------------------- #
+    
+    @property
+    def logLevel(self):
+        return self._logLevel
+
+    @logLevel.setter
+    def logLevel(self, logLevel):
+        self._logLevel = logLevel
+        self.log.level = mailstore.log.LOG_LEVELS[min(max(logLevel, 0), 4)]
+
+
+    def _newTransport(self, poolSize, poolIdleTimeout, timeout):
+        """Create the default transport, a mailstore.pool.ConnectionPool."""
+        return mailstore.pool.ConnectionPool(maxSize=poolSize, idleTimeout=poolIdleTimeout, timeout=timeout,
+                                             sslContext=self.sslContext, thumbprint=self.thumbprint)
+
+
+    def _logPayload(self, message, payload, **fields):
+        """Helper method to log a request or response payload at debug level.
+        Nothing is formatted unless the record is emitted."""
+        if self.logPayloadSize != 0 and self.log.isEnabledFor(logging.DEBUG):
+            self.log.debug(message + " %s", mailstore.log.Payload(payload, self.logPayloadSize), extra=fields)
+
+
+    def _hasToken(self, jsonValues):
+        """Helper method to verify if all required attributes for token handling are available."""
+        if "token" in jsonValues and jsonValues["token"] is not None and "statusVersion" in jsonValues:
+            self.log.info("_hasToken: Status token %s detected. statusVersion is %s", jsonValues["token"], jsonValues["statusVersion"])
+            return True
+        else:
+            self.log.info("_hasToken: No status token detected")
+            return False
+
+
+    def _newPoller(self, method=None, waitTime=None):
+        """Helper method returning the poller deciding the wait times of the
+        status requests for a long running task of method."""
+        if waitTime is not None or self.pollingPolicy is None:
+            return mailstore.polling.FixedPoller(waitTime if waitTime is not None else self.waitTime)
+        return self.pollingPolicy.newPoller(method)
+
+
+    def _handleToken(self, jsonValues, waitTime=None, method=None, record=None):
+        """Helper function for status tokens handling"""
+
+        poller = self._newPoller(method, waitTime)
+
+        # Execute callback function for initial state
+        self._statusCallback(jsonValues, "first")
+
+        while self._pollStatus(jsonValues, record):
+            jsonValues = self.GetStatus(jsonValues, waitTime=poller.nextWaitTime(jsonValues))
+            self._logPayload("_handleToken:", jsonValues, method=method)
+
+            # Execute callback function for subsequent and final state
+            self._statusCallback(jsonValues, "refreshed")
+
+        self.log.info("_handleToken: Task with token %s finished.", jsonValues["token"], extra={"method": method, "token": jsonValues["token"]})
+        return jsonValues
+
+
+    def _statusCallback(self, jsonValues, state):
+        """Helper method executing callbackStatus, if set, for the first or a
+        refreshed status. Returns the result of the callback, which the
+        asyncio clients await if it is awaitable."""
+        if not callable(self.callbackStatus):
+            return None
+        self.log.info("_handleToken: Executing callback function \"%s\" for %s status.", self.callbackStatus.__name__, state)
+        return self.callbackStatus(jsonValues)
+
+
+    def _pollStatus(self, jsonValues, record):
+        """Helper method returning True if the task of jsonValues is still
+        running, so that its status needs to be refreshed."""
+        if jsonValues["statusCode"] != "running":
+            return False
+        self.log.info("_handleToken: Refreshing status for task with token %s.", jsonValues["token"], extra={"token": jsonValues["token"]})
+        if record is not None:
+            record.polls += 1
+        return True
+
+
+    def _prepareRequest(self, method, arguments, mode):
+        """Helper method to build path, URL and form data of an API request."""
+        spec = self.methodTable.get(method) if mode == "invoke" else None
+        if spec is not None:
+            path = spec.path
+            data = spec.encode(arguments)
+        else:
+            path = "/api/{}/{}".format(mode, method)
+            data = mailstore.methods.encodeArguments(arguments)
+        url = "https://{}:{}{}".format(self.host, self.port, path)
+
+        self.log.debug("_callMethod: METHOD: %s", method)
+        self._logPayload("_callMethod: ARGUMENTS:", arguments, method=method)
+        if self.log.isEnabledFor(logging.INFO):
+            self.log.info("_callMethod: HTTP POST: %s %s", url, mailstore.log.Payload(data, self.logPayloadSize),
+                          extra={"method": method, "url": url})
+        return path, url, data
+
+
+    def _parseResponse(self, body):
+        """Helper method to parse the server response, which is always in JSON format."""
+        decodedValues = body.decode("utf-8-sig")
+        jsonValues = json.loads(decodedValues)
+        self._logPayload("_callMethod: HTTP RESPONSE:", decodedValues)
+        return jsonValues
+
+
+    def _lookupCache(self, method, arguments, data, server=None, mode="invoke"):
+        """Helper method to look up a cached response."""
+        cachedValues = self.cache.lookup(method, data, server, mode)
+        if cachedValues is not None:
+            self.log.info("_callMethod: Returning cached data to caller \"%s\"", method, extra={"method": method})
+        return cachedValues
+
+
+    def _beforeCall(self, method, arguments):
+        """Helper method to start the CallRecord of an API call and run the
+        beforeCall hooks. Returns None if there are no hooks."""
+        if not self.hooks:
+            return None
+        record = mailstore.metrics.CallRecord(method, arguments)
+        for hook in self.hooks:
+            hook.beforeCall(record)
+        return record
+
+
+    def _afterCall(self, record, error=None, cancelled=False):
+        """Helper method to finish the CallRecord of an API call and run the
+        afterCall hooks."""
+        if record is None:
+            return
+        record.finish(error, cancelled)
+        for hook in self.hooks:
+            hook.afterCall(record)
+
+
+    def _retry(self, method, function):
+        """Helper method returning function(), retried according to the
+        retryPolicy if there is one."""
+        if self.retryPolicy is None:
+            return function()
+        spec = self.methodTable.get(method)
+        return self.retryPolicy.call("{}:{}".format(self.host, self.port), method, function, self.log,
+                                     idempotent=spec.idempotent if spec is not None else None)
+
+
+    def _slot(self, method):
+        """Helper method returning a context manager which waits for the
+        rateLimiter to admit a request of method."""
+        if self.rateLimiter is None:
+            return contextlib.nullcontext(mailstore.ratelimit.Slot())
+        return self.rateLimiter.slot("{}:{}".format(self.host, self.port), method)
+
+
+    def _exchange(self, method, request, record):
+        """Helper method sending a request and returning the parsed response."""
+        with self._slot(method) as slot:
+            response = self._sendRequest(*request)
+            return self._receiveResponse(response, response.read(), record, slot)
+
+
+    def _receiveResponse(self, response, body, record, slot):
+        """Helper method returning the parsed body of a complete response.
+        Its size is recorded, and whether its round trip is a latency sample
+        of the rateLimiter."""
+        if record is not None:
+            record.bytesReceived = mailstore.transport.receivedSize(response, len(body))
+        jsonValues = self._parseResponse(body)
+        # The first response of a long running task is delayed by waitTime
+        slot.sample = jsonValues.get("token") is None
+        return jsonValues
+
+
+    def _send(self, method, request):
+        """Helper method sending a request of method and returning the
+        HTTP response once the rateLimiter admitted it."""
+        with self._slot(method):
+            return self._sendRequest(*request)
+
+
+    def _convertResponse(self, method, jsonValues):
+        """Helper method to turn result items into models if resultModels is set."""
+        if self.resultModels:
+            return mailstore.models.convertResponse(method, jsonValues)
+        return jsonValues
+
+
+    def _sendRequest(self, path, url, data):
+        """Helper method to send an API request and return the HTTP response."""
+
+        # Try making the HTTP request...
+        try:
+            response = self.transport.request(self.host, self.port, path, body=data.encode(), headers=self.headers)
+            response = mailstore.transport.decodeResponse(response)
+        # ...and catch exceptions.
+        except Exception as e:
+            raise self._requestError(url, e)
+
+        return self._checkResponse(response, url, data)
+
+
+    def _requestError(self, url, error):
+        """Helper method logging an exception raised by the transport and
+        returning the MailStoreBaseError to raise instead."""
+        self.log.error("Unhandled Exception: %r", error, extra={"url": url})
+        return mailstore.errors.MailStoreBaseError(error)
+
+
+    def _checkResponse(self, response, url, data):
+        """Helper method returning response if its status is 2xx. Otherwise
+        the response is closed and an HTTPError is logged and raised."""
+        if 200 <= response.status < 300:
+            return response
+        response.close()
+        self.log.error("%s %s %s %s %s", response.status, response.reason, url, "POST", mailstore.log.Payload(data, self.logPayloadSize),
+                       extra={"url": url, "status": response.status})
+        raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+
+
+    def _callMethod(self, method, arguments = {}, mode = "invoke", autoHandleToken = None, stream = False, columnar = False, chunked = None):
+        """This is where the magic happens! Method is called by all other public methods that wrap 
+        an Administration API method."""
+
+        if stream:
+            return self._streamMethod(method, arguments, mode)
+        if columnar:
+            return mailstore.columnar.ColumnarResult.fromRecords(self._streamMethod(method, arguments, mode, convert=False))
+
+        if chunked:
+            chunked = mailstore.chunked.ChunkedFetch() if chunked is True else chunked
+            return chunked.iterResults(self, method, arguments, mode)
+
+        autoHandleToken = autoHandleToken if autoHandleToken is not None else self.autoHandleToken
+
+        record = self._beforeCall(method, arguments)
+        try:
+            returnData = self._performCall(method, arguments, mode, autoHandleToken, record)
+        except Exception as e:
+            self._afterCall(record, e)
+            raise
+        self._afterCall(record)
+        return returnData
+
+
+    def _performCall(self, method, arguments, mode, autoHandleToken, record):
+        """Helper method doing the work of _callMethod for a complete response."""
+
+        request, cachedValues = self._beginCall(method, arguments, mode, record)
+        if cachedValues is not None:
+            return cachedValues
+
+        try:
+            jsonValues = self._retry(method, lambda: self._exchange(method, request, record))
+        finally:
+            self._invalidateCache(method, arguments)
+
+        if self._autoHandleToken(method, arguments, jsonValues, autoHandleToken):
+            jsonValues = self._handleToken(jsonValues, method=method, record=record)
+
+        return self._finishCall(method, arguments, mode, request, jsonValues, record)
+
+
+    def _beginCall(self, method, arguments, mode, record):
+        """Helper method preparing the request of a complete call. Returns
+        the request and the converted cached response, or None if there is
+        no cached response."""
+        request = self._prepareRequest(method, arguments, mode)
+        if record is not None:
+            record.bytesSent = len(request[2])
+        if self.cache is not None:
+            cachedValues = self._lookupCache(method, arguments, request[2], "{}:{}".format(self.host, self.port), mode)
+            if cachedValues is not None:
+                if record is not None:
+                    record.cached = True
+                return request, self._convertResponse(method, cachedValues)
+        return request, None
+
+
+    def _invalidateCache(self, method, arguments):
+        """Helper method dropping the cached responses a call of method may
+        have changed, whether the call succeeded or not."""
+        if self.cache is not None:
+            self.cache.invalidate(method, arguments, "{}:{}".format(self.host, self.port))
+
+
+    def _autoHandleToken(self, method, arguments, jsonValues, autoHandleToken):
+        """Helper method returning True if the status token of the response
+        is to be handled by the client."""
+        if self.cache is not None:
+            self.cache.trackTask(method, arguments, jsonValues, "{}:{}".format(self.host, self.port))
+
+        # Check if response contains a status token and, depending on the
+        # value of autoHandleToken, handle the token ourselves or just
+        # return the JSON response to the caller.
+        if not self._hasToken(jsonValues):
+            return False
+        if autoHandleToken:
+            self.log.info("_callMethod: Automatic token handling is ENABLED.")
+            return True
+        self.log.info("_callMethod: Automatic token handling is DISABLED.")
+        return False
+
+
+    def _finishCall(self, method, arguments, mode, request, returnData, record):
+        """Helper method recording and caching the final response of a
+        complete call, and returning it converted."""
+        if record is not None and returnData.get("error"):
+            record.error = returnData["error"]
+
+        if self.cache is not None:
+            self.cache.store(method, arguments, request[2], returnData, "{}:{}".format(self.host, self.port), mode)
+
+        self.log.info("_callMethod: Returning data to caller \"%s\"", method, extra={"method": method})
+        self._logPayload("_callMethod:", returnData, method=method)
+
+        return self._convertResponse(method, returnData)
+
+
+    def _streamMethod(self, method, arguments = {}, mode = "invoke", convert = True):
+        """Streaming variant of _callMethod. The request is sent right away,
+        but the response is parsed while it is being read and a generator
+        over the items of its result array is returned. A result which is
+        not an array is yielded as a single item. With convert=False items
+        are never turned into models."""
+        record = self._beforeCall(method, arguments)
+        try:
+            request = self._prepareRequest(method, arguments, mode)
+            if record is not None:
+                record.bytesSent = len(request[2])
+            response = self._retry(method, lambda: self._send(method, request))
+        except Exception as e:
+            self._afterCall(record, e)
+            raise
+        results = self._iterResult(method, response, convert, record)
+        next(results)
+        return results
+
+
+    def _nextStatusRequest(self, jsonValues, poller):
+        """Helper method to build the get-status request following up on a
+        streamed response of a running task, or None if the task finished."""
+        if jsonValues.get("error"):
+            self.log.error("_iterResult: API error %s", jsonValues["error"])
+            raise mailstore.errors.MailStoreResponseError(jsonValues)
+        if not (self._hasToken(jsonValues) and jsonValues["statusCode"] == "running"):
+            return None
+        return self._prepareRequest("get-status", {"token": jsonValues["token"],
+                                                   "millisecondsTimeout": poller.nextWaitTime(jsonValues),
+                                                   "lastKnownStatusVersion": str(jsonValues["statusVersion"])}, "")
+
+
+    def _iterResult(self, method, response, convert = True, record = None):
+        """Generator yielding the result items of a streamed response. For
+        long running tasks the status is polled until the task finished,
+        and the items of the final status are yielded.
+
+        The generator first yields None, which _streamMethod consumes, so
+        that closing it before the first item, or its garbage collection,
+        still closes the response. A call whose generator is closed early
+        is recorded as cancelled."""
+        stream = ResultStream(self, method, convert, record)
+        error = None
+        cancelled = False
+        try:
+            yield None
+            while response is not None:
+                stream.begin(response)
+                try:
+                    while True:
+                        chunk = response.read(self.streamChunkSize)
+                        yield from stream.feed(chunk)
+                        if not chunk:
+                            break
+                finally:
+                    response.close()
+
+                request = stream.nextRequest()
+                if request is None:
+                    yield from stream.finalItems()
+                else:
+                    self._statusCallback(stream.parser.values, "refreshed")
+                response = self._retry("get-status", lambda: self._sendRequest(*request)) if request else None
+        except GeneratorExit:
+            cancelled = True
+            raise
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if response is not None:
+                response.close()
+            self._afterCall(record, error, cancelled)
+
+        self.log.info("_iterResult: Finished streaming result of \"%s\"", method, extra={"method": method})
+
+
+    # ---------------------------------------------------------------- #
+    # Public Methods                                                   #
+    # ---------------------------------------------------------------- #
+ 
+    def GetStatus(self, jsonValues, waitTime=None):
+        """Retrieve and update status token of long running task. This
+        method is used for automatic token handling, but can also be
+        called directly when manual token handling is done."""
+        
+        waitTime = waitTime if waitTime else self.waitTime
+
+        if self._hasToken(jsonValues):
+            statusVersion = str(jsonValues["statusVersion"])
+            jsonValues = self._callMethod("get-status", {"token": jsonValues["token"], "millisecondsTimeout": waitTime, "lastKnownStatusVersion": statusVersion}, mode="", autoHandleToken=False)
+            return jsonValues
+        else:
+            self.log.error("GetStatus: Cannot get status, no token found!")
+            raise mailstore.errors.MailStoreNoTokenError(jsonValues)
+
+    def CancelAsync(self, jsonValues):
+        """Cancels a long running task."""
+        if self._hasToken(jsonValues):
+            return self._callMethod("cancel-async", {"token": jsonValues["token"]}, mode="")
+        else:
+            self.log.error("CancelAsync: Cannot cancel, no token found!")
+            raise mailstore.errors.MailStoreNoTokenError(jsonValues)
+
+    def ExecuteBatch(self, calls, maxWorkers=8, rateLimit=None):
+        """Run many API calls in parallel and return their results in order.
+
+        calls:       Iterable of (method, kwargs) pairs, e.g. ("GetUserInfo", {"userName": "jdoe"}).
+        maxWorkers:  Number of calls running at the same time.
+        rateLimit:   (optional) Maximum number of calls started per second.
+
+        Returns a list of mailstore.batch.BatchResult objects. Errors of single
+        calls are stored in the respective result and do not stop the batch.
+        """
+        return mailstore.batch.runBatch(self, calls, maxWorkers=maxWorkers, rateLimit=rateLimit)
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Batch execution of API calls
+
+A batch is an iterable of (method, kwargs) pairs, where method is the name
+of a wrapped API method (or the bound method itself):
+
+   >>> results = api.ExecuteBatch([("CreateUser", {"userName": "jdoe", "privileges": "login"}),
+   ...                             ("SetUserEmailAddresses", {"userName": "jdoe", "emailAddresses": "jdoe@example.com"})],
+   ...                            maxWorkers=16, rateLimit=100)
+
+Results are returned in the order of the calls. A failing call does not
+abort the batch; its exception is stored in the BatchResult instead.
+
+rateLimit spaces the calls of one batch evenly. The calls are made through
+the client, so its mailstore.ratelimit.RateLimiter, if any, applies to
+them as well.
+"""
+
+import asyncio
+import concurrent.futures
+
+import mailstore.ratelimit
+
+
+class BatchResult():
+    """Outcome of a single call of a batch.
+
+    result holds the API response and error the exception raised by the
+    call, if any. index is the position of the call within the batch.
+    """
+    __slots__ = ("method", "kwargs", "result", "error", "index")
+
+    def __init__(self, method, kwargs, result=None, error=None, index=None):
+        self.method = method
+        self.kwargs = kwargs
+        self.index = index
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        """True if the call neither raised nor returned an API error."""
+        if self.error is not None:
+            return False
+        return not (isinstance(self.result, dict) and self.result.get("error"))
+
+    def __repr__(self):
+        return "<BatchResult {} {}>".format(self.method, "ok" if self.ok else "failed")
+
+
+def newLimiter(rateLimit):
+    """Return a mailstore.ratelimit.TokenBucket spacing calls evenly so that
+    no more than rateLimit calls start per second, or None."""
+    return mailstore.ratelimit.TokenBucket(rateLimit, burst=1) if rateLimit else None
+
+
+def resolveCall(client, method):
+    """Return the client method for a method name or bound method."""
+    return getattr(client, method) if isinstance(method, str) else method
+
+
+def methodName(method):
+    return method if isinstance(method, str) else method.__name__
+
+
+def iterBatch(client, calls, maxWorkers=8, rateLimit=None):
+    """Run calls over a pool of maxWorkers threads and yield each BatchResult
+    as soon as its call has finished. rateLimit caps the calls started per
+    second. calls is consumed lazily, so it may be a generator."""
+    limiter = newLimiter(rateLimit)
+
+    def execute(result, method):
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            result.result = resolveCall(client, method)(**result.kwargs)
+        except Exception as e:
+            result.error = e
+        return result
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=maxWorkers) as executor:
+        pending = set()
+        for index, (method, kwargs) in enumerate(calls):
+            result = BatchResult(methodName(method), kwargs or {}, index=index)
+            pending.add(executor.submit(execute, result, method))
+            # Keep the number of queued calls bounded for very large batches
+            if len(pending) >= 2 * maxWorkers:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+
+
+def runBatch(client, calls, maxWorkers=8, rateLimit=None):
+    """Like iterBatch, but return all BatchResult objects in call order."""
+    results = list(iterBatch(client, calls, maxWorkers=maxWorkers, rateLimit=rateLimit))
+    results.sort(key=lambda result: result.index)
+    return results
+
+
+async def iterBatchAsync(client, calls, maxConcurrency=32, rateLimit=None):
+    """Asynchronous generator version of iterBatch for asyncio clients,
+    running up to maxConcurrency calls at the same time. Calls still
+    running when the generator is closed early are cancelled."""
+    limiter = newLimiter(rateLimit)
+
+    async def execute(result, method):
+        try:
+            if limiter is not None:
+                await limiter.acquireAsync()
+            result.result = await resolveCall(client, method)(**result.kwargs)
+        except Exception as e:
+            result.error = e
+        return result
+
+    pending = set()
+    try:
+        for index, (method, kwargs) in enumerate(calls):
+            result = BatchResult(methodName(method), kwargs or {}, index=index)
+            pending.add(asyncio.ensure_future(execute(result, method)))
+            if len(pending) >= maxConcurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # Calls still running when the consumer stops are cancelled
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def runBatchAsync(client, calls, maxConcurrency=32, rateLimit=None):
+    """Like iterBatchAsync, but return all BatchResult objects in call order."""
+    results = [result async for result in iterBatchAsync(client, calls, maxConcurrency=maxConcurrency, rateLimit=rateLimit)]
+    results.sort(key=lambda result: result.index)
+    return results
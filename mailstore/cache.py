@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Response cache for read-only API methods
+
+The cache is opt-in, e.g. mailstore.server.Client(..., cache=True) or
+cache=mailstore.cache.ResponseCache(maxSize=256, ttls={"GetStores": 10}).
+Responses of the methods in CACHED_METHODS are kept for a per-method time to
+live. Calling a mutating method drops the cached responses of all methods
+that read the same entities, e.g. RenameStore drops GetStores. If the method
+starts a long running task, they are dropped again once get-status reports
+the task finished, as responses cached while it was running may be stale.
+
+Responses are cached per server and API mode, so a cache can be shared by
+clients of different servers.
+"""
+
+import collections
+import json
+import threading
+import time
+
+# Cacheable read-only methods: name -> (default time to live in seconds, entities read)
+CACHED_METHODS = {
+    "GetArchiveAdminEnabled":            (60,   ("archiveAdmin",)),
+    "GetChildFolders":                   (60,   ("folders",)),
+    "GetClientAccessServers":            (60,   ("clientAccessServers",)),
+    "GetComplianceConfiguration":        (300,  ("compliance",)),
+    "GetDirectoryServicesConfiguration": (300,  ("directoryServices",)),
+    "GetEnvironmentInfo":                (300,  ("server",)),
+    "GetFolderStatistics":               (60,   ("folders", "stores")),
+    "GetIndexConfiguration":             (300,  ("index",)),
+    "GetInstanceConfiguration":          (60,   ("instances",)),
+    "GetInstanceHosts":                  (60,   ("instanceHosts",)),
+    "GetInstances":                      (30,   ("instances",)),
+    "GetProfiles":                       (60,   ("profiles",)),
+    "GetServerInfo":                     (300,  ("server",)),
+    "GetStoreAutoCreateConfiguration":   (300,  ("storeAutoCreate",)),
+    "GetStoreIndexes":                   (60,   ("stores",)),
+    "GetStores":                         (60,   ("stores",)),
+    "GetSystemAdministrators":           (60,   ("systemAdministrators",)),
+    "GetTimeZones":                      (3600, ("timeZones",)),
+    "GetUserInfo":                       (60,   ("users",)),
+    "GetUsers":                          (60,   ("users",)),
+}
+
+# Mutating methods: name -> entities changed
+MUTATING_METHODS = {
+    "AttachStore":                         ("stores", "folders"),
+    "ClearUserPrivilegesOnFolders":        ("users",),
+    "CompactStore":                        ("stores",),
+    "CreateClientAccessServer":            ("clientAccessServers",),
+    "CreateInstance":                      ("instances",),
+    "CreateInstanceHost":                  ("instanceHosts",),
+    "CreateProfile":                       ("profiles",),
+    "CreateStore":                         ("stores",),
+    "CreateSystemAdministrator":           ("systemAdministrators",),
+    "CreateUser":                          ("users",),
+    "DeleteClientAccessServer":            ("clientAccessServers",),
+    "DeleteEmptyFolders":                  ("folders",),
+    "DeleteInstanceHost":                  ("instanceHosts",),
+    "DeleteInstances":                     ("instances",),
+    "DeleteMessage":                       ("folders", "stores"),
+    "DeleteProfile":                       ("profiles",),
+    "DeleteSystemAdministrator":           ("systemAdministrators",),
+    "DeleteUser":                          ("users",),
+    "DetachStore":                         ("stores", "folders"),
+    "FreezeInstances":                     ("instances",),
+    "MergeStore":                          ("stores", "folders"),
+    "MoveFolder":                          ("folders", "users"),
+    "RebuildSelectedStoreIndexes":         ("stores",),
+    "RebuildStoreIndex":                   ("stores",),
+    "RefreshAllStoreStatistics":           ("stores", "folders"),
+    "RenameStore":                         ("stores",),
+    "RenameUser":                          ("users",),
+    "RestartInstances":                    ("instances",),
+    "RetryOpenStores":                     ("stores",),
+    "RunProfile":                          ("folders", "stores"),
+    "RunTemporaryProfile":                 ("folders", "stores"),
+    "SelectAllStoreIndexesForRebuild":     ("stores",),
+    "SetArchiveAdminEnabled":              ("archiveAdmin",),
+    "SetClientAccessServerConfiguration":  ("clientAccessServers",),
+    "SetComplianceConfiguration":          ("compliance",),
+    "SetDirectoryServicesConfiguration":   ("directoryServices",),
+    "SetIndexConfiguration":               ("index",),
+    "SetInstanceConfiguration":            ("instances",),
+    "SetInstanceHostConfiguration":        ("instanceHosts",),
+    "SetStoreAutoCreateConfiguration":     ("storeAutoCreate",),
+    "SetStorePath":                        ("stores",),
+    "SetStoreProperties":                  ("stores",),
+    "SetStoreRequestedState":              ("stores",),
+    "SetSystemAdministratorConfiguration": ("systemAdministrators",),
+    "SetSystemAdministratorPassword":      ("systemAdministrators",),
+    "SetUserAuthentication":               ("users",),
+    "SetUserDistinguishedName":            ("users",),
+    "SetUserEmailAddresses":               ("users",),
+    "SetUserFullName":                     ("users",),
+    "SetUserPassword":                     ("users",),
+    "SetUserPop3UserNames":                ("users",),
+    "SetUserPrivileges":                   ("users",),
+    "SetUserPrivilegesOnFolder":           ("users",),
+    "StartInstances":                      ("instances",),
+    "StopInstances":                       ("instances",),
+    "SyncUsersWithDirectoryServices":      ("users",),
+    "ThawInstances":                       ("instances",),
+    "UpgradeStore":                        ("stores",),
+}
+
+# Methods besides Get* which do not change anything cached. Calls of
+# other methods found in none of the tables drop the whole cache to be safe.
+NEUTRAL_METHODS = {"get-status", "cancel-async", "Ping", "VerifyStore"}
+
+
+class ResponseCache():
+    """Thread-safe LRU cache of API responses with per-method time to live.
+
+    maxSize:  Maximum number of cached responses.
+    ttls:     (optional) Dict of method name -> time to live in seconds,
+              overriding the defaults of CACHED_METHODS. A time to live of 0
+              disables caching of that method.
+
+    hits, misses and invalidations count cache lookups and dropped entries.
+
+    server identifies the server of a call, e.g. "host:port", and mode its
+    API mode, e.g. "invoke"; both are part of the cache keys.
+    """
+    def __init__(self, maxSize=1024, ttls=None):
+        self.maxSize = maxSize
+        self.ttls = {method: ttl for method, (ttl, entities) in CACHED_METHODS.items()}
+        self.ttls.update(ttls or {})
+
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict()
+        # (server, token) -> (method, arguments) of running tasks of mutating methods
+        self.tasks = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def isCached(self, method):
+        return self.ttls.get(method, 0) > 0
+
+    def lookup(self, method, data, server=None, mode="invoke"):
+        """Return the cached response of method called with the encoded
+        arguments data, or None."""
+        if not self.isCached(method):
+            return None
+        key = (server, mode, method, data)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                # Responses are kept serialized, so callers always get a copy
+                # they are free to modify.
+                return json.loads(entry[2])
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+        return None
+
+    def store(self, method, arguments, data, jsonValues, server=None, mode="invoke"):
+        """Cache a successful response."""
+        if not self.isCached(method) or jsonValues.get("error") or jsonValues.get("statusCode") == "running":
+            return
+        key = (server, mode, method, data)
+        entry = (time.monotonic() + self.ttls[method], arguments.get("instanceID"), json.dumps(jsonValues))
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+
+    @staticmethod
+    def isMutating(method):
+        return not (method in NEUTRAL_METHODS or method.startswith("Get"))
+
+    def invalidate(self, method, arguments, server=None):
+        """Drop the responses of server invalidated by calling method. Calls
+        scoped to an SPE instance only drop responses of the same instance."""
+        if not self.isMutating(method):
+            return
+        entities = MUTATING_METHODS.get(method)
+        instanceID = arguments.get("instanceID")
+        with self.lock:
+            for key, entry in list(self.entries.items()):
+                if key[0] != server:
+                    continue
+                if instanceID is not None and entry[1] is not None and entry[1] != instanceID:
+                    continue
+                if entities is None or set(entities).intersection(CACHED_METHODS.get(key[2], (0, ()))[1]):
+                    del self.entries[key]
+                    self.invalidations += 1
+
+    def trackTask(self, method, arguments, jsonValues, server=None):
+        """Follow the long running tasks of mutating methods. jsonValues is
+        the response of method; for get-status it is the status of a task
+        and the responses its method invalidates are dropped again once the
+        task is no longer running."""
+        if method == "get-status":
+            if jsonValues.get("statusCode") == "running":
+                return
+            with self.lock:
+                task = self.tasks.pop((server, arguments.get("token")), None)
+            if task is not None:
+                self.invalidate(task[0], task[1], server)
+        elif self.isMutating(method) and jsonValues.get("token") and jsonValues.get("statusCode") == "running":
+            with self.lock:
+                self.tasks[(server, jsonValues["token"])] = (method, arguments)
+                while len(self.tasks) > self.maxSize:
+                    self.tasks.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Return the cache counters as a dict."""
+        with self.lock:
+            return {"size": len(self.entries), "hits": self.hits,
+                    "misses": self.misses, "invalidations": self.invalidations}
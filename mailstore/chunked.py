@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Chunked fetching of time ranges
+
+A single GetWorkerResults call for a long time range can produce a huge
+response that takes too long. In chunked mode the range is split into
+sub-ranges, which are fetched concurrently, and the merged results are
+returned by a generator in chronological order:
+
+   >>> for result in api.GetWorkerResults("2023-01-01T00:00:00", "2024-01-01T00:00:00", chunked=True):
+   ...     print(result["startTime"], result["result"])
+
+The sub-range size adapts while fetching: it is halved after a response
+with more than maxItems items or taking longer than maxSeconds, and
+doubled after small and quick responses. A sub-range failing with a
+timeout, connection or server error is split in two and fetched again.
+Pass a ChunkedFetch as chunked to change the settings.
+"""
+
+import asyncio
+import collections
+import concurrent.futures
+import datetime
+import time
+import urllib.error
+
+import mailstore.errors
+
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+def formatTime(value):
+    """Return a datetime in the format of the API, strings are kept."""
+    if isinstance(value, datetime.datetime):
+        return value.strftime(TIME_FORMAT)
+    return value
+
+
+def parseTime(value):
+    """Return a datetime for a time in the format of the API, an ISO 8601
+    date or date and time, or a datetime.date. Times are in the time zone
+    of the call, so UTC offsets are dropped."""
+    if isinstance(value, str):
+        try:
+            value = datetime.datetime.fromisoformat(value)
+        except ValueError:
+            value = datetime.datetime.strptime(value[:19], TIME_FORMAT)
+        return value.replace(tzinfo=None)
+    if isinstance(value, datetime.date) and not isinstance(value, datetime.datetime):
+        return datetime.datetime.combine(value, datetime.time())
+    return value
+
+
+def itemValue(item, name):
+    """Return a field of a result item, which is a dict or a model."""
+    if isinstance(item, dict):
+        return item.get(name)
+    return getattr(item, name, None)
+
+
+def isSplittable(error):
+    """Return True for errors a smaller request may avoid: timeouts,
+    dropped connections and server errors."""
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500 or error.code == 408
+    if isinstance(error, mailstore.errors.MailStoreBaseError):
+        error = error.__context__
+    return isinstance(error, (TimeoutError, ConnectionError, asyncio.TimeoutError))
+
+
+class RangePlanner():
+    """Hands out consecutive sub-ranges of [start, end) and adapts their
+    size to the responses, following the settings of a ChunkedFetch."""
+    def __init__(self, settings, start, end):
+        self.settings = settings
+        self.position = start
+        self.end = end
+        self.size = settings.chunkSize
+        self.splits = 0
+
+    def next(self):
+        """Return the next (start, end) range, or None when done."""
+        if self.position >= self.end:
+            return None
+        start = self.position
+        self.position = min(start + self.size, self.end)
+        return start, self.position
+
+    def record(self, span, count, duration):
+        """Adapt the size of further ranges to the response for a range
+        of span. Ranges fetched ahead were planned with an older size, so
+        the new size is derived from the span rather than the current size."""
+        settings = self.settings
+        if count > settings.maxItems or duration > settings.maxSeconds:
+            self.size = max(settings.minChunkSize, min(self.size, span / 2))
+        elif count < settings.maxItems / 4 and duration < settings.maxSeconds / 4:
+            self.size = max(self.size, min(settings.maxChunkSize, span * 2))
+
+    def split(self, start, end, error):
+        """Return the halves of a failed range, or None if it must not be
+        split any further."""
+        settings = self.settings
+        half = datetime.timedelta(seconds=int((end - start).total_seconds() // 2))
+        if not isSplittable(error) or half < settings.minChunkSize or self.splits >= settings.maxSplits:
+            return None
+        self.splits += 1
+        self.size = max(settings.minChunkSize, min(self.size, half))
+        return (start, start + half), (start + half, end)
+
+
+class ChunkedFetch():
+    """Settings of chunked fetches.
+
+    chunkSize:     timedelta of the first sub-ranges.
+    minChunkSize:  Smallest timedelta a sub-range is reduced to.
+    maxChunkSize:  Largest timedelta a sub-range is grown to.
+    maxItems:      Responses with more items make further sub-ranges smaller.
+    maxSeconds:    Responses taking longer make further sub-ranges smaller.
+    maxWorkers:    Number of sub-ranges fetched at the same time.
+    maxSplits:     Number of failed sub-ranges split again before giving up.
+    timeField:     Field of the result items the results are ordered by.
+    """
+    def __init__(self, chunkSize=datetime.timedelta(days=1), minChunkSize=datetime.timedelta(minutes=1),
+                 maxChunkSize=datetime.timedelta(days=31), maxItems=20000, maxSeconds=20, maxWorkers=4,
+                 maxSplits=32, timeField="startTime"):
+        self.chunkSize = chunkSize
+        self.minChunkSize = minChunkSize
+        self.maxChunkSize = maxChunkSize
+        self.maxItems = maxItems
+        self.maxSeconds = maxSeconds
+        self.maxWorkers = maxWorkers
+        self.maxSplits = maxSplits
+        self.timeField = timeField
+
+    def __subArguments(self, arguments, start, end):
+        return dict(arguments, fromIncluding=formatTime(start), toExcluding=formatTime(end))
+
+    def __sortKey(self, item):
+        return itemValue(item, self.timeField) or ""
+
+    def iterChunks(self, client, method, arguments, mode="invoke"):
+        """Generator yielding (start, end, results) of consecutive sub-ranges
+        of [fromIncluding, toExcluding) of a synchronous client's method."""
+        planner = RangePlanner(self, parseTime(arguments["fromIncluding"]), parseTime(arguments["toExcluding"]))
+
+        def fetch(start, end):
+            begin = time.monotonic()
+            items = list(client._streamMethod(method, self.__subArguments(arguments, start, end), mode))
+            return items, time.monotonic() - begin
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.maxWorkers)
+        pending = collections.deque()
+
+        def fill():
+            while len(pending) < 2 * self.maxWorkers:
+                subRange = planner.next()
+                if subRange is None:
+                    break
+                pending.append((subRange, executor.submit(fetch, *subRange)))
+
+        try:
+            fill()
+            while pending:
+                (start, end), future = pending.popleft()
+                try:
+                    items, duration = future.result()
+                except Exception as e:
+                    halves = planner.split(start, end, e)
+                    if halves is None:
+                        raise
+                    for subRange in reversed(halves):
+                        pending.appendleft((subRange, executor.submit(fetch, *subRange)))
+                    continue
+                planner.record(end - start, len(items), duration)
+                fill()
+                items.sort(key=self.__sortKey)
+                yield start, end, items
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def iterResults(self, client, method, arguments, mode="invoke"):
+        """Generator yielding the results of all sub-ranges in order."""
+        for start, end, items in self.iterChunks(client, method, arguments, mode):
+            yield from items
+
+    async def iterChunksAsync(self, client, method, arguments, mode="invoke"):
+        """Asynchronous generator version of iterChunks for asyncio clients."""
+        planner = RangePlanner(self, parseTime(arguments["fromIncluding"]), parseTime(arguments["toExcluding"]))
+        semaphore = asyncio.Semaphore(self.maxWorkers)
+
+        async def fetch(start, end):
+            async with semaphore:
+                begin = time.monotonic()
+                response = await client._streamMethod(method, self.__subArguments(arguments, start, end), mode)
+                items = [item async for item in response]
+                return items, time.monotonic() - begin
+
+        pending = collections.deque()
+
+        def fill():
+            while len(pending) < 2 * self.maxWorkers:
+                subRange = planner.next()
+                if subRange is None:
+                    break
+                pending.append((subRange, asyncio.ensure_future(fetch(*subRange))))
+
+        try:
+            fill()
+            while pending:
+                (start, end), task = pending.popleft()
+                try:
+                    items, duration = await task
+                except Exception as e:
+                    halves = planner.split(start, end, e)
+                    if halves is None:
+                        raise
+                    for subRange in reversed(halves):
+                        pending.appendleft((subRange, asyncio.ensure_future(fetch(*subRange))))
+                    continue
+                planner.record(end - start, len(items), duration)
+                fill()
+                items.sort(key=self.__sortKey)
+                yield start, end, items
+        finally:
+            for subRange, task in pending:
+                task.cancel()
+
+    async def iterResultsAsync(self, client, method, arguments, mode="invoke"):
+        """Asynchronous generator version of iterResults."""
+        async for start, end, items in self.iterChunksAsync(client, method, arguments, mode):
+            for item in items:
+                yield item
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Column-oriented result sets for statistics methods
+
+GetFolderStatistics, GetInstanceStatistics and GetWorkerResults accept
+columnar=True and then return a ColumnarResult instead of the response.
+Its records are stored column by column: numeric columns in compact arrays
+(array module, or NumPy arrays if NumPy is installed), all other columns in
+lists. Records are added as they are parsed from the response, so the list
+of dicts is never built:
+
+   >>> stats = api.GetFolderStatistics(columnar=True)
+   >>> stats.sumBy("folder", "size", keyFunc=mailstore.columnar.userFolder)
+   >>> stats.topN("size", 10)
+"""
+
+import array
+import collections
+import heapq
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def userFolder(folder):
+    """Return the user archive (top-level folder) of a folder path."""
+    return folder.split("/", 1)[0] if folder else folder
+
+
+class ColumnBuilder():
+    """Collects records into columns. Keys missing in a record are None."""
+    def __init__(self):
+        self.columns = {}
+        self.length = 0
+
+    def add(self, record):
+        for key, value in record.items():
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = [None] * self.length
+            column.append(value)
+        self.length += 1
+        for column in self.columns.values():
+            if len(column) < self.length:
+                column.append(None)
+
+    def build(self, useNumpy=True):
+        return ColumnarResult({key: packColumn(values, useNumpy) for key, values in self.columns.items()}, self.length)
+
+
+def packColumn(values, useNumpy=True):
+    """Store a column of ints or floats in an array, anything else as list."""
+    if all(type(value) is int for value in values):
+        typecode = "q"
+    elif all(type(value) in (int, float) for value in values):
+        typecode = "d"
+    else:
+        return values
+    if useNumpy and numpy is not None:
+        return numpy.array(values, dtype=numpy.int64 if typecode == "q" else numpy.float64)
+    return array.array(typecode, values)
+
+
+class ColumnarResult():
+    """Result records stored as named columns of equal length."""
+    def __init__(self, columns, length):
+        self.columns = columns
+        self.length = length
+
+    @classmethod
+    def fromRecords(cls, records, useNumpy=True):
+        """Build a ColumnarResult from an iterable of record dicts."""
+        builder = ColumnBuilder()
+        for record in records:
+            builder.add(record)
+        return builder.build(useNumpy)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __repr__(self):
+        return "ColumnarResult({} records, columns {})".format(self.length, list(self.columns))
+
+    def row(self, index):
+        """Return a single record as dict."""
+        return {key: column[index] for key, column in self.columns.items()}
+
+    def rows(self):
+        """Iterate over all records as dicts."""
+        for index in range(self.length):
+            yield self.row(index)
+
+    def __keys(self, keyColumn, keyFunc):
+        keys = self.columns[keyColumn]
+        return [keyFunc(key) for key in keys] if keyFunc is not None else keys
+
+    def sumBy(self, keyColumn, valueColumn, keyFunc=None):
+        """Return a dict of key -> sum of valueColumn over the records with
+        that key. keyFunc optionally maps keys first, e.g. userFolder."""
+        keys = self.__keys(keyColumn, keyFunc)
+        values = self.columns[valueColumn]
+        if numpy is not None and isinstance(values, numpy.ndarray) and self.length:
+            uniqueKeys, inverse = numpy.unique(numpy.array(keys, dtype=object), return_inverse=True)
+            sums = numpy.bincount(inverse, weights=values, minlength=len(uniqueKeys))
+            if values.dtype.kind == "i":
+                sums = sums.astype(numpy.int64)
+            return dict(zip(uniqueKeys.tolist(), sums.tolist()))
+        sums = collections.defaultdict(int)
+        for key, value in zip(keys, values):
+            if value is not None:
+                sums[key] += value
+        return dict(sums)
+
+    def countBy(self, *keyColumns):
+        """Return a Counter of the records per key, or per tuple of keys if
+        several columns are given, e.g. countBy("profileName", "result")."""
+        if len(keyColumns) == 1:
+            return collections.Counter(self.columns[keyColumns[0]])
+        return collections.Counter(zip(*(self.columns[column] for column in keyColumns)))
+
+    def topN(self, valueColumn, n=10):
+        """Return the n records with the largest values in valueColumn,
+        largest first. Records with equal values keep their order."""
+        values = self.columns[valueColumn]
+        if numpy is not None and isinstance(values, numpy.ndarray):
+            indices = numpy.argsort(-values, kind="stable")[:n].tolist()
+        else:
+            indices = heapq.nlargest(n, (i for i in range(self.length) if values[i] is not None), key=values.__getitem__)
+        return [self.row(index) for index in indices]
+
+    def topNBy(self, keyColumn, valueColumn, n=10, keyFunc=None):
+        """Return the n (key, sum) pairs with the largest sums of valueColumn,
+        e.g. the largest user archives: topNBy("folder", "size", keyFunc=userFolder)."""
+        sums = self.sumBy(keyColumn, valueColumn, keyFunc)
+        return heapq.nlargest(n, sums.items(), key=lambda item: item[1])
+
+
+def folderSizePerUser(stats):
+    """Total size per user archive of a GetFolderStatistics result."""
+    return stats.sumBy("folder", "size", keyFunc=userFolder)
+
+
+def resultCountsPerProfile(results):
+    """Counter of (profileName, result) pairs of a GetWorkerResults result,
+    e.g. {("Exchange", "succeeded"): 712, ("Exchange", "failed"): 3}."""
+    return results.countBy("profileName", "result")
@@ -22,13 +22,21 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
 class MailStoreBaseError(Exception):
+    """Base class of the errors raised by the API clients. msg, e.g. the
+    exception or the API response the error was raised for, is the
+    exception's argument; the clients log errors through their logger."""
     def __init__(self, msg=None):
-        super().__init__()
-        if msg:
-            print(msg)
+        if msg is None:
+            super().__init__()
+        else:
+            super().__init__(msg)
+        self.msg = msg
 
 class MailStoreNoTokenError(MailStoreBaseError):
-    def __init__(self, msg=None):
-        super().__init__()
-        if msg:
-            print(msg)
+    pass
+
+class MailStoreResponseError(MailStoreBaseError):
+    pass
+
+class MailStoreCircuitOpenError(MailStoreBaseError):
+    pass
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Lazy walking of the archive folder hierarchy
+
+GetChildFolders without maxLevels returns the whole hierarchy at once. A
+FolderTree instead fetches one level at a time with maxLevels=1, only for
+the folders actually visited, and remembers what it fetched:
+
+   >>> tree = api.FolderTree()
+   >>> for folder in tree.walk("johndoe", predicate=lambda f: "Deleted" not in f["folder"]):
+   ...     print(folder["folder"])
+
+The children of all folders of one level are fetched concurrently. A
+failed GetChildFolders call raises mailstore.errors.MailStoreResponseError
+and is not remembered, so the folder is fetched again on the next visit.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+
+import mailstore.errors
+
+
+def folderPath(item):
+    """Return the folder path of a GetChildFolders result item."""
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict):
+        return item.get("folder")
+    return getattr(item, "folder", None)
+
+
+def childFolders(client, folder, response):
+    """Return the items of a GetChildFolders response as list. Raises
+    MailStoreResponseError if the call failed."""
+    if response.get("error"):
+        client.log.error("GetChildFolders failed for %r: %s", folder, response["error"])
+        raise mailstore.errors.MailStoreResponseError(response)
+    return list(response.get("result") or [])
+
+
+class FolderTree():
+    """Lazily expanded folder hierarchy of a MailStore Server or SPE instance.
+
+    client:      A synchronous API client.
+    instanceID:  Instance to browse (MailStore SPE only).
+    maxWorkers:  Number of GetChildFolders calls running at the same time.
+    """
+    def __init__(self, client, instanceID=None, maxWorkers=8):
+        self.client = client
+        self.instanceID = instanceID
+        self.maxWorkers = maxWorkers
+
+        self.lock = threading.Lock()
+        self.expanded = {}
+        self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __fetch(self, folder):
+        if self.instanceID is not None:
+            response = self.client.GetChildFolders(self.instanceID, folder=folder, maxLevels=1)
+        else:
+            response = self.client.GetChildFolders(folder=folder, maxLevels=1)
+        return childFolders(self.client, folder, response)
+
+    def children(self, folder=None):
+        """Return the child folders of folder, or the user archives if folder
+        is None. Fetched once and served from memory afterwards."""
+        with self.lock:
+            if folder in self.expanded:
+                return self.expanded[folder]
+        items = self.__fetch(folder)
+        with self.lock:
+            return self.expanded.setdefault(folder, items)
+
+    def expand(self, folders):
+        """Fetch the children of several folders concurrently and return
+        them as list of lists, in the order of folders."""
+        folders = list(folders)
+        if len(folders) < 2:
+            return [self.children(folder) for folder in folders]
+        with self.lock:
+            if self.executor is None:
+                self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.maxWorkers)
+        return list(self.executor.map(self.children, folders))
+
+    def walk(self, folder=None, predicate=None, maxDepth=None):
+        """Yield the folders below folder level by level.
+
+        predicate:  (optional) Called with each folder item. Folders for which
+                    it returns False are skipped together with their subtree.
+        maxDepth:   (optional) Number of levels to descend.
+        """
+        level = [folder]
+        depth = 0
+        while level and (maxDepth is None or depth < maxDepth):
+            nextLevel = []
+            for items in self.expand(level):
+                for item in items:
+                    if predicate is not None and not predicate(item):
+                        continue
+                    yield item
+                    nextLevel.append(folderPath(item))
+            level = nextLevel
+            depth += 1
+
+    def invalidate(self, folder=None):
+        """Forget the fetched children of folder and its subfolders, or of
+        all folders if folder is None."""
+        with self.lock:
+            if folder is None:
+                self.expanded.clear()
+                return
+            for key in list(self.expanded):
+                if key == folder or (key is not None and key.startswith(folder + "/")):
+                    del self.expanded[key]
+
+    def close(self):
+        """Shut down the threads fetching folders concurrently."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+class AsyncFolderTree():
+    """FolderTree for asyncio clients. children(), expand() are coroutines
+    and walk() is an asynchronous generator."""
+    def __init__(self, client, instanceID=None, maxConcurrency=32):
+        self.client = client
+        self.instanceID = instanceID
+        self.semaphore = asyncio.Semaphore(maxConcurrency)
+        self.expanded = {}
+
+    async def __fetch(self, folder):
+        async with self.semaphore:
+            if self.instanceID is not None:
+                response = await self.client.GetChildFolders(self.instanceID, folder=folder, maxLevels=1)
+            else:
+                response = await self.client.GetChildFolders(folder=folder, maxLevels=1)
+        return childFolders(self.client, folder, response)
+
+    async def children(self, folder=None):
+        if folder not in self.expanded:
+            items = await self.__fetch(folder)
+            self.expanded.setdefault(folder, items)
+        return self.expanded[folder]
+
+    async def expand(self, folders):
+        return await asyncio.gather(*(self.children(folder) for folder in folders))
+
+    async def walk(self, folder=None, predicate=None, maxDepth=None):
+        level = [folder]
+        depth = 0
+        while level and (maxDepth is None or depth < maxDepth):
+            nextLevel = []
+            for items in await self.expand(level):
+                for item in items:
+                    if predicate is not None and not predicate(item):
+                        continue
+                    yield item
+                    nextLevel.append(folderPath(item))
+            level = nextLevel
+            depth += 1
+
+    def invalidate(self, folder=None):
+        if folder is None:
+            self.expanded.clear()
+            return
+        for key in list(self.expanded):
+            if key == folder or (key is not None and key.startswith(folder + "/")):
+                del self.expanded[key]
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Incremental parsing of API responses
+
+API responses are JSON objects like
+
+   {"error": null, "token": null, "statusVersion": 2, "statusCode": "succeeded",
+    "result": [...], "logOutput": null}
+
+ResultParser is fed the raw response body chunk by chunk and returns the
+items of the "result" array as soon as they are complete, so that only one
+chunk and the items not yet consumed have to be kept in memory. All other
+top-level fields are collected in ResultParser.values.
+"""
+
+import codecs
+import json
+import re
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+NUMBER_CHARS = "0123456789.eE+-"
+
+# Parser states
+START, KEY, KEY_OR_END, COLON, VALUE, AFTER_VALUE, ITEM, ITEM_OR_END, AFTER_ITEM, END = range(10)
+
+
+class ResultParser():
+    """Push parser for API responses.
+
+    key:  Name of the top-level array whose items are returned by feed().
+    """
+
+    # Marks values that are not complete yet
+    INCOMPLETE = object()
+
+    def __init__(self, key="result"):
+        self.key = key
+        self.values = {}
+        self.textDecoder = codecs.getincrementaldecoder("utf-8-sig")()
+        self.jsonDecoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.state = START
+        self.currentKey = None
+
+    def __decode(self, final):
+        """Decode the JSON value at the current position. A number at the end
+        of the buffer, e.g. "12" of "12.5", might be truncated, so values are
+        only accepted once a character follows that cannot continue them."""
+        try:
+            value, end = self.jsonDecoder.raw_decode(self.buffer, self.pos)
+        except json.JSONDecodeError:
+            if final:
+                raise
+            return self.INCOMPLETE
+        if not final and (end == len(self.buffer) or self.buffer[end] in NUMBER_CHARS):
+            return self.INCOMPLETE
+        self.pos = end
+        return value
+
+    def __unexpected(self, char):
+        raise ValueError("Unexpected character {!r} at position {} of API response".format(char, self.pos))
+
+    def feed(self, data, final=False):
+        """Add the next chunk of the response body and return the list of
+        result items completed by it. Pass final=True with the last chunk."""
+        self.buffer = self.buffer[self.pos:] + self.textDecoder.decode(data, final)
+        self.pos = 0
+        items = []
+
+        while True:
+            self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos == len(self.buffer):
+                break
+            char = self.buffer[self.pos]
+            state = self.state
+
+            if state == START:
+                if char != "{":
+                    self.__unexpected(char)
+                self.pos += 1
+                self.state = KEY_OR_END
+            elif state in (KEY, KEY_OR_END):
+                if char == "}" and state == KEY_OR_END:
+                    self.pos += 1
+                    self.state = END
+                    continue
+                if char != '"':
+                    self.__unexpected(char)
+                key = self.__decode(final)
+                if key is self.INCOMPLETE:
+                    break
+                self.currentKey = key
+                self.state = COLON
+            elif state == COLON:
+                if char != ":":
+                    self.__unexpected(char)
+                self.pos += 1
+                self.state = VALUE
+            elif state == VALUE:
+                if char == "[" and self.currentKey == self.key:
+                    self.pos += 1
+                    self.values[self.key] = None
+                    self.state = ITEM_OR_END
+                    continue
+                value = self.__decode(final)
+                if value is self.INCOMPLETE:
+                    break
+                self.values[self.currentKey] = value
+                self.state = AFTER_VALUE
+            elif state == AFTER_VALUE:
+                if char == ",":
+                    self.state = KEY
+                elif char == "}":
+                    self.state = END
+                else:
+                    self.__unexpected(char)
+                self.pos += 1
+            elif state in (ITEM, ITEM_OR_END):
+                if char == "]" and state == ITEM_OR_END:
+                    self.pos += 1
+                    self.state = AFTER_VALUE
+                    continue
+                item = self.__decode(final)
+                if item is self.INCOMPLETE:
+                    break
+                items.append(item)
+                self.state = AFTER_ITEM
+            elif state == AFTER_ITEM:
+                if char == ",":
+                    self.state = ITEM
+                elif char == "]":
+                    self.state = AFTER_VALUE
+                else:
+                    self.__unexpected(char)
+                self.pos += 1
+            else:
+                self.__unexpected(char)
+
+        if final and self.state != END:
+            raise ValueError("API response ended unexpectedly")
+        return items
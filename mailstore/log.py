@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Logging support for the API clients
+
+The clients log through the standard logging module, to the logger named
+after their module ("mailstore.server" or "mailstore.spe"). Messages are
+formatted lazily, so nothing is built unless a record is actually emitted.
+The client's logLevel (0: none, 1: errors, 2: warnings, 3: info, 4: debug)
+additionally limits what each client logs. At debug level request and
+response payloads are logged, shortened to logPayloadSize characters.
+
+JSONFormatter turns records into one JSON object per line, including the
+structured fields (method, url, token, ...) attached to them:
+
+   >>> handler = logging.StreamHandler()
+   >>> handler.setFormatter(mailstore.log.JSONFormatter())
+   >>> logging.getLogger("mailstore").addHandler(handler)
+"""
+
+import json
+import logging
+
+
+# Client logLevel -> logging level
+LOG_LEVELS = {0: logging.CRITICAL + 10,
+              1: logging.ERROR,
+              2: logging.WARNING,
+              3: logging.INFO,
+              4: logging.DEBUG}
+
+
+class Payload():
+    """Wraps a payload for logging. It is only converted to a string, and
+    shortened to maxLength characters, when the record is emitted."""
+    __slots__ = ("value", "maxLength")
+
+    def __init__(self, value, maxLength=None):
+        self.value = value
+        self.maxLength = maxLength
+
+    def __str__(self):
+        text = self.value if isinstance(self.value, str) else repr(self.value)
+        if self.maxLength is not None and len(text) > self.maxLength:
+            return "{}... ({} characters)".format(text[:self.maxLength], len(text))
+        return text
+
+
+class ClientLogger(logging.LoggerAdapter):
+    """Logger adapter of a client. Records are only created if both the
+    client's logLevel and the logger's configuration enable them, and carry
+    the client's host as structured field."""
+    def __init__(self, logger, logLevel, host=None):
+        super().__init__(logger, {"host": host})
+        self.level = LOG_LEVELS[min(max(logLevel, 0), 4)]
+
+    def isEnabledFor(self, level):
+        return level >= self.level and self.logger.isEnabledFor(level)
+
+    def process(self, msg, kwargs):
+        extra = kwargs.get("extra")
+        kwargs["extra"] = dict(self.extra, **extra) if extra else self.extra
+        return msg, kwargs
+
+
+# Attributes of every LogRecord, which are not structured fields
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats log records as single line JSON objects with the keys time,
+    level, logger, message, the record's structured fields and, if an
+    exception is logged, exception."""
+    def format(self, record):
+        values = {"time": self.formatTime(record),
+                  "level": record.levelname,
+                  "logger": record.name,
+                  "message": record.getMessage()}
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                values[key] = value
+        if record.exc_info:
+            values["exception"] = self.formatException(record.exc_info)
+        return json.dumps(values, default=str)
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Local full-text index of message metadata
+
+Finding messages by subject, sender or date across many folders otherwise
+means calling GetMessages for every folder and filtering the results. A
+MessageIndex stores the message lists in a local SQLite file with an FTS5
+full-text index, so lookups no longer reach the server:
+
+   >>> index = mailstore.messageindex.MessageIndex(api, "messages.db")
+   >>> index.refresh()
+   >>> for message in index.search("invoice", sender="example.com", since="2024-01-01"):
+   ...     print(message["folder"], message["subject"])
+
+The first refresh crawls the folders with GetChildFolders and GetMessages.
+Later refreshes compare the message count and size of every folder from
+GetFolderStatistics with those of the previous refresh, and only fetch the
+messages of folders that changed. The state of indexed folders missing
+from the statistics is unknown; they are looked up in the folder tree,
+fetched again if they still exist and removed otherwise. Failed calls
+raise mailstore.errors.MailStoreResponseError, and an empty folder tree
+never removes indexed folders.
+"""
+
+import collections
+import concurrent.futures
+import json
+import sqlite3
+
+import mailstore.errors
+import mailstore.foldertree
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    scope TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    count INTEGER,
+    size INTEGER,
+    PRIMARY KEY (scope, folder)
+);
+CREATE TABLE IF NOT EXISTS messages (
+    scope TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    id TEXT,
+    date TEXT,
+    subject TEXT,
+    sender TEXT,
+    recipients TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messagesFolder ON messages (scope, folder);
+CREATE INDEX IF NOT EXISTS messagesDate ON messages (scope, date);
+CREATE VIRTUAL TABLE IF NOT EXISTS messageText USING fts5 (
+    subject, sender, recipients, content='messages', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS messagesInsert AFTER INSERT ON messages BEGIN
+    INSERT INTO messageText (rowid, subject, sender, recipients)
+    VALUES (new.rowid, new.subject, new.sender, new.recipients);
+END;
+CREATE TRIGGER IF NOT EXISTS messagesDelete AFTER DELETE ON messages BEGIN
+    INSERT INTO messageText (messageText, rowid, subject, sender, recipients)
+    VALUES ('delete', old.rowid, old.subject, old.sender, old.recipients);
+END;
+"""
+
+# Fields of GetMessages items stored in the indexed columns, by column
+FIELDS = {
+    "id": ("id",),
+    "date": ("date",),
+    "subject": ("subject",),
+    "sender": ("from", "sender"),
+    "recipients": ("to", "recipients"),
+}
+
+
+def fieldValue(item, names):
+    """Return the first of the fields names present in a message item as
+    string. Lists, e.g. of recipients, are joined with spaces."""
+    for name in names:
+        if isinstance(item, dict):
+            value = item.get(name)
+        else:
+            value = getattr(item, name, None)
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            return " ".join(str(entry) for entry in value)
+        return str(value)
+    return None
+
+
+def quotePhrase(text):
+    """Return text as FTS5 phrase, matching it literally."""
+    return '"{}"'.format(text.replace('"', '""'))
+
+
+class MessageIndex():
+    """Local full-text index of the messages of a MailStore Server or SPE instance.
+
+    client:      A synchronous API client.
+    path:        SQLite file keeping the index. One file can be shared by
+                 indexes of different servers or instances.
+    instanceID:  Instance to index (MailStore SPE only).
+    maxWorkers:  Number of GetChildFolders and GetMessages calls running at
+                 the same time.
+    """
+    def __init__(self, client, path, instanceID=None, maxWorkers=8):
+        self.client = client
+        self.instanceID = instanceID
+        self.maxWorkers = maxWorkers
+
+        self.scope = "|".join(str(value) for value in (client.host, client.port, instanceID))
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __call(self, method, **arguments):
+        if self.instanceID is not None:
+            return getattr(self.client, method)(self.instanceID, **arguments)
+        return getattr(self.client, method)(**arguments)
+
+    def fetchMessages(self, folder):
+        """Return the message items of folder as list."""
+        return list(self.__call("GetMessages", folder=folder, stream=True))
+
+    def folderStatistics(self):
+        """Return {folder: (count, size)} from GetFolderStatistics. Raises
+        MailStoreResponseError if the call failed."""
+        response = self.__call("GetFolderStatistics")
+        if response.get("error"):
+            self.client.log.error("GetFolderStatistics failed: %s", response["error"])
+            raise mailstore.errors.MailStoreResponseError(response)
+        return {item["folder"]: (item.get("count"), item.get("size")) for item in response["result"] or []}
+
+    def __fetchFolders(self, folders):
+        """Yield (folder, messages) for folders, fetching up to maxWorkers
+        folders concurrently."""
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.maxWorkers)
+        try:
+            pending = collections.deque()
+            folders = iter(folders)
+            for folder in folders:
+                pending.append((folder, executor.submit(self.fetchMessages, folder)))
+                if len(pending) >= 2 * self.maxWorkers:
+                    break
+            while pending:
+                folder, future = pending.popleft()
+                for nextFolder in folders:
+                    pending.append((nextFolder, executor.submit(self.fetchMessages, nextFolder)))
+                    break
+                yield folder, future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def __store(self, folder, messages, statistics):
+        rows = []
+        for item in messages:
+            values = [fieldValue(item, names) for names in FIELDS.values()]
+            data = item if isinstance(item, dict) else item.toDict()
+            rows.append([self.scope, folder] + values + [json.dumps(data)])
+        count, size = statistics
+        with self.db:
+            self.db.execute("DELETE FROM messages WHERE scope = ? AND folder = ?", (self.scope, folder))
+            self.db.executemany("INSERT INTO messages (scope, folder, id, date, subject, sender, recipients, data) "
+                                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self.db.execute("INSERT OR REPLACE INTO folders (scope, folder, count, size) VALUES (?, ?, ?, ?)",
+                            (self.scope, folder, count, size))
+
+    def __remove(self, folder):
+        with self.db:
+            self.db.execute("DELETE FROM messages WHERE scope = ? AND folder = ?", (self.scope, folder))
+            self.db.execute("DELETE FROM folders WHERE scope = ? AND folder = ?", (self.scope, folder))
+
+    def indexedFolders(self):
+        """Return {folder: (count, size)} as of the last refresh."""
+        return {row[0]: (row[1], row[2]) for row in
+                self.db.execute("SELECT folder, count, size FROM folders WHERE scope = ?", (self.scope,))}
+
+    def __walk(self, folder=None):
+        """Return the paths of all folders below folder, walking the
+        hierarchy with GetChildFolders."""
+        with mailstore.foldertree.FolderTree(self.client, instanceID=self.instanceID, maxWorkers=self.maxWorkers) as tree:
+            return [mailstore.foldertree.folderPath(item) for item in tree.walk(folder)]
+
+    def crawl(self, folder=None):
+        """Index all folders below folder, or all folders if folder is None,
+        walking the hierarchy with GetChildFolders. Returns the number of
+        folders indexed."""
+        folders = self.__walk(folder)
+        if folder is not None:
+            folders.insert(0, folder)
+        found = set(folders)
+        for path in self.indexedFolders() if found else ():
+            if path not in found and (folder is None or path.startswith(folder + "/")):
+                self.__remove(path)
+        statistics = self.folderStatistics()
+        indexed = 0
+        for path, messages in self.__fetchFolders(folders):
+            self.__store(path, messages, statistics.get(path, (len(messages), None)))
+            indexed += 1
+        return indexed
+
+    def refresh(self):
+        """Bring the index up to date. The first refresh crawls all folders,
+        later ones only fetch folders whose statistics changed or which have
+        no statistics, and remove folders no longer in the folder tree.
+        Returns the number of folders fetched."""
+        known = self.indexedFolders()
+        if not known:
+            return self.crawl()
+        statistics = self.folderStatistics()
+        changed = [path for path, values in statistics.items() if known.get(path) != values]
+        unknown = [path for path in known if path not in statistics]
+        if unknown:
+            found = set(self.__walk())
+            for path in unknown:
+                if path in found:
+                    changed.append(path)
+                elif found:
+                    self.__remove(path)
+        for path, messages in self.__fetchFolders(changed):
+            self.__store(path, messages, statistics.get(path, (len(messages), None)))
+        return len(changed)
+
+    def search(self, query=None, subject=None, sender=None, recipient=None, folder=None,
+               since=None, until=None, limit=None):
+        """Return the message items matching all given conditions, ordered by date.
+
+        query:      FTS5 query over subject, sender and recipients, e.g. "invoice OR order".
+        subject:    Text the subject contains.
+        sender:     Text the sender contains, e.g. a domain.
+        recipient:  Text the recipients contain.
+        folder:     Only messages in this folder and its subfolders.
+        since:      Only messages with date >= since, e.g. "2024-01-01".
+        until:      Only messages with date < until.
+        limit:      Maximum number of messages returned.
+        """
+        terms = []
+        if query:
+            terms.append("({})".format(query))
+        for column, text in (("subject", subject), ("sender", sender), ("recipients", recipient)):
+            if text:
+                terms.append("{} : {}".format(column, quotePhrase(text)))
+
+        sql = "SELECT messages.data FROM messages"
+        conditions = ["messages.scope = ?"]
+        parameters = [self.scope]
+        if terms:
+            conditions.append("messages.rowid IN (SELECT rowid FROM messageText WHERE messageText MATCH ?)")
+            parameters.append(" AND ".join(terms))
+        if folder is not None:
+            conditions.append("(messages.folder = ? OR substr(messages.folder, 1, ?) = ?)")
+            parameters.extend((folder, len(folder) + 1, folder + "/"))
+        if since is not None:
+            conditions.append("messages.date >= ?")
+            parameters.append(since)
+        if until is not None:
+            conditions.append("messages.date < ?")
+            parameters.append(until)
+        sql += " WHERE " + " AND ".join(conditions) + " ORDER BY messages.date"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        return [json.loads(row[0]) for row in self.db.execute(sql, parameters)]
+
+    def count(self, folder=None):
+        """Return the number of indexed messages, in folder and its subfolders if given."""
+        if folder is None:
+            row = self.db.execute("SELECT count(*) FROM messages WHERE scope = ?", (self.scope,)).fetchone()
+        else:
+            row = self.db.execute("SELECT count(*) FROM messages WHERE scope = ? AND (folder = ? OR substr(folder, 1, ?) = ?)",
+                                  (self.scope, folder, len(folder) + 1, folder + "/")).fetchone()
+        return row[0]
+
+    def reset(self):
+        """Remove everything indexed, so the next refresh crawls all folders."""
+        with self.db:
+            self.db.execute("DELETE FROM messages WHERE scope = ?", (self.scope,))
+            self.db.execute("DELETE FROM folders WHERE scope = ?", (self.scope,))
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Declarative tables of the wrapped API methods
+
+The methods of mailstore.server.Client and mailstore.spe.Client are not
+written out one by one, but declared in a MethodTable of Method specs:
+name, parameters, docstring and metadata. The wrapper functions are
+generated from the specs the first time they are used, with the same
+signatures and docstrings as hand-written ones.
+
+The request path, the URL-encoded parameter names and the encoders of the
+parameters of every method are looked up once, so building a request only
+encodes the values. The metadata
+is available to other tooling through the client's methodTable:
+
+   >>> spec = mailstore.spe.Client.methodTable["MergeStore"]
+   >>> spec.idempotent, spec.longRunning, spec.instanceScoped
+   (False, True, True)
+"""
+
+import ast
+import functools
+import inspect
+import json
+import urllib.parse
+
+import mailstore.retry
+
+
+# Keyword arguments of the wrappers which are not sent as API parameters,
+# with their default values
+OPTIONS = {"stream": False, "columnar": False, "chunked": False}
+
+
+def encodeBool(value):
+    """Encode a truth value as "true" or "false". Strings are kept, except
+    that "True" and "False" are sent in lower case."""
+    if isinstance(value, str):
+        return value.lower() if value.lower() in ("true", "false") else value
+    return "true" if value else "false"
+
+
+def encodeList(value):
+    """Join the encoded items of a list or tuple with commas."""
+    if isinstance(value, (list, tuple)):
+        return ",".join(encodeValue(item) for item in value)
+    return encodeValue(value)
+
+
+def encodeJSON(value):
+    """Encode a dict, e.g. a configuration, as JSON."""
+    if isinstance(value, (str, bytes)):
+        return value
+    return json.dumps(value, separators=(",", ":"))
+
+
+# Encoders by type of value, for parameters without an encoder of their own
+TYPE_ENCODERS = {
+    bool: encodeBool,
+    int: str,
+    float: repr,
+    list: encodeList,
+    tuple: encodeList,
+    dict: encodeJSON,
+}
+
+
+def encodeValue(value):
+    """Encode a value according to its type. Strings are kept."""
+    if isinstance(value, (str, bytes)):
+        return value
+    encoder = TYPE_ENCODERS.get(type(value))
+    return encoder(value) if encoder is not None else str(value)
+
+
+def encodeArguments(arguments, fields={}):
+    """URL-encode arguments as form data. Only None values are omitted,
+    so 0, False and empty lists are sent. fields maps parameter names to
+    (encoded "name=" prefix, encoder or None) tuples."""
+    parts = []
+    for key, value in arguments.items():
+        if value is None:
+            continue
+        prefix, encoder = fields.get(key) or (urllib.parse.quote_plus(key) + "=", None)
+        parts.append(prefix + urllib.parse.quote_plus(encoder(value) if encoder is not None else encodeValue(value)))
+    return "&".join(parts)
+
+
+class Method():
+    """Spec of a wrapped API method.
+
+    name:         Name of the API method.
+    params:       Parameters of the wrapper as in a function definition,
+                  e.g. "instanceID, folder=None". autoHandleToken and the
+                  options are appended.
+    doc:          Docstring of the wrapper.
+    options:      Keyword arguments of OPTIONS the wrapper accepts, e.g. ("stream",).
+    encoders:     (optional) Dict of parameter name -> function encoding
+                  its values as string, e.g. encodeBool. Values of other
+                  parameters are encoded by type, see encodeValue.
+    longRunning:  The method can return a status token of a long running task.
+    idempotent:   Calling the method again does not change the outcome.
+                  Defaults to mailstore.retry.isIdempotent(name).
+    """
+    def __init__(self, name, params="", doc=None, options=(), encoders=None, longRunning=False, idempotent=None):
+        self.name = name
+        self.source = params
+        self.doc = doc
+        self.options = tuple(options)
+        self.encoders = dict(encoders or {})
+        self.longRunning = longRunning
+        self.idempotent = mailstore.retry.isIdempotent(name) if idempotent is None else idempotent
+        self.path = "/api/invoke/" + name
+
+    def __repr__(self):
+        return "<Method {}({})>".format(self.name, self.source)
+
+    @functools.cached_property
+    def params(self):
+        """Tuple of (name, default) of the API parameters. Required
+        parameters have the default REQUIRED."""
+        arguments = ast.parse("def f({}): pass".format(self.source)).body[0].args
+        defaults = [REQUIRED] * (len(arguments.args) - len(arguments.defaults))
+        defaults += [ast.literal_eval(default) for default in arguments.defaults]
+        return tuple((argument.arg, default) for argument, default in zip(arguments.args, defaults))
+
+    @property
+    def paramNames(self):
+        return tuple(name for name, default in self.params)
+
+    @property
+    def instanceScoped(self):
+        """True for SPE methods invoked in a single instance."""
+        return self.paramNames[:1] == ("instanceID",)
+
+    @functools.cached_property
+    def fields(self):
+        """Dict of parameter name -> (encoded "name=" prefix, encoder or None)."""
+        return {name: (urllib.parse.quote_plus(name) + "=", self.encoders.get(name)) for name in self.paramNames}
+
+    def encode(self, arguments):
+        """Return the URL-encoded form data of arguments."""
+        return encodeArguments(arguments, self.fields)
+
+    def function(self, owner, asynchronous=False):
+        """Return the wrapper function as method of class owner, an
+        'async def' one if asynchronous."""
+        signature = ", ".join(["self"] + ([self.source] if self.source else []) + ["autoHandleToken=None"]
+                              + ["{}={!r}".format(option, OPTIONS[option]) for option in self.options])
+        values = ", ".join("{!r}: {}".format(name, name) for name in self.paramNames)
+        keywords = "".join(", {0}={0}".format(option) for option in ("autoHandleToken",) + self.options)
+        call = "self._callMethod({!r}, {{{}}}{})".format(self.name, values, keywords)
+        source = "{}def {}({}):\n    return {}{}\n".format("async " if asynchronous else "", self.name, signature,
+                                                        "await " if asynchronous else "", call)
+        namespace = {}
+        exec(compile(source, "<{}.{}>".format(owner.__qualname__, self.name), "exec"), namespace)
+        function = namespace[self.name]
+        function.__doc__ = self.doc
+        function.__module__ = owner.__module__
+        function.__qualname__ = "{}.{}".format(owner.__qualname__, self.name)
+        function.methodSpec = self
+        return function
+
+
+class _Required():
+    def __repr__(self):
+        return "REQUIRED"
+
+# Default of required parameters in Method.params
+REQUIRED = _Required()
+
+
+class Wrapper():
+    """Class attribute standing for the wrapper of a Method. It generates
+    the function on first access and replaces itself with it."""
+    def __init__(self, spec, owner, asynchronous=False):
+        self.spec = spec
+        self.owner = owner
+        self.asynchronous = asynchronous
+
+    def __get__(self, instance, owner=None):
+        function = self.spec.function(self.owner, self.asynchronous)
+        setattr(self.owner, self.spec.name, function)
+        return function if instance is None else function.__get__(instance, owner)
+
+
+class MethodTable():
+    """The Method specs of an API, by name."""
+    def __init__(self, methods):
+        self.methods = {method.name: method for method in methods}
+
+    def __getitem__(self, name):
+        return self.methods[name]
+
+    def __contains__(self, name):
+        return name in self.methods
+
+    def __iter__(self):
+        return iter(self.methods.values())
+
+    def __len__(self):
+        return len(self.methods)
+
+    def get(self, name, default=None):
+        return self.methods.get(name, default)
+
+    def install(self, cls, asynchronous=False):
+        """Add the wrappers of all methods not defined by cls itself to cls
+        and make this its methodTable. Usable as class decorator."""
+        for spec in self:
+            current = inspect.getattr_static(cls, spec.name, None)
+            # Keep methods written by hand, in cls or a base class
+            if spec.name in vars(cls) or not (current is None or isinstance(current, Wrapper)
+                                              or getattr(current, "methodSpec", None) is spec):
+                continue
+            setattr(cls, spec.name, Wrapper(spec, cls, asynchronous))
+        cls.methodTable = self
+        return cls
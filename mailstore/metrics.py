@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Instrumentation of API calls
+
+Objects passed as hooks to a client are notified before and after every
+API call. A hook implements beforeCall(record) and afterCall(record); both
+receive the CallRecord of the call, which is complete when afterCall is
+run. Metrics is a hook collecting per-method latency histograms, payload
+sizes, status poll counts and error counts:
+
+   >>> metrics = mailstore.metrics.Metrics()
+   >>> api = mailstore.server.Client(username, password, hostname, hooks=[metrics])
+   >>> api.GetStores()
+   >>> print(metrics.prometheus())
+   >>> metrics.snapshot()["GetStores"]["latency"]["p99"]
+"""
+
+import bisect
+import math
+import threading
+import time
+
+
+class CallRecord():
+    """Measurements of a single API call.
+
+    method:         Name of the API method, e.g. "GetStores" or "get-status".
+    arguments:      Arguments of the call.
+    startTime:      time.perf_counter() when the call was started.
+    duration:       Seconds until the call finished, including status polls
+                    and, for streamed results, reading all items.
+    bytesSent:      Size of the request body.
+    bytesReceived:  Size of the response body as received, i.e. compressed
+                    if the server compressed it. For streamed results, the
+                    status responses read while polling are included.
+    polls:          Number of get-status requests made for the call. With
+                    automatic token handling each of them is also recorded
+                    as a call of "get-status".
+    cached:         True if the response came from the response cache.
+    error:          The exception raised by the call, or the error of the
+                    API response.
+    cancelled:      True if the caller stopped reading a streamed result
+                    before its end.
+    """
+    __slots__ = ("method", "arguments", "startTime", "duration", "bytesSent",
+                 "bytesReceived", "polls", "cached", "error", "cancelled")
+
+    def __init__(self, method, arguments):
+        self.method = method
+        self.arguments = arguments
+        self.startTime = time.perf_counter()
+        self.duration = None
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.polls = 0
+        self.cached = False
+        self.error = None
+        self.cancelled = False
+
+    def finish(self, error=None, cancelled=False):
+        self.duration = time.perf_counter() - self.startTime
+        if error is not None:
+            self.error = error
+        self.cancelled = cancelled
+
+    @property
+    def errorName(self):
+        """Class name of the exception, "APIError" for errors reported in the
+        API response, or None."""
+        if self.error is None:
+            return None
+        if isinstance(self.error, BaseException):
+            return type(self.error).__name__
+        return "APIError"
+
+    def __repr__(self):
+        status = self.errorName or ("cancelled" if self.cancelled else "ok")
+        return "<CallRecord {} {:.3f}s {}>".format(self.method, self.duration or 0, status)
+
+
+class Hook():
+    """Base class of instrumentation hooks, doing nothing."""
+    def beforeCall(self, record):
+        pass
+
+    def afterCall(self, record):
+        pass
+
+
+# Upper bounds of the latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800)
+
+# Upper bounds of the response size buckets in bytes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+class Histogram():
+    """Cumulative histogram with fixed bucket bounds, as used by Prometheus."""
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def cumulative(self):
+        """List of (upper bound, number of values <= bound) including +Inf."""
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """Estimate the q-quantile by interpolating within its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower = 0
+        total = 0
+        for bound, count in zip(self.buckets + (self.max,), self.counts):
+            if count and total + count >= rank:
+                upper = min(bound, self.max)
+                return lower + (upper - lower) * (rank - total) / count
+            total += count
+            lower = bound
+        return self.max
+
+    def toDict(self):
+        return {"count": self.count,
+                "sum": self.sum,
+                "max": self.max,
+                "p50": self.quantile(0.5),
+                "p90": self.quantile(0.9),
+                "p99": self.quantile(0.99),
+                "buckets": {bound: count for bound, count in self.cumulative()}}
+
+
+class MethodMetrics():
+    """Metrics of all calls of one API method."""
+    def __init__(self, latencyBuckets, sizeBuckets):
+        self.calls = 0
+        self.inFlight = 0
+        self.polls = 0
+        self.cacheHits = 0
+        self.cancelled = 0
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.errors = {}
+        self.latency = Histogram(latencyBuckets)
+        self.responseSize = Histogram(sizeBuckets)
+
+    def toDict(self):
+        return {"calls": self.calls,
+                "inFlight": self.inFlight,
+                "polls": self.polls,
+                "cacheHits": self.cacheHits,
+                "cancelled": self.cancelled,
+                "bytesSent": self.bytesSent,
+                "bytesReceived": self.bytesReceived,
+                "errors": dict(self.errors),
+                "latency": self.latency.toDict(),
+                "responseSize": self.responseSize.toDict()}
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class Metrics(Hook):
+    """Hook collecting metrics per API method. It may be shared by several
+    clients and is safe to use from multiple threads.
+
+    latencyBuckets:  Upper bounds of the latency histogram in seconds.
+    sizeBuckets:     Upper bounds of the response size histogram in bytes.
+    """
+    def __init__(self, latencyBuckets=LATENCY_BUCKETS, sizeBuckets=SIZE_BUCKETS):
+        self.latencyBuckets = latencyBuckets
+        self.sizeBuckets = sizeBuckets
+        self.lock = threading.Lock()
+        self.methods = {}
+
+    def __getMethod(self, method):
+        metrics = self.methods.get(method)
+        if metrics is None:
+            metrics = self.methods[method] = MethodMetrics(self.latencyBuckets, self.sizeBuckets)
+        return metrics
+
+    def beforeCall(self, record):
+        with self.lock:
+            self.__getMethod(record.method).inFlight += 1
+
+    def afterCall(self, record):
+        with self.lock:
+            metrics = self.__getMethod(record.method)
+            metrics.inFlight -= 1
+            metrics.calls += 1
+            metrics.polls += record.polls
+            metrics.bytesSent += record.bytesSent
+            metrics.bytesReceived += record.bytesReceived
+            metrics.latency.observe(record.duration)
+            if record.cancelled:
+                metrics.cancelled += 1
+            if record.cached:
+                metrics.cacheHits += 1
+            else:
+                metrics.responseSize.observe(record.bytesReceived)
+            errorName = record.errorName
+            if errorName is not None:
+                metrics.errors[errorName] = metrics.errors.get(errorName, 0) + 1
+
+    def reset(self):
+        with self.lock:
+            for method, metrics in list(self.methods.items()):
+                if metrics.inFlight:
+                    inFlight = metrics.inFlight
+                    metrics = self.methods[method] = MethodMetrics(self.latencyBuckets, self.sizeBuckets)
+                    metrics.inFlight = inFlight
+                else:
+                    del self.methods[method]
+
+    def snapshot(self):
+        """Return the metrics as a dict of method name -> dict."""
+        with self.lock:
+            return {method: metrics.toDict() for method, metrics in sorted(self.methods.items())}
+
+    def prometheus(self, prefix="mailstore_api"):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            methods = sorted(self.methods.items())
+
+            def counter(name, help, attribute, kind="counter"):
+                lines.append("# HELP {}_{} {}".format(prefix, name, help))
+                lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+                for method, metrics in methods:
+                    lines.append("{}_{}{{method=\"{}\"}} {}".format(prefix, name, _label(method), getattr(metrics, attribute)))
+
+            def histogram(name, help, attribute):
+                lines.append("# HELP {}_{} {}".format(prefix, name, help))
+                lines.append("# TYPE {}_{} histogram".format(prefix, name))
+                for method, metrics in methods:
+                    histogram = getattr(metrics, attribute)
+                    for bound, count in histogram.cumulative():
+                        le = "+Inf" if bound == math.inf else repr(float(bound))
+                        lines.append("{}_{}_bucket{{method=\"{}\",le=\"{}\"}} {}".format(prefix, name, _label(method), le, count))
+                    lines.append("{}_{}_sum{{method=\"{}\"}} {}".format(prefix, name, _label(method), histogram.sum))
+                    lines.append("{}_{}_count{{method=\"{}\"}} {}".format(prefix, name, _label(method), histogram.count))
+
+            histogram("call_duration_seconds", "Duration of API calls including status polling.", "latency")
+            histogram("response_size_bytes", "Size of API responses not served from the cache.", "responseSize")
+            counter("calls_total", "Number of finished API calls.", "calls")
+            counter("calls_in_flight", "Number of API calls in progress.", "inFlight", kind="gauge")
+            counter("status_polls_total", "Number of get-status requests made for API calls.", "polls")
+            counter("cache_hits_total", "Number of API calls served from the response cache.", "cacheHits")
+            counter("calls_cancelled_total", "Number of streamed API calls closed before their end.", "cancelled")
+            counter("request_bytes_total", "Bytes sent in request bodies.", "bytesSent")
+            counter("response_bytes_total", "Bytes received in response bodies.", "bytesReceived")
+
+            lines.append("# HELP {}_errors_total Number of failed API calls.".format(prefix))
+            lines.append("# TYPE {}_errors_total counter".format(prefix))
+            for method, metrics in methods:
+                for errorName, count in sorted(metrics.errors.items()):
+                    lines.append("{}_errors_total{{method=\"{}\",error=\"{}\"}} {}".format(prefix, _label(method), _label(errorName), count))
+
+        return "\n".join(lines) + "\n"
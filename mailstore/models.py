@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Typed result models
+
+With resultModels=True, clients return the result items of the methods in
+MODELS as compact __slots__ objects instead of dicts:
+
+   >>> api = mailstore.server.Client(username, password, hostname, resultModels=True)
+   >>> for store in api.GetStores()["result"]:
+   ...     print(store.id, store.name)
+
+Result lists are wrapped in a ModelList, which converts each item only when
+it is first accessed and then drops the dict it was created from.
+"""
+
+import collections.abc
+
+
+class Model():
+    """Base class of the result models.
+
+    Fields listed in __slots__ are stored in slots and read as None if the
+    server did not send them. Any other fields are kept in the extra dict
+    and can be read as attributes as well.
+
+    Models compare equal if they have the same type and fields. They are
+    mutable and may hold lists, so they are not hashable; use a field like
+    id as the key of sets and dicts instead.
+    """
+    __slots__ = ("extra",)
+
+    fieldNames = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.fieldNames = frozenset(cls.__slots__)
+
+    def __init__(self, values):
+        extra = None
+        for key, value in values.items():
+            if key in self.fieldNames:
+                setattr(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self.extra = extra
+
+    def __getattr__(self, name):
+        # Only called for unset slots and unknown names
+        if name in self.fieldNames:
+            return None
+        extra = object.__getattribute__(self, "extra")
+        if extra is not None and name in extra:
+            return extra[name]
+        raise AttributeError(name)
+
+    def toDict(self):
+        """Return the fields as a dict, like the server sent them."""
+        values = {}
+        for name in self.__slots__:
+            try:
+                values[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        values.update(self.extra or {})
+        return values
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.toDict() == other.toDict()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "{}({!r})".format(type(self).__name__, self.toDict())
+
+
+class Store(Model):
+    __slots__ = ("id", "name", "type", "requestedState", "error", "searchResultsAvailable", "path",
+                 "databaseName", "databasePath", "contentPath", "indexPath", "serverName", "userName")
+
+
+class User(Model):
+    __slots__ = ("userName", "fullName", "distinguishedName", "authentication",
+                 "emailAddresses", "pop3UserNames", "privileges", "privilegesOnFolders")
+
+
+class Folder(Model):
+    __slots__ = ("folder", "name")
+
+
+class Message(Model):
+    __slots__ = ("id", "folder", "date", "subject", "size")
+
+
+class WorkerResult(Model):
+    __slots__ = ("id", "profileID", "profileName", "userName", "machineName", "startTime", "completeTime",
+                 "result", "itemsArchived", "itemsExported")
+
+
+class Instance(Model):
+    __slots__ = ("instanceID", "alias", "displayName", "instanceHost", "startMode", "status", "processID")
+
+
+class InstanceHost(Model):
+    __slots__ = ("serverName", "baseDirectory", "status", "version")
+
+
+# Method name -> model of its result items
+MODELS = {
+    "GetChildFolders":  Folder,
+    "GetInstanceHosts": InstanceHost,
+    "GetInstances":     Instance,
+    "GetMessages":      Message,
+    "GetStores":        Store,
+    "GetUserInfo":      User,
+    "GetUsers":         User,
+    "GetWorkerResults": WorkerResult,
+}
+
+
+class ModelList(collections.abc.Sequence):
+    """List of result items which are converted to model objects on first
+    access."""
+    __slots__ = ("model", "items")
+
+    def __init__(self, model, items):
+        self.model = model
+        self.items = items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self.items)))]
+        item = self.items[index]
+        if isinstance(item, dict):
+            item = self.items[index] = self.model(item)
+        return item
+
+    def __repr__(self):
+        return "ModelList({}, {} items)".format(self.model.__name__, len(self.items))
+
+
+def convertResponse(method, jsonValues):
+    """Replace the result of an API response by models, if there is a model
+    for method. Returns the response."""
+    model = MODELS.get(method)
+    if model is None or not isinstance(jsonValues, dict):
+        return jsonValues
+    result = jsonValues.get("result")
+    if isinstance(result, list):
+        jsonValues["result"] = ModelList(model, result)
+    elif isinstance(result, dict):
+        jsonValues["result"] = model(result)
+    return jsonValues
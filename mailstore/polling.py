@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Polling policies for long running tasks
+
+While a task is running, the client repeatedly requests its status. The
+server holds each request until the status changes or the requested wait
+time (millisecondsTimeout) has passed. A polling policy decides the wait
+time of each request. By default the client's waitTime is used for every
+request; AdaptivePolling starts with short waits and backs off for tasks
+that make no visible progress:
+
+   >>> api = mailstore.server.Client(username, password, hostname,
+   ...                               pollingPolicy=mailstore.polling.AdaptivePolling())
+"""
+
+
+class FixedPoller():
+    """Uses the same wait time for every status request."""
+    def __init__(self, waitTime):
+        self.waitTime = waitTime
+
+    def nextWaitTime(self, jsonValues):
+        return self.waitTime
+
+
+class FixedPolling():
+    """Policy using the same wait time in milliseconds for all tasks."""
+    def __init__(self, waitTime=1000):
+        self.waitTime = waitTime
+
+    def newPoller(self, method):
+        return FixedPoller(self.waitTime)
+
+
+class AdaptivePoller():
+    """Grows the wait time exponentially while the status does not change
+    and starts over with the initial wait once statusVersion advances."""
+    def __init__(self, initialWait, maxWait, factor):
+        self.initialWait = initialWait
+        self.maxWait = maxWait
+        self.factor = factor
+        self.waitTime = None
+        self.statusVersion = None
+
+    def nextWaitTime(self, jsonValues):
+        statusVersion = jsonValues.get("statusVersion")
+        if self.waitTime is None or statusVersion != self.statusVersion:
+            self.waitTime = self.initialWait
+        else:
+            self.waitTime = min(self.waitTime * self.factor, self.maxWait)
+        self.statusVersion = statusVersion
+        return int(self.waitTime)
+
+
+# Per-method (initialWait, maxWait) in milliseconds. Quick operations are
+# polled tightly, operations taking minutes to hours back off to long waits.
+PROFILES = {
+    "AttachStore":                     (100, 2000),
+    "CreateStore":                     (100, 2000),
+    "DeleteMessage":                   (100, 1000),
+    "DetachStore":                     (100, 2000),
+    "RenameStore":                     (100, 1000),
+    "RenameUser":                      (100, 1000),
+    "SetStoreProperties":              (100, 2000),
+    "SetStoreRequestedState":          (100, 2000),
+    "CompactMasterDatabase":           (1000, 30000),
+    "CompactStore":                    (1000, 60000),
+    "MaintainFileSystemDatabases":     (1000, 60000),
+    "MergeStore":                      (1000, 60000),
+    "RebuildSelectedStoreIndexes":     (1000, 60000),
+    "RebuildStoreIndex":               (1000, 60000),
+    "RefreshAllStoreStatistics":       (1000, 30000),
+    "RunProfile":                      (1000, 30000),
+    "RunTemporaryProfile":             (1000, 30000),
+    "SyncUsersWithDirectoryServices":  (500, 15000),
+    "UpgradeStore":                    (1000, 60000),
+    "VerifyStore":                     (1000, 60000),
+}
+
+
+class AdaptivePolling():
+    """Policy with exponentially growing wait times.
+
+    initialWait:  Wait time in milliseconds of the first status request, and
+                  after each status change.
+    maxWait:      Upper bound of the wait time in milliseconds.
+    factor:       Growth of the wait time per request without status change.
+    profiles:     (optional) Dict of method name -> (initialWait, maxWait),
+                  overriding PROFILES.
+    """
+    def __init__(self, initialWait=250, maxWait=15000, factor=2.0, profiles=None):
+        self.initialWait = initialWait
+        self.maxWait = maxWait
+        self.factor = factor
+        self.profiles = dict(PROFILES)
+        self.profiles.update(profiles or {})
+
+    def newPoller(self, method):
+        initialWait, maxWait = self.profiles.get(method, (self.initialWait, self.maxWait))
+        return AdaptivePoller(initialWait, maxWait, self.factor)
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Keep-alive HTTPS connection pool used by the API clients"""
+
+import collections
+import http.client
+import select
+import ssl
+import threading
+import time
+import mailstore.tls
+import mailstore.transport
+
+
+class HTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS connection whose TLS handshake resumes session, if given, and
+    checks the server certificate against the normalized thumbprint, if
+    given.
+
+    http.client sends the headers together with a body of type bytes in a
+    single send() call, which saves a TLS record and cannot be delayed by
+    the interaction of Nagle's algorithm and delayed ACKs on the server side.
+    """
+    def __init__(self, host, port=None, timeout=None, context=None, session=None, thumbprint=None):
+        super().__init__(host, port, timeout=timeout, context=context)
+        self.session = session
+        self.thumbprint = thumbprint
+
+    def connect(self):
+        http.client.HTTPConnection.connect(self)
+        self.sock = self._context.wrap_socket(self.sock, server_hostname=self._tunnel_host or self.host,
+                                              session=self.session)
+        if self.thumbprint is not None:
+            try:
+                mailstore.tls.verifyThumbprint(self.sock.getpeercert(binary_form=True), self.thumbprint)
+            except ssl.SSLError:
+                self.close()
+                raise
+
+
+class PooledResponse():
+    """Response of a pooled request.
+
+    Wraps an http.client.HTTPResponse and hands the underlying connection
+    back to its pool as soon as the response body has been read completely.
+    All other attributes are looked up on the wrapped response.
+    """
+    def __init__(self, pool, key, connection, response):
+        self.pool = pool
+        self.key = key
+        self.connection = connection
+        self.response = response
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def read(self, amt=None):
+        data = self.response.read(amt)
+        if self.response.isclosed():
+            self.release()
+        return data
+
+    def release(self):
+        """Return the connection to the pool. Connections whose response has
+        not been read completely cannot be reused and are closed instead."""
+        if self.connection is None:
+            return
+        if not self.response.isclosed():
+            self.connection.close()
+        self.pool.releaseConnection(self.key, self.connection)
+        self.connection = None
+
+    def close(self):
+        self.release()
+        self.response.close()
+
+
+class PoolMixin():
+    """Bookkeeping of the idle connections and request headers of a
+    connection pool, shared by ConnectionPool and
+    mailstore.aio.AsyncConnectionPool, which only add the I/O.
+
+    Up to maxSize idle connections are kept per host:port. Connections that
+    have been idle for more than idleTimeout seconds, or which isDropped()
+    reports as closed, are discarded instead of being reused. Request
+    headers are encoded once per host and set of headers.
+    """
+    def __init__(self, maxSize=10, idleTimeout=60, timeout=None, sslContext=None, thumbprint=None):
+        self.maxSize = maxSize
+        self.idleTimeout = idleTimeout
+        self.timeout = timeout
+        self.sslContext = sslContext
+        self.thumbprint = mailstore.tls.normalizeThumbprint(thumbprint) if thumbprint else None
+
+        self.lock = threading.Lock()
+        self.idleConnections = {}
+        self.headerBlocks = {}
+
+    def getSSLContext(self):
+        """Return the SSL context of new connections, created on first use
+        unless one was given or adopted from the client."""
+        if self.sslContext is None:
+            self.sslContext = ssl.create_default_context()
+        return self.sslContext
+
+    @staticmethod
+    def isDropped(connection):
+        """Return True if the idle connection cannot be used anymore."""
+        raise NotImplementedError
+
+    def getConnection(self, key):
+        """Return an idle connection for key, or None if there is none.
+        Connections that exceeded idleTimeout are closed on the way."""
+        now = time.monotonic()
+        with self.lock:
+            idle = self.idleConnections.get(key)
+            while idle:
+                connection, lastUsed = idle.pop()
+                if now - lastUsed <= self.idleTimeout and not self.isDropped(connection):
+                    return connection
+                connection.close()
+        return None
+
+    def releaseConnection(self, key, connection):
+        """Put a connection back into the pool, or close it if the pool is full."""
+        with self.lock:
+            idle = self.idleConnections.setdefault(key, collections.deque())
+            if len(idle) < self.maxSize:
+                idle.append((connection, time.monotonic()))
+                return
+        connection.close()
+
+    def encodeHeaders(self, key, headers):
+        """Return the Host and request headers for key as formatted by
+        formatHeaders()."""
+        cacheKey = (key, tuple(headers.items()))
+        headerBlock = self.headerBlocks.get(cacheKey)
+        if headerBlock is None:
+            headerBlock = self.formatHeaders(tuple((name.encode("ascii"), str(value).encode("latin-1"))
+                                                   for name, value in [("Host", key)] + list(headers.items())))
+            if len(self.headerBlocks) > 64:
+                self.headerBlocks.clear()
+            self.headerBlocks[cacheKey] = headerBlock
+        return headerBlock
+
+    def formatHeaders(self, headers):
+        """Return headers, a tuple of (name, value) pairs of bytes, in the
+        form sendRequest() needs them."""
+        return headers
+
+    def clear(self):
+        """Close all idle connections."""
+        with self.lock:
+            idleConnections, self.idleConnections = self.idleConnections, {}
+        for idle in idleConnections.values():
+            for connection, lastUsed in idle:
+                connection.close()
+
+    def close(self):
+        self.clear()
+
+
+class ConnectionPool(PoolMixin, mailstore.transport.Transport):
+    """Pool of persistent HTTPS connections, keyed by host:port. This is the
+    default transport of the synchronous clients.
+
+    Idle connections are kept as described in PoolMixin. If sending a
+    request on a reused connection fails, it is sent again on a fresh
+    connection; the server cannot have processed the incomplete request.
+    Failures after the request has been sent are raised, whether to try
+    again is up to the caller (see mailstore.retry).
+
+    All connections share one SSL context, and new connections resume the
+    TLS session of the last connection to the same host:port, which avoids
+    full handshakes when connections are replaced. If thumbprint is given,
+    the server certificate must match it (see mailstore.tls).
+    """
+    def __init__(self, maxSize=10, idleTimeout=60, timeout=None, sslContext=None, thumbprint=None):
+        super().__init__(maxSize, idleTimeout, timeout, sslContext, thumbprint)
+        self.sessions = {}
+
+    def newConnection(self, host, port):
+        """Open a new HTTPS connection to host:port."""
+        return HTTPSConnection(host, port, timeout=self.timeout, context=self.getSSLContext(),
+                               session=self.sessions.get("{}:{}".format(host, port)),
+                               thumbprint=self.thumbprint)
+
+    @staticmethod
+    def isDropped(connection):
+        """Return True if the idle connection cannot be used anymore. An
+        idle connection becomes readable when the server closed it."""
+        sock = connection.sock
+        if sock is None:
+            return True
+        try:
+            return bool(select.select([sock], [], [], 0)[0])
+        except (OSError, ValueError):
+            return True
+
+    def releaseConnection(self, key, connection):
+        """Put a connection back into the pool, or close it if the pool is full."""
+        if connection.sock is None:
+            return
+        # With TLS 1.3 the session ticket arrives after the handshake, so
+        # the session is taken once a response has been read.
+        session = connection.sock.session
+        if session is not None:
+            self.sessions[key] = session
+        super().releaseConnection(key, connection)
+
+    def sendRequest(self, key, connection, path, body, headers):
+        """Send a POST request with preencoded headers."""
+        body = body or b""
+        connection.putrequest("POST", path, skip_host=True, skip_accept_encoding=True)
+        for name, value in self.encodeHeaders(key, headers):
+            connection.putheader(name, value)
+        connection.putheader(b"Content-Length", b"%d" % len(body))
+        connection.endheaders(body)
+
+    def request(self, host, port, path, body=None, headers={}):
+        """Send a POST request to host:port and return a PooledResponse."""
+        key = "{}:{}".format(host, port)
+
+        connection = self.getConnection(key)
+        if connection is not None:
+            try:
+                self.sendRequest(key, connection, path, body, headers)
+            except (http.client.HTTPException, OSError):
+                # The server closed the keep-alive connection before it
+                # received the whole request, send it on a new one.
+                connection.close()
+                connection = None
+
+        try:
+            if connection is None:
+                connection = self.newConnection(host, port)
+                self.sendRequest(key, connection, path, body, headers)
+            return PooledResponse(self, key, connection, connection.getresponse())
+        except Exception:
+            if connection is not None:
+                connection.close()
+            raise
@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Client-side rate and concurrency limits
+
+Parallel calls can easily overload a MailStore Server or SPE host, and
+administrative calls then compete with archiving jobs. A RateLimiter puts
+a token bucket (calls per second) and a limit of requests in flight in
+front of every host, with separate budgets for reading (Get*) and writing
+methods:
+
+   >>> limiter = mailstore.ratelimit.RateLimiter(
+   ...     limits={"read": mailstore.ratelimit.Limit(rate=50, maxInFlight=8),
+   ...             "write": mailstore.ratelimit.Limit(rate=5, maxInFlight=2)},
+   ...     hosts={"archive2:8463": {"read": mailstore.ratelimit.Limit(maxInFlight=2)}})
+   >>> api = mailstore.server.Client(username, password, "archive1", rateLimiter=limiter)
+
+With adaptive set (default), the number of requests in flight adapts to
+the server like TCP congestion control: it grows by one per round trip
+while latencies stay close to the lowest latency seen recently, and is
+reduced by a factor when they rise or transient errors occur. maxInFlight
+is the upper limit. Status requests of long running tasks are not limited.
+Clients sharing a limiter share its budgets.
+"""
+
+import asyncio
+import collections
+import contextlib
+import math
+import threading
+import time
+
+import mailstore.retry
+
+
+# Methods which follow up on a call already admitted and are never limited
+EXEMPT_METHODS = frozenset(["get-status", "cancel-async"])
+
+
+def methodClass(method):
+    """Return the budget class of method, "read" or "write", or None."""
+    if method in EXEMPT_METHODS:
+        return None
+    return "read" if method.startswith("Get") else "write"
+
+
+class Limit():
+    """Limits of one method class.
+
+    rate:         Calls per second, None for no limit.
+    burst:        Calls which can be made at once after a pause, default rate.
+    maxInFlight:  Requests in flight at the same time, None for no limit.
+    minInFlight:  Lower limit of requests in flight when adapting.
+    """
+    def __init__(self, rate=None, burst=None, maxInFlight=None, minInFlight=1):
+        self.rate = rate
+        self.burst = burst
+        self.maxInFlight = maxInFlight
+        self.minInFlight = minInFlight
+
+
+DEFAULT_LIMITS = {"read": Limit(maxInFlight=16), "write": Limit(maxInFlight=4)}
+
+
+class TokenBucket():
+    """Token bucket refilled with rate tokens per second up to burst."""
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return the seconds to wait before using it."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        """Take a token, waiting until it may be used."""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquireAsync(self):
+        """Coroutine version of acquire."""
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Slot():
+    """A request admitted by a Governor. Set sample to False if its latency
+    says nothing about the server's load, e.g. for a response delayed by
+    the waitTime of a long running task."""
+    __slots__ = ("sample",)
+
+    def __init__(self):
+        self.sample = True
+
+
+class Governor():
+    """Rate and concurrency limits of one method class of one host."""
+    def __init__(self, limit, adaptive=True, latencyFactor=2.0, latencyMargin=0.05, decreaseFactor=0.7,
+                 baselineWindow=60.0):
+        self.bucket = TokenBucket(limit.rate, limit.burst) if limit.rate else None
+        self.maxInFlight = limit.maxInFlight
+        self.minInFlight = max(1, limit.minInFlight)
+        self.limit = float(limit.maxInFlight) if limit.maxInFlight else None
+        self.adaptive = adaptive
+        self.latencyFactor = latencyFactor
+        self.latencyMargin = latencyMargin
+        self.decreaseFactor = decreaseFactor
+        self.baselineWindow = baselineWindow
+
+        self.lock = threading.Lock()
+        self.inFlight = 0
+        self.waiters = collections.deque()
+        self.baseline = None
+        self.windowMin = math.inf
+        self.windowStart = time.monotonic()
+        self.lastDecrease = 0.0
+
+    def __enter(self, waiter):
+        """Admit a request, or queue waiter to be called once there may be
+        room and return False."""
+        with self.lock:
+            if self.limit is None or self.inFlight < int(self.limit):
+                self.inFlight += 1
+                return True
+            self.waiters.append(waiter)
+            return False
+
+    def __wake(self):
+        """Call the waiters for which there is room now, lock held."""
+        room = math.inf if self.limit is None else int(self.limit) - self.inFlight
+        woken = []
+        while self.waiters and room > 0:
+            woken.append(self.waiters.popleft())
+            room -= 1
+        return woken
+
+    def __adapt(self, latency, error):
+        """Adapt the limit to a finished request, lock held."""
+        now = time.monotonic()
+        if now - self.windowStart > self.baselineWindow:
+            if self.windowMin < math.inf:
+                self.baseline = self.windowMin
+            self.windowMin = math.inf
+            self.windowStart = now
+        if error is not None:
+            congested = mailstore.retry.isTransient(error)
+        elif latency is None:
+            return
+        else:
+            self.windowMin = min(self.windowMin, latency)
+            self.baseline = latency if self.baseline is None else min(self.baseline, latency)
+            congested = latency > self.baseline * self.latencyFactor + self.latencyMargin
+        if congested:
+            # At most one decrease per round trip
+            if now - self.lastDecrease > (latency or 0.0):
+                self.limit = max(self.minInFlight, self.limit * self.decreaseFactor)
+                self.lastDecrease = now
+        elif error is None:
+            self.limit = min(self.maxInFlight, self.limit + 1.0 / self.limit)
+
+    def release(self, latency=None, error=None):
+        """Finish a request which took latency seconds, or failed with error."""
+        with self.lock:
+            self.inFlight -= 1
+            if self.adaptive and self.limit is not None:
+                self.__adapt(latency, error)
+            woken = self.__wake()
+        for waiter in woken:
+            waiter()
+
+    def acquire(self):
+        """Wait until a request may be made."""
+        if self.bucket is not None:
+            self.bucket.acquire()
+        while True:
+            event = threading.Event()
+            if self.__enter(event.set):
+                return
+            event.wait()
+
+    async def acquireAsync(self):
+        """Coroutine version of acquire."""
+        if self.bucket is not None:
+            await self.bucket.acquireAsync()
+        loop = asyncio.get_running_loop()
+        while True:
+            future = loop.create_future()
+            def waiter(future=future):
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+            if self.__enter(waiter):
+                return
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self.lock:
+                    if waiter in self.waiters:
+                        self.waiters.remove(waiter)
+                        woken = []
+                    else:
+                        # Pass on the wake-up this waiter received
+                        woken = self.__wake()
+                for other in woken:
+                    other()
+                raise
+
+    @contextlib.contextmanager
+    def slot(self):
+        """Context manager admitting a request and timing it."""
+        self.acquire()
+        slot = Slot()
+        start = time.monotonic()
+        try:
+            yield slot
+        except Exception as e:
+            self.release(error=e)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.release(latency=time.monotonic() - start if slot.sample else None)
+
+    @contextlib.asynccontextmanager
+    async def slotAsync(self):
+        """Asynchronous context manager version of slot."""
+        await self.acquireAsync()
+        slot = Slot()
+        start = time.monotonic()
+        try:
+            yield slot
+        except Exception as e:
+            self.release(error=e)
+            raise
+        except BaseException:
+            self.release()
+            raise
+        self.release(latency=time.monotonic() - start if slot.sample else None)
+
+
+class RateLimiter():
+    """Rate and concurrency limits per host and method class.
+
+    limits:    (optional) Limit per method class ("read", "write"), default
+               DEFAULT_LIMITS.
+    hosts:     (optional) Limits overriding those of limits for single hosts,
+               by "host:port", e.g. {"archive2:8463": {"write": Limit(rate=1)}}.
+    adaptive:  If set, adapt the requests in flight to the server's latency.
+    """
+    def __init__(self, limits=None, hosts=None, adaptive=True):
+        self.limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self.hosts = dict(hosts or {})
+        self.adaptive = adaptive
+
+        self.lock = threading.Lock()
+        self.governors = {}
+
+    def governor(self, key, method):
+        """Return the Governor for method on host key, or None if method
+        is not limited."""
+        methodType = methodClass(method)
+        limit = self.hosts.get(key, {}).get(methodType) or self.limits.get(methodType)
+        if limit is None:
+            return None
+        with self.lock:
+            governor = self.governors.get((key, methodType))
+            if governor is None:
+                governor = self.governors[(key, methodType)] = Governor(limit, self.adaptive)
+            return governor
+
+    def slot(self, key, method):
+        """Context manager admitting a request of method to host key."""
+        governor = self.governor(key, method)
+        return governor.slot() if governor is not None else contextlib.nullcontext(Slot())
+
+    def slotAsync(self, key, method):
+        """Asynchronous context manager version of slot."""
+        governor = self.governor(key, method)
+        return governor.slotAsync() if governor is not None else contextlib.nullcontext(Slot())
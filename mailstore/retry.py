@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Retrying API calls
+
+With a RetryPolicy, calls failing with a transient error (a dropped or
+refused connection, a timeout or a 429, 502, 503 or 504 response) are tried
+again after a jittered exponential backoff:
+
+   >>> api = mailstore.server.Client(username, password, hostname, retryPolicy=True)
+
+Only idempotent methods are retried: those marked idempotent in the
+client's method table (see mailstore.methods), by default the Get* and
+SetUser* methods, and get-status, plus those added to the policy's
+idempotent set. Other
+methods, like CreateStore, MergeStore or DeleteMessage, are only tried
+again if the connection was refused, as the server then never received
+the request.
+
+A circuit breaker per host counts consecutive transient failures. After
+breakerThreshold of them, calls to that host fail with a
+MailStoreCircuitOpenError right away instead of waiting for timeouts, until
+breakerTimeout seconds have passed and a trial call succeeds. Clients
+sharing a policy share its breakers.
+"""
+
+import asyncio
+import http.client
+import random
+import ssl
+import threading
+import time
+import urllib.error
+
+import mailstore.errors
+
+
+# Methods not starting with one of IDEMPOTENT_PREFIXES which can still be retried
+IDEMPOTENT_METHODS = frozenset(["get-status"])
+
+IDEMPOTENT_PREFIXES = ("Get", "SetUser")
+
+# HTTP status codes of transient server errors
+TRANSIENT_STATUS = frozenset([429, 502, 503, 504])
+
+
+def isIdempotent(method):
+    """Return True if method can be called again without changing the outcome."""
+    return method in IDEMPOTENT_METHODS or method.startswith(IDEMPOTENT_PREFIXES)
+
+
+def unwrapError(error):
+    """Return the exception a MailStoreBaseError was raised for."""
+    if type(error) is mailstore.errors.MailStoreBaseError and error.__context__ is not None:
+        return error.__context__
+    return error
+
+
+def isTransient(error):
+    """Return True for errors which may not occur again on another try."""
+    error = unwrapError(error)
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code in TRANSIENT_STATUS
+    if isinstance(error, ssl.SSLCertVerificationError):
+        return False
+    return isinstance(error, (OSError, EOFError, http.client.HTTPException, asyncio.TimeoutError))
+
+
+def isUnsent(error):
+    """Return True for errors which prove the request was never received."""
+    return isinstance(unwrapError(error), ConnectionRefusedError)
+
+
+class CircuitBreaker():
+    """Consecutive failure counter of a single host.
+
+    The breaker opens after threshold consecutive failures. While open,
+    calls are refused. After resetTimeout seconds a single trial call is
+    allowed; it closes the breaker on success and opens it again on failure.
+    """
+    def __init__(self, threshold, resetTimeout):
+        self.threshold = threshold
+        self.resetTimeout = resetTimeout
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.openedAt = None
+        self.trial = False
+
+    @property
+    def isOpen(self):
+        return self.openedAt is not None
+
+    def allow(self):
+        """Return True if a call may be made now."""
+        with self.lock:
+            if self.openedAt is None:
+                return True
+            if self.trial or time.monotonic() - self.openedAt < self.resetTimeout:
+                return False
+            self.trial = True
+            return True
+
+    def release(self):
+        """End a call without an outcome, e.g. a cancelled one, so that a
+        trial call can be made again."""
+        with self.lock:
+            self.trial = False
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.openedAt = None
+            self.trial = False
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial = False
+            if self.openedAt is not None or self.failures >= self.threshold:
+                self.openedAt = time.monotonic()
+
+
+class RetryPolicy():
+    """Settings and circuit breakers for retrying API calls.
+
+    maxAttempts:       Number of tries of an idempotent call, including the first.
+    baseDelay:         Backoff in seconds before the second try. It doubles for
+                       every further try, and a random delay up to it is used.
+    maxDelay:          Upper limit of the backoff in seconds.
+    breakerThreshold:  Consecutive transient failures opening a host's breaker.
+                       None disables circuit breakers.
+    breakerTimeout:    Seconds an open breaker refuses calls before a trial call.
+    idempotent:        (optional) Further method names which can be retried.
+    """
+    def __init__(self, maxAttempts=4, baseDelay=0.2, maxDelay=10.0, breakerThreshold=5, breakerTimeout=30.0,
+                 idempotent=()):
+        self.maxAttempts = maxAttempts
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.breakerThreshold = breakerThreshold
+        self.breakerTimeout = breakerTimeout
+        self.idempotent = frozenset(idempotent)
+
+        self.lock = threading.Lock()
+        self.breakers = {}
+
+    def isRetryable(self, method, error, idempotent=None):
+        """Return True if a call of method failing with error can be tried
+        again. idempotent overrides the rules of isIdempotent for method."""
+        if not isTransient(error):
+            return False
+        if idempotent is None:
+            idempotent = isIdempotent(method)
+        return method in self.idempotent or idempotent or isUnsent(error)
+
+    def delay(self, attempt, error=None):
+        """Return the seconds to wait after the given failed try, honoring
+        the Retry-After header of 429 and 503 responses."""
+        delay = random.uniform(0, min(self.maxDelay, self.baseDelay * 2 ** (attempt - 1)))
+        error = unwrapError(error)
+        if isinstance(error, urllib.error.HTTPError) and error.headers is not None:
+            retryAfter = error.headers.get("Retry-After")
+            if retryAfter is not None and retryAfter.isdigit():
+                delay = max(delay, min(self.maxDelay, int(retryAfter)))
+        return delay
+
+    def breaker(self, key):
+        """Return the CircuitBreaker of host key, or None if disabled."""
+        if self.breakerThreshold is None:
+            return None
+        with self.lock:
+            breaker = self.breakers.get(key)
+            if breaker is None:
+                breaker = self.breakers[key] = CircuitBreaker(self.breakerThreshold, self.breakerTimeout)
+            return breaker
+
+    def __before(self, key, breaker, log):
+        if breaker is not None and not breaker.allow():
+            log.error("Circuit breaker for %s is open, failing fast.", key, extra={"url": key})
+            raise mailstore.errors.MailStoreCircuitOpenError("Circuit breaker for {} is open".format(key))
+
+    def __after(self, key, method, breaker, attempt, error, log, idempotent):
+        """Record the outcome of a try and return the seconds to wait
+        before the next one, or None if error must be raised."""
+        transient = isTransient(error)
+        if breaker is not None:
+            if transient:
+                breaker.failure()
+            else:
+                breaker.success()
+        if attempt >= self.maxAttempts or not self.isRetryable(method, error, idempotent):
+            return None
+        delay = self.delay(attempt, error)
+        log.warning("Retrying \"%s\" after %r in %.2f seconds (attempt %d of %d).", method, unwrapError(error),
+                    delay, attempt + 1, self.maxAttempts, extra={"method": method, "url": key})
+        return delay
+
+    def call(self, key, method, function, log, idempotent=None):
+        """Return function(), trying it again on errors retryable for method.
+        key identifies the host for its circuit breaker. idempotent is the
+        method's metadata, if known."""
+        breaker = self.breaker(key)
+        attempt = 0
+        while True:
+            attempt += 1
+            self.__before(key, breaker, log)
+            try:
+                result = function()
+            except Exception as e:
+                delay = self.__after(key, method, breaker, attempt, e, log, idempotent)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            except BaseException:
+                if breaker is not None:
+                    breaker.release()
+                raise
+            if breaker is not None:
+                breaker.success()
+            return result
+
+    async def callAsync(self, key, method, function, log, idempotent=None):
+        """Coroutine version of call, function returns an awaitable."""
+        breaker = self.breaker(key)
+        attempt = 0
+        while True:
+            attempt += 1
+            self.__before(key, breaker, log)
+            try:
+                result = await function()
+            except Exception as e:
+                delay = self.__after(key, method, breaker, attempt, e, log, idempotent)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                if breaker is not None:
+                    breaker.release()
+                raise
+            if breaker is not None:
+                breaker.success()
+            return result
@@ -23,189 +23,19 @@
 
 __doc__ = """Wrapper for MailStore Server's Administration API"""
 
-import urllib.request
-import urllib.error
-import urllib.parse
-import json
-import mailstore.errors
-
-class Client():
-    """The API client class"""
-    def __init__(self,
-                 username = "admin",
-                 password = "admin",
-                 host = "127.0.0.1",
-                 port = 8463,
-                 autoHandleToken = True,
-                 waitTime = 1000,
-                 callbackStatus = None,
-                 logLevel = 2):
-
-        # Initialize connection settings
-        self.username = username
-        self.password = password
-        self.host = host
-        self.port = port
-  
-        # If set to true, client handles tokens/long running tasks itself.
-        self.autoHandleToken = autoHandleToken 
-
-        # Time in milliseconds the API should wait before returning a status token.
-        self.waitTime = waitTime               
-
-        # Define logging parameters
-        self.logLevel = logLevel
-        self.logLevels = {0: "NONE",     # No log output
-                          1: "ERROR",    # Log errors only 
-                          2: "WARNING",  # Log errors and warnings
-                          3: "INFO",     # Log informational about what is being done
-                          4: "DEBUG"}    # Log also send and received data
-
-        # Callback Function for status
-        self.callbackStatus = callbackStatus
-
-        # Initialize password manager
-        self.passwordMgr = urllib.request.HTTPPasswordMgrWithDefaultRealm()
-        self.realm = (None,
-                      "https://{}:{}".format(self.host, self.port),
-                      self.username,
-                      self.password)
-        self.passwordMgr.add_password(*self.realm)
-        self.authMgr = urllib.request.HTTPBasicAuthHandler(password_mgr=self.passwordMgr)
-        self.opener = urllib.request.build_opener(self.authMgr)
-        self.installOpener = urllib.request.install_opener(self.opener)
-
-    # ---------------------------------------------------------------- #
-    # Private Methods                                                  #
-    # ---------------------------------------------------------------- #
-    
-    def __logprint(self, logLevel, *args):
-        """Helper method for printing additional information based on the logLevel. '
-        Levels above 2 are especially useful for debug purpose
-        """
-        
-        if logLevel <= self.logLevel:
-            print(self.logLevels[logLevel], args)
-
-
-    def __hasToken(self, jsonValues):
-        """Helper method to verify if all required attributes for token handling are available."""
-        if "token" in jsonValues and jsonValues["token"] is not None and "statusVersion" in jsonValues:
-            self.__logprint(3, "__hasToken: Status token " + jsonValues["token"] + " detected. statusVersion is " + str(jsonValues["statusVersion"]))
-            return True
-        else:
-            self.__logprint(3, "__hasToken: No status token detected")
-            return False
-
-
-    def __handleToken(self, jsonValues, waitTime=None):
-        """Helper function for status tokens handling"""
-
-        waitTime = waitTime if waitTime is not None else self.waitTime
-
-        # Execute callback function for initial state
-        if callable(self.callbackStatus):
-            self.__logprint(3, "__handleToken: Executing callback function \"" + self.callbackStatus.__name__ + "\" for first status.")
-            self.callbackStatus(jsonValues)
- 
-        while jsonValues["statusCode"] == "running":
-            self.__logprint(3, "__handleToken: Refreshing status for task with token " + jsonValues["token"] + ".")
-            jsonValues = self.GetStatus(jsonValues, waitTime=waitTime)
-            self.__logprint(4, "__handleToken:", jsonValues)
-
-            # Execute callback function for subsequent and final state
-            if callable(self.callbackStatus):
-                self.__logprint(3, "__handleToken: Executing callback function \"" + self.callbackStatus.__name__ + "\" for refreshed status.")
-                self.callbackStatus(jsonValues)
-
-        self.__logprint(3, "__handleToken: Task with token " + jsonValues["token"] + " finished.")
-        return jsonValues
-
-
-    def __callMethod(self, method, arguments = {}, mode = "invoke", autoHandleToken = None):
-        """This is where the magic happens! Method is called by all other public methods that wrap 
-        an Administration API method."""
-
-        autoHandleToken = autoHandleToken if autoHandleToken is not None else self.autoHandleToken
-
-        url = "https://{}:{}/api/{}/{}".format(self.host, self.port, mode, method)
-        data = urllib.parse.urlencode([(key, arguments[key]) for key in list(arguments) if arguments[key]])
-
-        self.__logprint(4, "__callMethod: METHOD:", method)
-        self.__logprint(4, "__callMethod: ARGUMENTS:", arguments)
-        self.__logprint(3, "__callMethod: HTTP POST:", url, data)
-
-        # Try making the HTTP request...
-        try:
-            response = urllib.request.urlopen(url, data=data.encode())
-        # ...and catch exceptions.
-        except urllib.error.HTTPError as e:
-            exceptionString = "{} {} {} {} {}".format(e.code, e.msg, url, e.fp._method, data)
-            self.__logprint(1, exceptionString)
-            raise e
-        except Exception as e:
-            self.__logprint(1, "Unhandled Exception")
-            raise mailstore.errors.MailStoreBaseError(e)
-
-        # Parse server response, which is always in JSON format.
-        decodedValues = response.read().decode("utf-8-sig")
-        jsonValues = json.loads(decodedValues)
-        self.__logprint(4, "__callMethod: HTTP RESPONSE:", decodedValues)
-
-        # Check if response contains a status token and, depending on the
-        # value of autoHandleToken, handle the token ourselves or just
-        # return the JSON response to the caller.
-        if self.__hasToken(jsonValues):
-            if autoHandleToken:
-                self.__logprint(3, "__callMethod: Automatic token handling is ENABLED.")
-                returnData = self.__handleToken(jsonValues)
-            else:
-                self.__logprint(3, "__callMethod: Automatic token handling is DISABLED.")
-                returnData = jsonValues
-        else:
-            returnData = jsonValues
-
-        self.__logprint(3, "__callMethod: Returning data to caller \"" + method + "\"")
-        self.__logprint(4, "__callMethod: ", returnData)
-
-        return returnData
-
-
-    # ---------------------------------------------------------------- #
-    # Public Methods                                                   #
-    # ---------------------------------------------------------------- #
- 
-    def GetStatus(self, jsonValues, waitTime=None):
-        """Retrieve and update status token of long running task. This
-        method is used for automatic token handling, but can also be
-        called directly when manual token handling is done."""
-        
-        waitTime = waitTime if waitTime else self.waitTime
-
-        if self.__hasToken(jsonValues):
-            statusVersion = str(jsonValues["statusVersion"])
-            jsonValues = self.__callMethod("get-status", {"token": jsonValues["token"], "millisecondsTimeout": waitTime, "lastKnownStatusVersion": statusVersion}, mode="", autoHandleToken=False)
-            return jsonValues
-        else:
-            self.__logprint(1, "GetStatus: Cannot get status, no token found!")
-            raise mailstore.errors.MailStoreNoTokenError(jsonValues)
-
-    def CancelAsync(self, jsonValues):
-        """Cancels a long running task."""
-        if self.__hasToken(jsonValues):
-            return self.__callMethod("cancel-async", {"token": jsonValues["token"]}, mode="")
-        else:
-            self.__logprint(1, "CancelAsync: Cannot cancel, no token found!")
-            raise mailstore.errors.MailStoreNoTokenError(jsonValues)
-
-
-    # ---------------------------------------------------------------- #
-    # Wrapped Administration API methods                               #
-    # ---------------------------------------------------------------- #
- 
-    def AttachStore(self, name, type=None, databasePath=None, contentPath=None, indexPath=None,
-                    serverName=None, userName=None, password=None, databaseName=None, requestedState=None, autoHandleToken=None):
-        """Attaches an existing archive store
+import mailstore.aio
+import mailstore.base
+import mailstore.foldertree
+import mailstore.methods
+
+# ---------------------------------------------------------------- #
+# Wrapped Administration API methods                               #
+# ---------------------------------------------------------------- #
+
+METHODS = mailstore.methods.MethodTable([
+    mailstore.methods.Method("AttachStore", "name, type=None, databasePath=None, contentPath=None, indexPath=None, serverName=None, userName=None, password=None, databaseName=None, requestedState=None",
+        longRunning=True,
+        doc="""Attaches an existing archive store
         
         name:            A meaningful name for the archive store. Examples: "Messages 2012" or "2012-01".
         type:            Type of archive store. Must be one of the following:
@@ -226,42 +56,32 @@ class Client():
                            * normal          The archive store should be opened normally. Write access is possible, but new email messages are not archived into this store.
                            * writeProtected  The archive store should be write-protected.
                            * disabled        The archive store should be disabled. This causes the archive store to be closed if it is currently open.
-        """
-        return self.__callMethod("AttachStore", {"name": name, "type": type, "databaseName": databaseName, "databasePath": databasePath,
-                                         "contentPath": contentPath, "indexPath": indexPath, "serverName": serverName,
-                                         "userName": userName, "password": password, "requestedState": requestedState}, autoHandleToken=autoHandleToken)
-
-
-    def ClearUserPrivilegesOnFolders(self, userName, autoHandleToken=None):
-        """ Removes all privileges that a user has on archive folders.
+        """),
 
-        userName:  The user name of the user whose privileges on archive folders should be removed."""
-        return self.__callMethod("ClearUserPrivilegesOnFolders", {"userName": userName}, autoHandleToken=autoHandleToken)
+    mailstore.methods.Method("ClearUserPrivilegesOnFolders", "userName",
+        doc=""" Removes all privileges that a user has on archive folders.
 
+        userName:  The user name of the user whose privileges on archive folders should be removed."""),
 
-    def CompactMasterDatabase(self, autoHandleToken=None):
-        """Compacts the master database"""
-        return self.__callMethod("CompactMasterDatabase", autoHandleToken=autoHandleToken)
+    mailstore.methods.Method("CompactMasterDatabase",
+        longRunning=True,
+        doc="""Compacts the master database"""),
 
+    mailstore.methods.Method("CompactStore", "id",
+        longRunning=True,
+        doc="""Compacts an archive store
 
-    def CompactStore(self, id, autoHandleToken=None):
-        """Compacts an archive store
+        id:  The uniqe identifier of the archive store to be compacted."""),
 
-        id:  The uniqe identifier of the archive store to be compacted."""
-        return self.__callMethod("CompactStore", {"id": id}, autoHandleToken=autoHandleToken)
+    mailstore.methods.Method("CreateProfile", "properties=None, raw=True",
+        encoders={"properties": mailstore.methods.encodeJSON, "raw": mailstore.methods.encodeBool},
+        doc="""Create a new archiving or exporting profile
 
+        properties:  The raw profile properties. Values of an existing profile can be used as template."""),
 
-    def CreateProfile(self, properties=None, raw=True, autoHandleToken=None):
-        """Create a new archiving or exporting profile
-
-        properties:  The raw profile properties. Values of an existing profile can be used as template."""
-        raw = "true" if raw else "false"
-        return self.__callMethod("CreateProfile", {"properties": properties, "raw": raw}, autoHandleToken=autoHandleToken)
-
-
-    def CreateStore(self, name=None, type=None, databasePath=None, contentPath=None, indexPath=None,
-                    serverName=None, userName=None, password=None, databaseName=None, requestedState=None, autoHandleToken=None):
-        """Creates a new archive store and attaches it afterwards
+    mailstore.methods.Method("CreateStore", "name=None, type=None, databasePath=None, contentPath=None, indexPath=None, serverName=None, userName=None, password=None, databaseName=None, requestedState=None",
+        longRunning=True,
+        doc="""Creates a new archive store and attaches it afterwards
 
         name:            A meaningful name for the archive store. Examples: "Messages 2012" or "2012-01".
         type:            Type of archive store. Must be one of the following:
@@ -282,14 +102,10 @@ class Client():
                            * normal          The archive store should be opened normally. Write access is possible, but new email messages are not archived into this store.
                            * writeProtected  The archive store should be write-protected.
                            * disabled        The archive store should be disabled. This causes the archive store to be closed if it is currently open.
-        """
-        return self.__callMethod("CreateStore", {"name": name, "type": type, "databasePath": databasePath, "contentPath": contentPath,
-                                         "indexPath": indexPath, "serverName": serverName, "userName": userName, "password": password,
-                                         "databaseName": databaseName, "requestedState": requestedState}, autoHandleToken=autoHandleToken)
+        """),
 
-
-    def CreateUser(self, userName, privileges, fullName=None, distinguishedName=None, authentication=None, password=None, autoHandleToken=None):
-        """Create a new user
+    mailstore.methods.Method("CreateUser", "userName, privileges, fullName=None, distinguishedName=None, authentication=None, password=None",
+        doc="""Create a new user
 
         userName:           Name of the user to be created.
         privileges:         Comma-separated list of global privileges that the user should be granted. Possible values are:
@@ -318,138 +134,114 @@ class Client():
                             the password is stored, but is ignored when the user logs on to MailStore Server.
         password:           (optional) The password that the user can use to log on to MailStore Server.
                             Only used when authentication is set 'to integrated'.
-        """
-        return self.__callMethod("CreateUser", {"userName": userName, "privileges": privileges, "fullName": fullName,
-                                        "distinguishedName": distinguishedName, "authentication": authentication,
-                                        "password": password}, autoHandleToken=autoHandleToken)
+        """),
 
-
-    def DeleteEmptyFolders(self, folder=None, autoHandleToken=None):
-        """Deletes archive folders which don't contain any messages
+    mailstore.methods.Method("DeleteEmptyFolders", "folder=None",
+        longRunning=True,
+        doc="""Deletes archive folders which don't contain any messages
 
         folder:  (optional) If specified, only this folder and its subfolders are deleted if empty.
                             Folder delimiter is /
-        """
-        return self.__callMethod("DeleteEmptyFolders", {"folder": folder}, autoHandleToken=autoHandleToken)
+        """),
 
+    mailstore.methods.Method("DeleteMessage", "id",
+        longRunning=True,
+        doc="""Deletes a single message from the archive
 
-    def DeleteMessage(self, id, autoHandleToken=None):
-        """Deletes a single message from the archive
+        id:  The uniqe identifier of the message to be deleted in format: <store_id>:<message_num>"""),
 
-        id:  The uniqe identifier of the message to be deleted in format: <store_id>:<message_num>"""
-        return self.__callMethod("DeleteMessage", {"id": id}, autoHandleToken=autoHandleToken)
+    mailstore.methods.Method("DeleteProfile", "id",
+        doc="""Deletes an archiving or export profile
 
+        id:  The unique identifier of the profile to be deleted."""),
 
-    def DeleteProfile(self, id, autoHandleToken=None):
-        """Deletes an archiving or export profile
-
-        id:  The unique identifier of the profile to be deleted."""
-        return self.__callMethod("DeleteProfile", {"id": id}, autoHandleToken=autoHandleToken)
-
-
-    def DeleteUser(self, userName, autoHandleToken=None):
-        """Delete a user 
+    mailstore.methods.Method("DeleteUser", "userName",
+        doc="""Delete a user 
 
         Neither the user's archive nor the user's archived e-mail are deleted when deleting users.
 
         userName:  The user name of the user to be deleted.
-        """
-        return self.__callMethod("DeleteUser", {"userName": userName}, autoHandleToken=autoHandleToken)
+        """),
 
-
-    def DetachStore(self, id, autoHandleToken=None):
-        """Detache archive store
+    mailstore.methods.Method("DetachStore", "id",
+        longRunning=True,
+        doc="""Detache archive store
 
         id:  This unique identifier of the archive store to be detached.
-        """
-        return self.__callMethod("DetachStore", {"id": id}, autoHandleToken=autoHandleToken)
-
+        """),
 
-    def GetActiveSessions(self, autoHandleToken=None):
-        """Retrieve list of active logon sessions"""
-        return self.__callMethod("GetActiveSessions", autoHandleToken=autoHandleToken)
+    mailstore.methods.Method("GetActiveSessions",
+        doc="""Retrieve list of active logon sessions"""),
 
-
-    def GetChildFolders(self, folder=None, maxLevels=None, autoHandleToken=None):
-        """Retrieves a list of child folders of a specific folder
+    mailstore.methods.Method("GetChildFolders", "folder=None, maxLevels=None",
+        options=("stream",),
+        doc="""Retrieves a list of child folders of a specific folder
 
         folder:     (optional) The folder of which the child folders are to be retrieved. If you don't specify this parameter,
                     the method returns the child folders of the root level (user archives).
         maxLevels:  (optional) If maxLevels is not specified, this method returns the child folders recursively,
                     which means that you get the whole folder hierarchy starting at the folder specified.
                     Set maxLevels to a value equal to or greater than 1 to limit the levels returned.
-        """
-        return self.__callMethod("GetChildFolders", {"folder": folder, "maxLevels": maxLevels}, autoHandleToken=autoHandleToken)
-
-
-    def GetComplianceConfiguration(self, autoHandleToken=None):
-        """Retrieve the current compliance configuration"""
-        return self.__callMethod("GetComplianceConfiguration", autoHandleToken=autoHandleToken)
+        stream:     (optional) If set, return a generator over the items of the result
+                    instead of the whole response. The response is parsed while it is read.
+        """),
 
+    mailstore.methods.Method("GetComplianceConfiguration",
+        doc="""Retrieve the current compliance configuration"""),
 
-    def GetDirectoryServicesConfiguration(self, autoHandleToken=None):
-        """Retrieve the current directory service configuration"""
-        return self.__callMethod("GetDirectoryServicesConfiguration", autoHandleToken=autoHandleToken)
+    mailstore.methods.Method("GetDirectoryServicesConfiguration",
+        doc="""Retrieve the current directory service configuration"""),
 
+    mailstore.methods.Method("GetFolderStatistics",
+        options=("columnar",),
+        doc="""Retrieve folder statistics
 
-    def GetFolderStatistics(self, autoHandleToken=None):
-        """Retrieve folder statistics"""
-        return self.__callMethod("GetFolderStatistics", autoHandleToken=autoHandleToken)
+        columnar:  (optional) If set, return a mailstore.columnar.ColumnarResult of the statistics
+                   instead of the response.
+        """),
 
-
-    def GetMessages(self, folder, autoHandleToken=None):
-        """Retrieve list of messages from a specific folder
+    mailstore.methods.Method("GetMessages", "folder",
+        options=("stream",),
+        doc="""Retrieve list of messages from a specific folder
 
         folder:  The folder from which to retrieve the message list
-        """
-        return self.__callMethod("GetMessages", {"folder" : folder}, autoHandleToken=autoHandleToken)
-
-    
-    def GetProfiles(self, raw=True, autoHandleToken=None):
-        """Retrieve list of profiles"""
-        return self.__callMethod("GetProfiles", {"raw": raw}, autoHandleToken=autoHandleToken)
+        stream:  (optional) If set, return a generator over the items of the result
+                 instead of the whole response. The response is parsed while it is read.
+        """),
 
+    mailstore.methods.Method("GetProfiles", "raw=True",
+        encoders={"raw": mailstore.methods.encodeBool},
+        doc="""Retrieve list of profiles"""),
 
-    def GetServerInfo(self, autoHandleToken=None):
-        """Retrieve list of general server information"""
-        return self.__callMethod("GetServerInfo", autoHandleToken=autoHandleToken)
+    mailstore.methods.Method("GetServerInfo",
+        doc="""Retrieve list of general server information"""),
 
-
-    def GetStoreIndexes(self, id, autoHandleToken=None):
-        """Retrieve list of full-text indexes for given arechive store
+    mailstore.methods.Method("GetStoreIndexes", "id",
+        doc="""Retrieve list of full-text indexes for given arechive store
 
         id:  The unique identifier of the archive store whose full-text indexes are to be returned.
-        """
-        return self.__callMethod("GetStoreIndexes", {"id": id}, autoHandleToken=autoHandleToken)
-
-
-    def GetStores(self, autoHandleToken=None):
-        """Retrieve a list of attached archive stores"""
-        return self.__callMethod("GetStores", autoHandleToken=autoHandleToken)
+        """),
 
+    mailstore.methods.Method("GetStores",
+        doc="""Retrieve a list of attached archive stores"""),
 
-    def GetTimeZones(self, autoHandleToken=None):
-        """Retrieve list of all available time zones on the server 
+    mailstore.methods.Method("GetTimeZones",
+        doc="""Retrieve list of all available time zones on the server 
  
         This is particularly useful for GetWorkerResults method.
-        """
-        return self.__callMethod("GetTimeZones", autoHandleToken=autoHandleToken)
-
+        """),
 
-    def GetUserInfo(self, userName, autoHandleToken=None):
-        """Retrieve detailed user information about specific user
+    mailstore.methods.Method("GetUserInfo", "userName",
+        doc="""Retrieve detailed user information about specific user
  
-        userName:  User name of the user whose information should be returned."""
-        return self.__callMethod("GetUserInfo",{"userName":userName}, autoHandleToken=autoHandleToken)
-
+        userName:  User name of the user whose information should be returned."""),
 
-    def GetUsers(self, autoHandleToken=None):
-        """Retrieve list of all users"""
-        return self.__callMethod("GetUsers", autoHandleToken=autoHandleToken)
+    mailstore.methods.Method("GetUsers",
+        doc="""Retrieve list of all users"""),
 
-
-    def GetWorkerResults(self, fromIncluding, toExcluding, timeZoneID="$Local", profileID=None, userName=None, autoHandleToken=None):
-        """Retrieves list of finished profile executions
+    mailstore.methods.Method("GetWorkerResults", "fromIncluding, toExcluding, timeZoneID='$Local', profileID=None, userName=None",
+        options=("stream", "columnar", "chunked"),
+        doc="""Retrieves list of finished profile executions
  
         fromIncluding:  The date which indicates the beginning time, e.g. "2013-01-01T00:00:00".
         toExcluding:    The date which indicates the ending time, e.g. "2013-02-28T23:59:59".
@@ -457,32 +249,35 @@ class Client():
                         which represents the time zone of the operating system.
         profileID:      The profile id for which to retrieve results.
         userName:       The user name for which to retrieve results.
-        """
-        return self.__callMethod("GetWorkerResults", {"fromIncluding": fromIncluding, "toExcluding": toExcluding, "timeZoneID": timeZoneID, "profileID": profileID, "userName": userName}, autoHandleToken=autoHandleToken)
-
-
-    def MaintainFileSystemDatabases(self, autoHandleToken=None):
-        """Runs maintenance on all file system-based archive store databases 
+        stream:         (optional) If set, return a generator over the items of the result
+                        instead of the whole response. The response is parsed while it is read.
+        columnar:       (optional) If set, return a mailstore.columnar.ColumnarResult of the
+                        results instead of the response.
+        chunked:        (optional) If set, fetch the time range in sub-ranges concurrently
+                        and return a generator over the results in chronological order.
+                        Pass a mailstore.chunked.ChunkedFetch to change its settings.
+        """),
+
+    mailstore.methods.Method("MaintainFileSystemDatabases",
+        longRunning=True,
+        doc="""Runs maintenance on all file system-based archive store databases 
 
         Each Firebird embedded database file will be rebuild by this operation 
         by creating a backup file and restoring from that backup file.
-        """
-        return self.__callMethod("MaintainFileSystemDatabases", autoHandleToken=autoHandleToken)
-
+        """),
 
-    def MergeStore(self, id, sourceId, autoHandleToken=None):
-        """Merge two archive stores.
+    mailstore.methods.Method("MergeStore", "id, sourceId",
+        longRunning=True,
+        doc="""Merge two archive stores.
 
         The source archive store remains unchanged and must be detached afterwards.
         
         id:        Unique identifier of destination archive store
         sourceId:  Unique identifier of source archive store
-        """
-        return self.__callMethod("MergeStore", {"id" : id, "sourceId" : sourceId}, autoHandleToken=autoHandleToken)
-
+        """),
 
-    def MoveFolder(self, fromFolder, toFolder, autoHandleToken=None):
-        """Move or rename an archive folder
+    mailstore.methods.Method("MoveFolder", "fromFolder, toFolder",
+        doc="""Move or rename an archive folder
 
         fromFolder: The folder which should be moved or renamed, e.g. "johndoe/Outlook/Inbox".
         toFolder:   The target folder name, e.g. "johndoe/Outlook/Inbox-new".
@@ -501,82 +296,78 @@ class Client():
         The following example moves the folder "Project A" into the folder "Projects".
 
           MoveFolder --fromFolder="johndoe/Outlook/Project A" --toFolder="johndoe/Outlook/Projects/Project A
-        """
-        return self.__callMethod("MoveFolder", {"fromFolder": fromFolder, "toFolder": toFolder}, autoHandleToken=autoHandleToken)
-
+        """),
 
-    def RebuildStoreIndex(self, id, folder, autoHandleToken=None):
-        """Rebuild full-text index
+    mailstore.methods.Method("RebuildStoreIndex", "id, folder",
+        longRunning=True,
+        doc="""Rebuild full-text index
 
         id:      The unique identifier of the archive store that contains the full-text index to be rebuilt.
         folder:  Name of the archive of which the full-text index should be rebuild e.g. "johndoe".
-        """
-        return self.__callMethod("RebuildStoreIndex", {"id": id, "folder": folder}, autoHandleToken=autoHandleToken)
-
+        """),
 
-    def RefreshAllStoreStatistics(self, autoHandleToken=None):
-        """Refresh statistics of all attached archive stores"""
-        return self.__callMethod("RefreshAllStoreStatistics", autoHandleToken=autoHandleToken)
+    mailstore.methods.Method("RefreshAllStoreStatistics",
+        longRunning=True,
+        doc="""Refresh statistics of all attached archive stores"""),
 
-
-    def RenameStore(self, id, name, autoHandleToken=None):
-        """Rename archive store
+    mailstore.methods.Method("RenameStore", "id, name",
+        longRunning=True,
+        doc="""Rename archive store
 
         id:    The unique identifier of the archive store to be renamed.
         name:  The new archive store name.
-        """
-        return self.__callMethod("RenameStore", {"id": id, "name": name}, autoHandleToken=autoHandleToken)
-
+        """),
 
-    def RenameUser(self, oldUserName, newUserName, autoHandleToken=None):
-        """Rename user. 
+    mailstore.methods.Method("RenameUser", "oldUserName, newUserName",
+        longRunning=True,
+        doc="""Rename user. 
 
         Note tht the user's archive will not be renamed by this method.
 
         oldUserName:  User name of the user to be renamed.
         newUserName:  New user name.
-        """
-        return self.__callMethod("RenameUser", {"oldUserName": oldUserName, "newUserName": newUserName}, autoHandleToken=autoHandleToken)
-
+        """),
 
-    def RetryOpenStores(self, autoHandleToken=None):
-        """Retry opening stores that could not be opened the last time"""
-        return self.__callMethod("RetryOpenStores", autoHandleToken=autoHandleToken)
+    mailstore.methods.Method("RetryOpenStores",
+        doc="""Retry opening stores that could not be opened the last time"""),
 
-    def RunTemporaryProfile(self, properties=None, raw=True, autoHandleToken=None):
-        """Run temporary archiving or exporting profile
+    mailstore.methods.Method("RunTemporaryProfile", "properties=None, raw=True",
+        encoders={"properties": mailstore.methods.encodeJSON, "raw": mailstore.methods.encodeBool},
+        longRunning=True,
+        doc="""Run temporary archiving or exporting profile
 
         Using this method will run the profile once, without actually storing the profile configuration in the database.
 
         properties:  The raw profile properties. Values of an existing profile can be used as template
-        """
-        raw = "true" if raw else "false"
-        return self.__callMethod("RunTemporaryProfile", {"properties": properties, "raw": raw}, autoHandleToken=autoHandleToken)
+        """),
 
-    def RunProfile(self, id, autoHandleToken=None):
-        """Run existing archiving or exporting profile
+    mailstore.methods.Method("RunProfile", "id",
+        longRunning=True,
+        doc="""Run existing archiving or exporting profile
 
         id:  The identifier of the profile to be run.
-        """
-        return self.__callMethod("RunProfile", {"id" : id}, autoHandleToken=autoHandleToken)
+        """),
 
-    def SetComplianceConfiguration(self, config, autoHandleToken=None):
-        """Set compliance configuration
+    mailstore.methods.Method("SetComplianceConfiguration", "config",
+        encoders={"config": mailstore.methods.encodeJSON},
+        idempotent=True,
+        doc="""Set compliance configuration
 
         config:  Raw configuration object. Use GetComplianceConfiguration to retrieve a valid object.
-        """
-        return self.__callMethod("SetComplianceConfiguration", {"config": config}, autoHandleToken=autoHandleToken)
+        """),
 
-    def SetDirectoryServicesConfiguration(self, config, autoHandleToken=None):
-        """Set directory service configuration
+    mailstore.methods.Method("SetDirectoryServicesConfiguration", "config",
+        encoders={"config": mailstore.methods.encodeJSON},
+        idempotent=True,
+        doc="""Set directory service configuration
 
         config:  Raw configuration object. Use GetDirectoryServicesConfiguraion to retrieve a valid object.
-        """ 
-        return self.__callMethod("SetDirectoryServicesConfiguration", {"config" : config}, autoHandleToken=autoHandleToken)
+        """),
 
-    def SetStoreProperties(self, id, type=None, databasePath=None, contentPath=None, indexPath=None,
-                           serverName=None, userName=None, password=None, databaseName=None, autoHandleToken=None):
-        """Set properties of a store
+    mailstore.methods.Method("SetStoreProperties", "id, type=None, databasePath=None, contentPath=None, indexPath=None, serverName=None, userName=None, password=None, databaseName=None",
+        longRunning=True,
+        idempotent=True,
+        doc="""Set properties of a store
 
         id:              Unique identifier of archive store to be modified.
         type:            Type of archive store. Must be one of the following:
@@ -592,14 +383,12 @@ class Client():
         userName:        Username for database access (MS SQL Server and PostgreSQL only)
         password:        Password for database access MS SQL Server and PostgreSQL only)
         databaseName:    Name of SQL database containing folder information and e-mail metadata.
-        """
-        return self.__callMethod("SetStoreProperties", {"id": id, "type": type, "databaseName": databaseName, "databasePath": databasePath,
-                                         "contentPath": contentPath, "indexPath": indexPath, "serverName": serverName,
-                                         "userName": userName, "password": password}, autoHandleToken=autoHandleToken)
-
+        """),
 
-    def SetStoreRequestedState(self, id, requestedState, autoHandleToken=None):
-        """Set requested state of an archive store
+    mailstore.methods.Method("SetStoreRequestedState", "id, requestedState",
+        longRunning=True,
+        idempotent=True,
+        doc="""Set requested state of an archive store
 
         id:              Unique identifier of the archive store whose requested state should be set.
         requestedState:  Status of the archive store after attaching. Must be one of the follwing 
@@ -607,76 +396,61 @@ class Client():
                            * normal          The archive store should be opened normally. Write access is possible, but new email messages are not archived into this store.
                            * writeProtected  The archive store should be write-protected.
                            * disabled        The archive store should be disabled. This causes the archive store to be closed if it is currently open.
-        """
-        return self.__callMethod("SetStoreRequestedState", {"id": id, "requestedState": requestedState}, autoHandleToken=autoHandleToken)
-
+        """),
 
-    def SetUserAuthentication(self, userName, authentication, autoHandleToken=None):
-        """Set authentication mode of a user
+    mailstore.methods.Method("SetUserAuthentication", "userName, authentication",
+        doc="""Set authentication mode of a user
 
         userName:        The user name of the user whose authentication mode should be set.
         authentication:  The authentication mode. Possible values are:
                            * integrated          Specifies MailStore-integrated authentication. This is the default value.
                            * directoryServices   Specified Directory Services authentication. If this value is specified,
                                                  the password is stored, but is ignored when the user logs on to MailStore Server.
-        """
-        return self.__callMethod("SetUserAuthentication", {"userName": userName, "authentication": authentication}, autoHandleToken=autoHandleToken)
-
+        """),
 
-    def SetUserDistinguishedName(self, userName, distinguishedName=None, autoHandleToken=None):
-        """Set distinguished name (DN) of a user
+    mailstore.methods.Method("SetUserDistinguishedName", "userName, distinguishedName=None",
+        doc="""Set distinguished name (DN) of a user
 
         userName            The user name of the user whose distinguished name should be set (or removed).
         distinguishedName:  (optional) The distinguished name to be set. If this argument is not specified,
                             the distinguished name of the specified user is removed.
-        """
-        return self.__callMethod("SetUserDistinguishedName", {"userName": userName, "distinguishedName": distinguishedName}, autoHandleToken=autoHandleToken)
-
+        """),
 
-    def SetUserEmailAddresses(self, userName, emailAddresses=None, autoHandleToken=None):
-        """Sets the e-mail addresses of a user
+    mailstore.methods.Method("SetUserEmailAddresses", "userName, emailAddresses=None",
+        encoders={"emailAddresses": mailstore.methods.encodeList},
+        doc="""Sets the e-mail addresses of a user
 
         userName:        The user name of the user whose e-mail addresses are to be set.
         emailAddresses:  (optional) A comma-separated list of e-mail addresses. The first e-mail address 
                          in the list must be the user's primary e-mail address.
-        """
-        if isinstance(emailAddresses, (list, tuple)):
-            emailAddresses = ",".join(emailAddresses)
-        return self.__callMethod("SetUserEmailAddresses", {"userName": userName, "emailAddresses": emailAddresses}, autoHandleToken=autoHandleToken)
+        """),
 
-
-    def SetUserFullName(self, userName, fullName=None, autoHandleToken=None):
-        """Set the full name (display name) of a user
+    mailstore.methods.Method("SetUserFullName", "userName, fullName=None",
+        doc="""Set the full name (display name) of a user
 
         userName:  The user name of the user whose full name (display name) should be set (or removed).
         fullName:  (optional) The full name to be set. If this argument is not specified, the full 
                    name of the specified user is removed.
-        """
-        return self.__callMethod("SetUserFullName", {"userName": userName, "fullName": fullName}, autoHandleToken=autoHandleToken)
+        """),
 
-
-    def SetUserPassword(self, userName, password, autoHandleToken=None):
-        """Set password of a user 
+    mailstore.methods.Method("SetUserPassword", "userName, password",
+        doc="""Set password of a user 
 
         userName:  The user name of the user whose MailStore Server should be set.
         password:  The new password.
-        """
-        return self.__callMethod("SetUserPassword", {"userName": userName, "password": password}, autoHandleToken=autoHandleToken)
+        """),
 
-
-    def SetUserPop3UserNames(self, userName, pop3UserNames=None, autoHandleToken=None):
-        """Sets POP3 user names of a user (used for MailStore Proxy).
+    mailstore.methods.Method("SetUserPop3UserNames", "userName, pop3UserNames=None",
+        encoders={"pop3UserNames": mailstore.methods.encodeList},
+        doc="""Sets POP3 user names of a user (used for MailStore Proxy).
 
         userName:       The user name of the user whose POP3 user names should be set.
         pop3UserNames:  (optional) A comma-separated list of POP3 user names that should be set.
-        """
-        if isinstance(pop3UserNames, (list, tuple)):
-            pop3UserNames = ",".join(pop3UserNames)
-        return self.__callMethod("SetUserPop3UserNames", {"userName": userName, "pop3UserNames": pop3UserNames}, autoHandleToken=autoHandleToken)
+        """),
 
-
-    def SetUserPrivileges(self, userName, privileges, autoHandleToken=None):
-        """Set the privileges of a user
+    mailstore.methods.Method("SetUserPrivileges", "userName, privileges",
+        encoders={"privileges": mailstore.methods.encodeList},
+        doc="""Set the privileges of a user
 
         userName:  The user name of the user whose global privileges should be set.
         privileges:         Comma-separated list of global privileges that the user should be granted. Possible values are:
@@ -696,14 +470,11 @@ class Client():
                                                        been granted delete access. In addition, compliance settings may be in 
                                                        effect, preventing administrators and normal users from deleting messages 
                                                        even when they have been granted the privilege to do so.
-        """
-        if isinstance(privileges, (list, tuple)):
-            privileges = ",".join(privileges)
-        return self.__callMethod("SetUserPrivileges", {"userName": userName, "privileges": privileges}, autoHandleToken=autoHandleToken)
+        """),
 
-
-    def SetUserPrivilegesOnFolder(self, userName, folder, privileges, autoHandleToken=None):
-        """Set user's privileges on a specific folder
+    mailstore.methods.Method("SetUserPrivilegesOnFolder", "userName, folder, privileges",
+        encoders={"privileges": mailstore.methods.encodeList},
+        doc="""Set user's privileges on a specific folder
 
         userName:    The user name of the user who should be granted or denied privileges.
         folder:      The folder on which the user should be granted or denied privileges.
@@ -713,35 +484,62 @@ class Client():
                        * read    The user is granted read access to the specified folder.
                        * write   The user is granted write access to the specified folder.
                        * delete  The user is granted delete access to the specified folder.
-        """
-        if isinstance(privileges, (list, tuple)):
-            privileges = ",".join(privileges)
-        return self.__callMethod("SetUserPrivilegesOnFolder", {"userName": userName, "folder": folder, "privileges": privileges}, autoHandleToken=autoHandleToken)
+        """),
 
-
-    def SyncUsersWithDirectoryServices(self, dryRun=None, autoHandleToken=None):
-        """Synchronizes with currently configured directory service
+    mailstore.methods.Method("SyncUsersWithDirectoryServices", "dryRun=None",
+        encoders={"dryRun": mailstore.methods.encodeBool},
+        longRunning=True,
+        doc="""Synchronizes with currently configured directory service
 
         dryRun: if set, only retrieve changes from the directory service syncronization
                 but do not store them in the user database.
-        """
-        dryRun = "true" if dryRun else "false"
-        return self.__callMethod("SyncUsersWithDirectoryServices", {"dryRun": dryRun}, autoHandleToken=autoHandleToken)
+        """),
 
-
-    def UpgradeStore(self, id, autoHandleToken=None):
-        """Upgrade archive store 
+    mailstore.methods.Method("UpgradeStore", "id",
+        longRunning=True,
+        doc="""Upgrade archive store 
       
         Only useful for archive stores that have been created in MailStore Server 5.x or earlier.
 
         id:  The unique identifier of the archive store to be upgraded.
-        """
-        return self.__callMethod("UpgradeStore", {"id": id}, autoHandleToken=autoHandleToken)
-
+        """),
 
-    def VerifyStore(self, id, autoHandleToken=None):
-        """Verify content of an archive store.
+    mailstore.methods.Method("VerifyStore", "id",
+        longRunning=True,
+        doc="""Verify content of an archive store.
 
         id: The uniqe identifier of the archive store to be verified.
+        """),
+])
+
+
+@METHODS.install
+class Client(mailstore.base.BaseClient):
+    """The API client class"""
+
+    defaultPort = 8463
+
+    # ---------------------------------------------------------------- #
+    # Helper methods                                                   #
+    # ---------------------------------------------------------------- #
+
+    def FolderTree(self, maxWorkers=8):
+        """Return a mailstore.foldertree.FolderTree for lazily walking the archive folders.
+
+        Child folders are fetched level by level with GetChildFolders(maxLevels=1),
+        only for the folders visited, and are remembered by the tree.
+
+        maxWorkers:  Number of GetChildFolders calls running at the same time.
         """
-        return self.__callMethod("VerifyStore", {"id": id}, autoHandleToken=autoHandleToken)
+        return mailstore.foldertree.FolderTree(self, maxWorkers=maxWorkers)
+
+
+class AsyncClient(mailstore.aio.AsyncClientMixin, Client):
+    """The asyncio API client class
+
+    Provides the same methods as Client, but as coroutines which do not
+    block the event loop, e.g. stores = await api.GetStores()"""
+
+    def FolderTree(self, maxConcurrency=32):
+        """Return a mailstore.foldertree.AsyncFolderTree for lazily walking the archive folders."""
+        return mailstore.foldertree.AsyncFolderTree(self, maxConcurrency=maxConcurrency)
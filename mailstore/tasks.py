@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Concurrent handling of long running tasks
+
+Calls made with autoHandleToken=False return immediately with a status
+token. A TaskManager takes many of these tokens and polls their status
+concurrently over a bounded pool of worker threads:
+
+   >>> tasks = mailstore.tasks.TaskManager(api, maxWorkers=8)
+   >>> for store in api.GetStores()["result"]:
+   ...     tasks.add(api.VerifyStore(store["id"], autoHandleToken=False))
+   >>> results = tasks.waitAll()
+"""
+
+import concurrent.futures
+import threading
+import mailstore.errors
+
+
+class Task():
+    """A long running task, identified by its status token.
+
+    status holds the most recent status returned by the server.
+    """
+    def __init__(self, jsonValues, name=None):
+        self.status = jsonValues
+        self.name = name
+        self.future = concurrent.futures.Future()
+        self.poller = None
+
+    @property
+    def token(self):
+        return self.status.get("token")
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        """Wait for the task to finish and return its final status."""
+        return self.future.result(timeout)
+
+    def __repr__(self):
+        return "<Task {} {}>".format(self.name or self.token, self.status.get("statusCode"))
+
+
+class TaskManager():
+    """Polls the status of many long running tasks concurrently.
+
+    client:          A synchronous API client, e.g. mailstore.server.Client.
+    maxWorkers:      Maximum number of status requests in flight.
+    waitTime:        Time in milliseconds the server waits for a status change
+                     before answering a status request. Defaults to the
+                     client's pollingPolicy or waitTime.
+    callbackStatus:  Called with every status received for any of the tasks.
+                     Defaults to the client's callbackStatus.
+    """
+    def __init__(self, client, maxWorkers=8, waitTime=None, callbackStatus=None):
+        self.client = client
+        self.waitTime = waitTime
+        self.callbackStatus = callbackStatus if callbackStatus is not None else client.callbackStatus
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=maxWorkers)
+
+        self.lock = threading.Lock()
+        self.tasks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def __callback(self, jsonValues):
+        if callable(self.callbackStatus):
+            self.callbackStatus(jsonValues)
+
+    def __poll(self, task):
+        """Refresh the status of a task once and reschedule it while it is
+        still running. Rescheduling instead of looping lets all tasks take
+        turns on the workers."""
+        try:
+            task.status = self.client.GetStatus(task.status, waitTime=task.poller.nextWaitTime(task.status))
+            self.__callback(task.status)
+        except Exception as e:
+            self.__resolve(task, error=e)
+            return
+
+        if task.status["statusCode"] == "running":
+            try:
+                self.__schedule(task)
+            except RuntimeError:
+                # Shut down in the meantime, the task has been cancelled
+                pass
+        else:
+            self.__resolve(task, task.status)
+
+    def __schedule(self, task):
+        """Queue the next status request of a task. If the manager has been
+        shut down, the task's future is cancelled and RuntimeError raised."""
+        try:
+            self.executor.submit(self.__poll, task)
+        except RuntimeError:
+            self.__cancel(task)
+            raise
+
+    def __cancel(self, task):
+        """Cancel the future of a task and wake up those waiting for it."""
+        with self.lock:
+            if not task.future.done() and task.future.cancel():
+                task.future.set_running_or_notify_cancel()
+
+    @staticmethod
+    def __resolve(task, result=None, error=None):
+        """Set the result or error of a task, unless its future was cancelled."""
+        try:
+            if error is not None:
+                task.future.set_exception(error)
+            else:
+                task.future.set_result(result)
+        except concurrent.futures.InvalidStateError:
+            pass
+
+    def add(self, jsonValues, name=None, method=None):
+        """Start tracking a task and return its Task object.
+
+        jsonValues:  Response of an API call made with autoHandleToken=False.
+                     Responses without a status token are taken as finished,
+                     unless they are running, which raises
+                     MailStoreNoTokenError without adding a task.
+        name:        (optional) A name to identify the task, e.g. the store id.
+        method:      (optional) Name of the API method which started the task,
+                     used to pick the polling profile of the client's
+                     pollingPolicy.
+        """
+        running = jsonValues.get("statusCode") == "running"
+        if running and not self.client._hasToken(jsonValues):
+            raise mailstore.errors.MailStoreNoTokenError(jsonValues)
+        task = Task(jsonValues, name)
+        task.poller = self.client._newPoller(method, self.waitTime)
+        with self.lock:
+            self.tasks.append(task)
+
+        self.__callback(jsonValues)
+        if running:
+            self.__schedule(task)
+        else:
+            task.future.set_result(jsonValues)
+        return task
+
+    def cancel(self, task):
+        """Ask the server to cancel a running task."""
+        if not task.done():
+            return self.client.CancelAsync(task.status)
+
+    def asCompleted(self, tasks=None, timeout=None):
+        """Iterate over tasks as they finish. Defaults to all tasks added."""
+        tasks = tasks if tasks is not None else list(self.tasks)
+        byFuture = {task.future: task for task in tasks}
+        for future in concurrent.futures.as_completed(byFuture, timeout):
+            yield byFuture[future]
+
+    def waitAny(self, tasks=None, timeout=None):
+        """Wait until at least one of the tasks has finished and return the
+        finished tasks."""
+        tasks = tasks if tasks is not None else list(self.tasks)
+        byFuture = {task.future: task for task in tasks}
+        done, pending = concurrent.futures.wait(byFuture, timeout, concurrent.futures.FIRST_COMPLETED)
+        return [byFuture[future] for future in done]
+
+    def waitAll(self, tasks=None, timeout=None):
+        """Wait until all tasks have finished and return their final status,
+        in the order the tasks were added. Raises the first error of a
+        failed status request."""
+        tasks = tasks if tasks is not None else list(self.tasks)
+        concurrent.futures.wait([task.future for task in tasks], timeout)
+        return [task.result(0) for task in tasks]
+
+    def shutdown(self, wait=True):
+        """Stop the worker threads. Tasks still running are no longer polled
+        and their futures are cancelled; the tasks keep running on the
+        server. With wait=True, status requests in flight are completed
+        first."""
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+        with self.lock:
+            tasks = list(self.tasks)
+        for task in tasks:
+            self.__cancel(task)
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """TLS settings of the API clients
+
+Each client creates a single ssl.SSLContext, shared by all its connections.
+By default the server certificate is verified against the system's trusted
+CAs. MailStore servers commonly use self-signed certificates, which can be
+trusted by passing the certificate (or its CA) as caFile, or by pinning the
+certificate's thumbprint as shown in the MailStore management console:
+
+   >>> api = mailstore.spe.Client(username, password, hostname,
+   ...                            thumbprint="e0 9f 8e 2b ...")
+
+With a pinned thumbprint the certificate chain and host name are not
+checked, but connections to servers presenting any other certificate fail.
+"""
+
+import hashlib
+import hmac
+import ssl
+
+
+# Thumbprint length in hex digits -> hash algorithm
+THUMBPRINT_ALGORITHMS = {40: "sha1", 64: "sha256"}
+
+
+def normalizeThumbprint(thumbprint):
+    """Return a thumbprint as lowercase hex digits without separators."""
+    digits = "".join(c for c in thumbprint.lower() if c in "0123456789abcdef")
+    if len(digits) not in THUMBPRINT_ALGORITHMS:
+        raise ValueError("Thumbprint must be a SHA1 or SHA256 hash: {!r}".format(thumbprint))
+    return digits
+
+
+def certificateThumbprint(certificate, algorithm="sha1"):
+    """Return the thumbprint of a DER encoded certificate."""
+    return hashlib.new(algorithm, certificate).hexdigest()
+
+
+def verifyThumbprint(certificate, thumbprint):
+    """Raise ssl.SSLCertVerificationError unless the DER encoded certificate
+    matches the normalized thumbprint."""
+    actual = certificateThumbprint(certificate or b"", THUMBPRINT_ALGORITHMS[len(thumbprint)])
+    if not hmac.compare_digest(actual, thumbprint):
+        raise ssl.SSLCertVerificationError("Server certificate thumbprint {} does not match the pinned thumbprint {}".format(actual, thumbprint))
+
+
+def createContext(caFile=None, thumbprint=None, verify=True):
+    """Create the SSL context of a client.
+
+    caFile:      (optional) File with trusted certificates in PEM format,
+                 used instead of the system's trusted CAs.
+    thumbprint:  (optional) Pinned thumbprint of the server certificate,
+                 which replaces the verification of chain and host name.
+    verify:      If False, server certificates are not verified at all.
+    """
+    context = ssl.create_default_context(cafile=caFile)
+    if thumbprint is not None or not verify:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """HTTP transports used by the API clients
+
+A transport sends the POST requests of a client. It implements
+
+   request(host, port, path, body, headers) -> response
+   close()
+
+where the response has the attributes status, reason and headers, a
+read(amt=None) method returning up to amt bytes of the body (b"" at its
+end) and a close() method. Asynchronous transports implement request() as
+a coroutine and the response's read() as a coroutine, and have an aclose()
+coroutine closing connections bound to the event loop.
+
+The default transports are mailstore.pool.ConnectionPool, using persistent
+http.client connections, and mailstore.aio.AsyncConnectionPool for the
+asyncio clients. If the httpx package is installed with HTTP/2 support
+(pip install mailstore[http2]), HTTP2Transport and AsyncHTTP2Transport
+multiplex all requests to a server over a single connection:
+
+   >>> api = mailstore.server.Client(username, password, hostname, caFile="ca.pem",
+   ...                               transport=mailstore.transport.HTTP2Transport())
+
+A transport created without an sslContext uses the SSL context of the
+client it is passed to (see applyClientTLS), so caFile and the other TLS
+settings of the client apply to it. Pinned thumbprints are only enforced
+by ConnectionPool and AsyncConnectionPool, which check them before
+sending a request; they must be given to the transport as well.
+
+Transports return the body as sent by the server. The clients request
+compressed responses (see ACCEPT_ENCODING) and wrap every response with
+decodeResponse() or decodeAsyncResponse(), which decompress gzip, deflate
+and, if the brotli package is installed (pip install mailstore[brotli]),
+br bodies while they are read, so streamed results are parsed without
+holding the whole body in memory.
+"""
+
+import asyncio
+import ssl
+import threading
+import zlib
+import mailstore.tls
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+
+# Content codings the clients accept, in order of preference
+CONTENT_CODINGS = (["br"] if brotli is not None else []) + ["gzip", "deflate"]
+ACCEPT_ENCODING = ", ".join(CONTENT_CODINGS)
+
+
+class Transport():
+    """Base class of synchronous transports.
+
+    sslContext is the SSL context of the connections, None until set by
+    applyClientTLS if the transport was created without one. thumbprint is
+    the normalized thumbprint the transport enforces, if any.
+    """
+    sslContext = None
+    thumbprint = None
+
+    def request(self, host, port, path, body=b"", headers={}):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class AsyncTransport():
+    """Base class of asynchronous transports, see Transport."""
+    sslContext = None
+    thumbprint = None
+
+    async def request(self, host, port, path, body=b"", headers={}):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    async def aclose(self):
+        self.close()
+
+
+def applyClientTLS(transport, sslContext, thumbprint=None, explicit=False):
+    """Apply the TLS settings of a client to a transport passed to it.
+
+    A transport without an SSL context uses sslContext. explicit tells
+    whether the client was given TLS settings (caFile or sslContext); then
+    a transport with another SSL context is rejected with ValueError. A
+    thumbprint must be enforced by the transport itself, otherwise
+    ValueError is raised as well.
+    """
+    if thumbprint and getattr(transport, "thumbprint", None) != mailstore.tls.normalizeThumbprint(thumbprint):
+        raise ValueError("{} does not enforce the thumbprint {}, create it with the same thumbprint, e.g. "
+                         "mailstore.pool.ConnectionPool(thumbprint=...)".format(type(transport).__name__, thumbprint))
+    transportContext = getattr(transport, "sslContext", None)
+    if transportContext is None:
+        transport.sslContext = sslContext
+    elif explicit and transportContext is not sslContext:
+        raise ValueError("{} has its own SSL context, pass the TLS settings either to the client "
+                         "or to the transport".format(type(transport).__name__))
+
+
+class HTTP2Response():
+    """Response of an HTTP2Transport request, wrapping an httpx.Response."""
+    def __init__(self, response):
+        self.response = response
+        self.status = response.status_code
+        self.reason = response.reason_phrase
+        self.headers = response.headers
+        self.chunks = response.iter_raw()
+        self.buffer = b""
+
+    def read(self, amt=None):
+        if amt is None:
+            data = self.buffer + b"".join(self.chunks)
+            self.buffer = b""
+            self.close()
+            return data
+        if not self.buffer:
+            self.buffer = next(self.chunks, b"")
+        data, self.buffer = self.buffer[:amt], self.buffer[amt:]
+        if not data:
+            self.close()
+        return data
+
+    def close(self):
+        self.response.close()
+
+
+class AsyncHTTP2Response():
+    """Response of an AsyncHTTP2Transport request, wrapping an httpx.Response."""
+    def __init__(self, response):
+        self.response = response
+        self.status = response.status_code
+        self.reason = response.reason_phrase
+        self.headers = response.headers
+        self.chunks = response.aiter_raw()
+        self.buffer = b""
+        self.finished = False
+
+    async def read(self, amt=None):
+        if amt is None:
+            parts = [self.buffer]
+            async for chunk in self.chunks:
+                parts.append(chunk)
+            self.buffer = b""
+            await self.finish()
+            return b"".join(parts)
+        if not self.buffer and not self.finished:
+            try:
+                self.buffer = await self.chunks.__anext__()
+            except StopAsyncIteration:
+                pass
+        data, self.buffer = self.buffer[:amt], self.buffer[amt:]
+        if not data:
+            await self.finish()
+        return data
+
+    async def finish(self):
+        if not self.finished:
+            self.finished = True
+            await self.response.aclose()
+
+    def close(self):
+        if not self.finished:
+            self.finished = True
+            asyncio.ensure_future(self.response.aclose())
+
+
+def _httpxOptions(maxSize, idleTimeout, timeout, sslContext):
+    if httpx is None:
+        raise ImportError("The HTTP/2 transports require the httpx package with HTTP/2 support (httpx[http2])")
+    return {"http2": True,
+            "verify": sslContext,
+            "timeout": timeout,
+            "limits": httpx.Limits(max_keepalive_connections=maxSize, keepalive_expiry=idleTimeout)}
+
+
+class HTTP2Transport(Transport):
+    """HTTP/2 transport based on httpx.Client. Concurrent requests from
+    several threads share one connection per server. The parameters have
+    the same meaning as for mailstore.pool.ConnectionPool; pinned
+    thumbprints are not supported."""
+    def __init__(self, maxSize=10, idleTimeout=60, timeout=None, sslContext=None):
+        self.options = _httpxOptions(maxSize, idleTimeout, timeout, sslContext)
+        self.sslContext = sslContext
+        self.lock = threading.Lock()
+        self.client = None
+
+    def getClient(self):
+        with self.lock:
+            if self.client is None:
+                if self.sslContext is None:
+                    self.sslContext = ssl.create_default_context()
+                self.client = httpx.Client(**dict(self.options, verify=self.sslContext))
+            return self.client
+
+    def request(self, host, port, path, body=b"", headers={}):
+        client = self.getClient()
+        request = client.build_request("POST", "https://{}:{}{}".format(host, port, path), content=body, headers=headers)
+        return HTTP2Response(client.send(request, stream=True))
+
+    def close(self):
+        with self.lock:
+            client, self.client = self.client, None
+        if client is not None:
+            client.close()
+
+
+class AsyncHTTP2Transport(AsyncTransport):
+    """HTTP/2 transport for the asyncio clients based on httpx.AsyncClient.
+    Its connections belong to the event loop of the first request and are
+    closed with the aclose() coroutine."""
+    def __init__(self, maxSize=10, idleTimeout=60, timeout=None, sslContext=None):
+        self.options = _httpxOptions(maxSize, idleTimeout, timeout, sslContext)
+        self.sslContext = sslContext
+        self.client = None
+
+    async def request(self, host, port, path, body=b"", headers={}):
+        if self.client is None:
+            if self.sslContext is None:
+                self.sslContext = ssl.create_default_context()
+            self.client = httpx.AsyncClient(**dict(self.options, verify=self.sslContext))
+        request = self.client.build_request("POST", "https://{}:{}{}".format(host, port, path), content=body, headers=headers)
+        return AsyncHTTP2Response(await self.client.send(request, stream=True))
+
+    async def aclose(self):
+        client, self.client = self.client, None
+        if client is not None:
+            await client.aclose()
+
+    def close(self):
+        """Close the connections in the background if called from within an
+        event loop. Elsewhere the connections are dropped, as they cannot be
+        closed outside of their loop; use aclose() instead."""
+        client, self.client = self.client, None
+        if client is not None:
+            try:
+                asyncio.get_running_loop().create_task(client.aclose())
+            except RuntimeError:
+                pass
+
+
+class ZlibDecoder():
+    """Incremental decoder of the gzip and deflate content codings. Bodies
+    labeled deflate are zlib streams, but some servers send raw deflate
+    data instead, which is detected from its first bytes."""
+    def __init__(self, coding):
+        self.wbits = 16 + zlib.MAX_WBITS if coding == "gzip" else zlib.MAX_WBITS
+        self.decompressor = zlib.decompressobj(self.wbits)
+        self.started = False
+
+    @property
+    def tail(self):
+        """Input which was not decompressed because of maxLength."""
+        return self.decompressor.unconsumed_tail
+
+    def decompress(self, data, maxLength=0):
+        if not self.started and self.wbits == zlib.MAX_WBITS:
+            self.started = True
+            try:
+                return self.decompressor.decompress(data, maxLength)
+            except zlib.error:
+                self.decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self.decompressor.decompress(data, maxLength)
+
+    def flush(self):
+        return self.decompressor.flush()
+
+
+class BrotliDecoder():
+    """Incremental decoder of the br content coding."""
+    tail = b""
+
+    def __init__(self, coding):
+        decompressor = brotli.Decompressor()
+        self.process = getattr(decompressor, "process", None) or decompressor.decompress
+
+    def decompress(self, data, maxLength=0):
+        return self.process(data)
+
+    def flush(self):
+        return b""
+
+
+DECODERS = {"gzip": ZlibDecoder, "x-gzip": ZlibDecoder, "deflate": ZlibDecoder}
+if brotli is not None:
+    DECODERS["br"] = BrotliDecoder
+
+
+def newDecoder(response):
+    """Return a decoder for the Content-Encoding of response, or None if
+    its body is not encoded."""
+    coding = (response.headers.get("Content-Encoding") or "identity").strip().lower()
+    if coding == "identity":
+        return None
+    if coding not in DECODERS:
+        response.close()
+        raise ValueError("Unsupported Content-Encoding: {}".format(coding))
+    return DECODERS[coding]("gzip" if coding == "x-gzip" else coding)
+
+
+class DecodedResponse():
+    """Response whose body is decompressed while it is read. read(amt)
+    returns at most amt decoded bytes and reads at most amt bytes from the
+    wrapped response at a time. rawBytes is the number of bytes read from
+    it so far. All other attributes are looked up on the wrapped response."""
+
+    # Size of the reads from the wrapped response for read() without amt
+    readSize = 65536
+
+    def __init__(self, response, decoder):
+        self.response = response
+        self.decoder = decoder
+        self.buffer = b""
+        self.offset = 0
+        self.finished = False
+        self.rawBytes = 0
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def take(self, amt):
+        """Return up to amt bytes of the decoded buffer."""
+        end = len(self.buffer) if amt is None else self.offset + amt
+        data = self.buffer[self.offset:end]
+        self.offset += len(data)
+        return data
+
+    def decode(self, raw, amt):
+        """Decode the next raw bytes, b"" at the end of the body, into the buffer."""
+        if raw:
+            self.buffer = self.decoder.decompress(raw, amt or 0)
+        else:
+            self.buffer = self.decoder.flush()
+            self.finished = True
+        self.offset = 0
+
+    def read(self, amt=None):
+        if amt is None:
+            return b"".join(iter(lambda: self.read(self.readSize), b""))
+        while self.offset >= len(self.buffer) and not self.finished:
+            raw = self.decoder.tail
+            if not raw:
+                raw = self.response.read(amt)
+                self.rawBytes += len(raw)
+            self.decode(raw, amt)
+        return self.take(amt)
+
+    def close(self):
+        self.response.close()
+
+
+class AsyncDecodedResponse(DecodedResponse):
+    """DecodedResponse of an asynchronous transport, read() is a coroutine."""
+    async def read(self, amt=None):
+        if amt is None:
+            parts = []
+            while True:
+                data = await self.read(self.readSize)
+                if not data:
+                    return b"".join(parts)
+                parts.append(data)
+        while self.offset >= len(self.buffer) and not self.finished:
+            raw = self.decoder.tail
+            if not raw:
+                raw = await self.response.read(amt)
+                self.rawBytes += len(raw)
+            self.decode(raw, amt)
+        return self.take(amt)
+
+
+def decodeResponse(response):
+    """Return response, wrapped in a DecodedResponse if its body is encoded."""
+    decoder = newDecoder(response)
+    return response if decoder is None else DecodedResponse(response, decoder)
+
+
+def decodeAsyncResponse(response):
+    """Asynchronous transport version of decodeResponse."""
+    decoder = newDecoder(response)
+    return response if decoder is None else AsyncDecodedResponse(response, decoder)
+
+
+def receivedSize(response, size):
+    """Return the number of body bytes received for response, of which
+    size bytes have been read, which differs for decoded responses."""
+    return response.rawBytes if isinstance(response, DecodedResponse) else size
+
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Incremental synchronization of GetWorkerResults
+
+Instead of downloading a whole reporting window on every run, a
+WorkerResultSync remembers in a local SQLite file up to which time the
+results have been processed (the watermark) and only fetches what is new:
+
+   >>> sync = mailstore.workersync.WorkerResultSync(api, "workerresults.db")
+   >>> for result in sync.sync():
+   ...     report(result)
+
+Results can be listed some time after their start time, so every run also
+fetches the lookback period before the watermark again. The IDs of results
+already returned in that period are kept in the file as well, and those
+results are not returned twice. Large ranges are fetched in chunks by
+mailstore.chunked, in parallel and with adapting chunk sizes, while
+results are returned chunk by chunk in chronological order. The watermark
+advances once all results of a chunk have been consumed, so a run that is
+interrupted resumes at that chunk.
+
+All times are in UTC by default. The client does not know the time of the
+server in other time zones, such as "$Local", the time zone of the server's
+operating system; with those, sync() must be given the end of the range.
+"""
+
+import datetime
+import sqlite3
+
+import mailstore.chunked
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermark (
+    scope TEXT PRIMARY KEY,
+    lastTime TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS seen (
+    scope TEXT NOT NULL,
+    id TEXT NOT NULL,
+    rangeEnd TEXT NOT NULL,
+    PRIMARY KEY (scope, id)
+);
+"""
+
+UTC_TIME_ZONE_ID = "UTC"
+
+
+class WorkerResultSync():
+    """Incremental GetWorkerResults synchronization.
+
+    client:         A synchronous API client.
+    path:           SQLite file keeping the state. One file can be shared
+                    by syncs with different clients or filters.
+    instanceID:     Instance to synchronize (MailStore SPE only).
+    profileID:      (optional) Only results of this profile.
+    userName:       (optional) Only results of this user.
+    timeZoneID:     Time zone of all times, see GetWorkerResults and
+                    GetTimeZones. Runs without an explicit end require
+                    UTC_TIME_ZONE_ID.
+    initialWindow:  timedelta fetched by the first run.
+    lookback:       timedelta before the watermark fetched again by each run.
+    chunkSize:      timedelta covered by the first GetWorkerResults calls.
+    maxWorkers:     Number of chunks fetched at the same time.
+    chunked:        (optional) mailstore.chunked.ChunkedFetch with further
+                    settings, replacing chunkSize and maxWorkers.
+    """
+    def __init__(self, client, path, instanceID=None, profileID=None, userName=None, timeZoneID=UTC_TIME_ZONE_ID,
+                 initialWindow=datetime.timedelta(days=30), lookback=datetime.timedelta(hours=1),
+                 chunkSize=datetime.timedelta(days=1), maxWorkers=4, chunked=None):
+        self.client = client
+        self.instanceID = instanceID
+        self.profileID = profileID
+        self.userName = userName
+        self.timeZoneID = timeZoneID
+        self.initialWindow = initialWindow
+        self.lookback = lookback
+        self.chunked = chunked or mailstore.chunked.ChunkedFetch(chunkSize=chunkSize, maxWorkers=maxWorkers)
+
+        self.scope = "|".join(str(value) for value in (client.host, client.port, instanceID, profileID, userName, timeZoneID))
+        self.db = sqlite3.connect(path)
+        self.db.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def watermark(self):
+        """Time up to which all results have been processed, or None."""
+        row = self.db.execute("SELECT lastTime FROM watermark WHERE scope = ?", (self.scope,)).fetchone()
+        return mailstore.chunked.parseTime(row[0]) if row else None
+
+    def fetch(self, start, end):
+        """Yield (start, end, results) of the chunks of [start, end) in
+        chronological order."""
+        arguments = {"fromIncluding": start, "toExcluding": end,
+                     "timeZoneID": self.timeZoneID, "profileID": self.profileID, "userName": self.userName}
+        if self.instanceID is not None:
+            arguments["instanceID"] = self.instanceID
+        return self.chunked.iterChunks(self.client, "GetWorkerResults", arguments)
+
+    def sync(self, until=None):
+        """Yield the results not returned by previous runs, up to until
+        (default: now, if the time zone is UTC), in chronological chunks."""
+        if until is None:
+            if self.timeZoneID != UTC_TIME_ZONE_ID:
+                raise ValueError("until is required for the time zone {!r}, whose current time "
+                                 "is not known to the client".format(self.timeZoneID))
+            until = datetime.datetime.now(datetime.timezone.utc).replace(microsecond=0, tzinfo=None)
+        until = mailstore.chunked.parseTime(until)
+        watermark = self.watermark
+        start = until - self.initialWindow if watermark is None else watermark - self.lookback
+
+        seen = {row[0] for row in self.db.execute("SELECT id FROM seen WHERE scope = ?", (self.scope,))}
+        for chunkStart, end, results in self.fetch(start, until):
+            newIDs = []
+            for item in results:
+                resultID = mailstore.chunked.itemValue(item, "id")
+                if resultID is not None:
+                    resultID = str(resultID)
+                    if resultID in seen:
+                        continue
+                    seen.add(resultID)
+                    newIDs.append(resultID)
+                yield item
+
+            rangeEnd = mailstore.chunked.formatTime(end)
+            with self.db:
+                self.db.executemany("INSERT OR REPLACE INTO seen (scope, id, rangeEnd) VALUES (?, ?, ?)",
+                                    ((self.scope, resultID, rangeEnd) for resultID in newIDs))
+                if watermark is None or end > watermark:
+                    self.db.execute("INSERT OR REPLACE INTO watermark (scope, lastTime) VALUES (?, ?)",
+                                    (self.scope, rangeEnd))
+
+        # IDs of results before the next run's lookback cannot be fetched again
+        with self.db:
+            self.db.execute("DELETE FROM seen WHERE scope = ? AND rangeEnd < ?",
+                            (self.scope, mailstore.chunked.formatTime(until - self.lookback)))
+
+    def reset(self):
+        """Forget the state, so the next run starts with the initial window."""
+        with self.db:
+            self.db.execute("DELETE FROM watermark WHERE scope = ?", (self.scope,))
+            self.db.execute("DELETE FROM seen WHERE scope = ?", (self.scope,))
+
+    def close(self):
+        self.db.close()
@@ -13,6 +13,7 @@ setup_params = dict(
     name="mailstore",
     description="Python API wrapper for the MailStore Server Administration API",
     packages=find_packages(),
+    extras_require={"http2": ["httpx[http2]"], "brotli": ["brotli"]},
     version = "0.1.0",
     url="https://github.com/renshawbay/python-mailstore-api-wrapper",
     classifiers=["License :: OSI Approved :: MIT License"],
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Fixtures of the tests, which run the API clients against the mock
+server of the benchmarks (benchmarks/mockserver.py)."""
+
+import os
+import sys
+
+import pytest
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(DIRECTORY))
+sys.path.insert(0, os.path.join(os.path.dirname(DIRECTORY), "benchmarks"))
+
+import mailstore
+import mockserver
+
+
+@pytest.fixture
+def server():
+    """Mock server with short long running tasks, served in a thread."""
+    server = mockserver.MockServer(messages=2000, folders=10, taskDuration=0.2, progressInterval=0.05).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class DroppingHandler(mockserver.RequestHandler):
+    """Reads requests of the method Drop completely, then closes the
+    connection without responding; closes every connection after its
+    response if the server's closeAfterResponse is set."""
+    def do_POST(self):
+        if self.path.endswith("/Drop"):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self.server.countRequest()
+            self.close_connection = True
+            return
+        super().do_POST()
+        self.close_connection = getattr(self.server, "closeAfterResponse", False)
+
+
+@pytest.fixture
+def droppingServer(server):
+    server.RequestHandlerClass = DroppingHandler
+    return server
+
+
+@pytest.fixture
+def newClient(server):
+    """Factory of clients of the mock server; the client class defaults to
+    mailstore.server.Client and keyword arguments override the defaults.
+    The clients are closed afterwards."""
+    clients = []
+
+    def newClient(clientClass=mailstore.server.Client, **kwargs):
+        options = dict(host="127.0.0.1", port=server.port, caFile=mockserver.CERT_FILE, logLevel=0)
+        client = clientClass(**dict(options, **kwargs))
+        clients.append(client)
+        return client
+
+    yield newClient
+    for client in clients:
+        client.close()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the batch execution of API calls"""
+
+import asyncio
+import time
+
+import pytest
+
+import mailstore
+import mailstore.batch
+
+
+def failingInvoke(server, monkeypatch):
+    """Make the mock server answer GetUserInfo for user "missing" with an API error."""
+    invoke = server.invoke
+
+    def failingInvoke(method, arguments):
+        if method == "GetUserInfo" and arguments.get("userName") == "missing":
+            return {"error": {"message": "User not found"}, "token": None, "statusCode": "failed", "result": None}
+        return invoke(method, arguments)
+    monkeypatch.setattr(server, "invoke", failingInvoke)
+
+
+CALLS = [("GetUserInfo", {"userName": "user{}".format(i)}) for i in range(20)]
+CALLS[3] = ("GetUserInfo", {"userName": "missing"})
+CALLS[7] = ("NoSuchMethod", {})
+
+
+def checkResults(results):
+    assert [result.index for result in results] == list(range(20))
+    assert [result.kwargs for result in results[:3]] == [{"userName": "user0"}, {"userName": "user1"}, {"userName": "user2"}]
+    assert [i for i, result in enumerate(results) if not result.ok] == [3, 7]
+    assert results[3].error is None and results[3].result["error"]["message"] == "User not found"
+    assert isinstance(results[7].error, AttributeError)
+    assert results[7].method == "NoSuchMethod"
+
+
+def testExecuteBatch(newClient, server, monkeypatch):
+    failingInvoke(server, monkeypatch)
+    checkResults(newClient().ExecuteBatch(CALLS, maxWorkers=4))
+
+
+def testExecuteBatchAsync(newClient, server, monkeypatch):
+    failingInvoke(server, monkeypatch)
+
+    async def main():
+        async with newClient(mailstore.server.AsyncClient) as client:
+            return await client.ExecuteBatch(CALLS, maxConcurrency=4)
+    checkResults(asyncio.run(main()))
+
+
+def testExecuteBatchRateLimit(newClient):
+    client = newClient()
+    started = time.monotonic()
+    results = client.ExecuteBatch([("GetStores", {})] * 11, maxWorkers=8, rateLimit=50)
+    assert all(result.ok for result in results)
+    assert time.monotonic() - started >= 10 / 50
+
+
+def testClosedAsyncBatchCancelsPendingCalls():
+    calls = []
+
+    async def Slow(number):
+        calls.append(number)
+        await asyncio.sleep(0 if number == 0 else 10)
+        return number
+
+    async def main():
+        results = mailstore.batch.iterBatchAsync(None, [(Slow, {"number": i}) for i in range(5)], maxConcurrency=8)
+        async for result in results:
+            assert result.result == 0
+            break
+        await results.aclose()
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    started = time.monotonic()
+    assert asyncio.run(main()) == []
+    assert calls == [0, 1, 2, 3, 4]
+    assert time.monotonic() - started < 5
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the response cache"""
+
+import pytest
+
+import mailstore
+import mailstore.cache
+import mailstore.tasks
+import mockserver
+
+
+def renameStores(server, prefix):
+    stores = server.resultGetStores({})
+    for store in stores:
+        store["name"] = prefix + store["name"]
+    server.resultGetStores = lambda arguments: stores
+
+
+def storeNames(client):
+    return [store["name"] for store in client.GetStores()["result"]]
+
+
+def testCachedUntilMutated(newClient, server):
+    client = newClient(cache=True)
+    before = storeNames(client)
+    renameStores(server, "Renamed ")
+    assert storeNames(client) == before
+    client.RenameStore(1, "Renamed Store 1")
+    assert storeNames(client)[0] == "Renamed Store 1"
+    assert client.cache.stats()["hits"] == 1
+
+
+def testSharedCacheKeepsServersApart(newClient, server):
+    other = mockserver.MockServer().start()
+    try:
+        renameStores(other, "Other ")
+        cache = mailstore.cache.ResponseCache()
+        client = newClient(cache=cache)
+        otherClient = newClient(cache=cache, port=other.port)
+        assert storeNames(client)[0] == "Store 1"
+        assert storeNames(otherClient)[0] == "Other Store 1"
+        otherClient.RenameStore(1, "Renamed")
+        assert cache.stats()["size"] == 1
+    finally:
+        other.shutdown()
+        other.server_close()
+
+
+def testInvalidatedWhenManuallyPolledTaskFinishes(newClient, server):
+    client = newClient(cache=True)
+    status = client.MergeStore(1, 2, autoHandleToken=False)
+    assert status["statusCode"] == "running"
+    # Read while the task runs, then the task changes the stores
+    storeNames(client)
+    renameStores(server, "Merged ")
+    while status["statusCode"] == "running":
+        status = client.GetStatus(status)
+    assert storeNames(client)[0] == "Merged Store 1"
+
+
+def testInvalidatedWhenTaskManagerTaskFinishes(newClient, server):
+    client = newClient(cache=True)
+    with mailstore.tasks.TaskManager(client) as tasks:
+        tasks.add(client.MergeStore(1, 2, autoHandleToken=False), method="MergeStore")
+        storeNames(client)
+        renameStores(server, "Merged ")
+        tasks.waitAll(timeout=10)
+    assert storeNames(client)[0] == "Merged Store 1"
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the chunked fetching of time ranges"""
+
+import datetime
+
+import pytest
+
+import mailstore
+import mailstore.chunked
+
+
+@pytest.mark.parametrize("value", ["2020-01-02", "2020-01-02T00:00:00", "2020-01-02T00:00:00.0000000",
+                                   "2020-01-02T00:00:00+01:00", datetime.date(2020, 1, 2),
+                                   datetime.datetime(2020, 1, 2)])
+def testParseTime(value):
+    assert mailstore.chunked.parseTime(value) == datetime.datetime(2020, 1, 2)
+
+
+def testChunkedWithDates(newClient):
+    client = newClient()
+    expected = client.GetWorkerResults("2020-01-01T00:00:00", "2020-01-05T00:00:00")["result"]
+    results = list(client.GetWorkerResults("2020-01-01", "2020-01-05", chunked=True))
+    assert len(results) == 400
+    assert results == expected
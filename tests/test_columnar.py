@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the column-oriented result sets"""
+
+import array
+
+import pytest
+
+import mailstore
+import mailstore.columnar
+
+
+RECORDS = [
+    {"folder": "jdoe/Inbox", "size": 300, "count": 3, "ratio": 0.5},
+    {"folder": "jdoe/Sent Items", "size": 100, "count": 1, "ratio": 1.5},
+    {"folder": "asmith/Inbox", "size": 300, "count": 7, "ratio": 2},
+    {"folder": "asmith", "size": 50, "count": 0, "ratio": 0.25},
+    {"folder": "bkim/Inbox", "size": 500, "count": 2, "ratio": 1},
+]
+
+
+def backends():
+    """ColumnarResults of RECORDS with every available backend."""
+    results = [mailstore.columnar.ColumnarResult.fromRecords(RECORDS, useNumpy=False)]
+    if mailstore.columnar.numpy is not None:
+        results.append(mailstore.columnar.ColumnarResult.fromRecords(RECORDS, useNumpy=True))
+    return results
+
+
+def testColumns():
+    result = mailstore.columnar.ColumnarResult.fromRecords(RECORDS + [{"folder": "x", "size": 1, "extra": "y"}], useNumpy=False)
+    assert len(result) == 6
+    assert isinstance(result["size"], array.array) and result["size"].typecode == "q"
+    assert isinstance(result["ratio"], list)
+    assert result["extra"] == [None] * 5 + ["y"]
+    assert list(result.rows())[:5] == [dict(record, extra=None) for record in RECORDS]
+    result = mailstore.columnar.ColumnarResult.fromRecords(RECORDS, useNumpy=False)
+    assert result["ratio"].typecode == "d"
+
+
+@pytest.mark.parametrize("result", backends(), ids=lambda result: type(result["size"]).__module__)
+def testSumBy(result):
+    assert result.sumBy("folder", "size", keyFunc=mailstore.columnar.userFolder) == {"jdoe": 400, "asmith": 350, "bkim": 500}
+    assert result.sumBy("folder", "count") == {record["folder"]: record["count"] for record in RECORDS}
+    assert result.sumBy("folder", "ratio", keyFunc=mailstore.columnar.userFolder) == pytest.approx({"jdoe": 2.0, "asmith": 2.25, "bkim": 1.0})
+    assert result.topNBy("folder", "size", 2, keyFunc=mailstore.columnar.userFolder) == [("bkim", 500), ("jdoe", 400)]
+
+
+@pytest.mark.parametrize("result", backends(), ids=lambda result: type(result["size"]).__module__)
+def testTopN(result):
+    # Records with equal values keep their order
+    assert [row["folder"] for row in result.topN("size", 3)] == ["bkim/Inbox", "jdoe/Inbox", "asmith/Inbox"]
+    assert [row["count"] for row in result.topN("count", 10)] == [7, 3, 2, 1, 0]
+    assert result.topN("size", 0) == []
+
+
+def testTopNSkipsMissingValues():
+    result = mailstore.columnar.ColumnarResult.fromRecords(RECORDS + [{"folder": "empty"}])
+    assert isinstance(result["size"], list)
+    assert [row["size"] for row in result.topN("size", 10)] == [500, 300, 300, 100, 50]
+    assert result.sumBy("folder", "size", keyFunc=mailstore.columnar.userFolder)["jdoe"] == 400
+
+
+def testBackendsGiveTheSameResults():
+    numpy = pytest.importorskip("numpy")
+    records = [{"folder": "user{}/Folder {}".format(i % 7, i), "size": (i * 7919) % 97, "ratio": i / 3} for i in range(500)]
+    plain = mailstore.columnar.ColumnarResult.fromRecords(records, useNumpy=False)
+    packed = mailstore.columnar.ColumnarResult.fromRecords(records, useNumpy=True)
+    assert isinstance(packed["size"], numpy.ndarray)
+    for keyFunc in (None, mailstore.columnar.userFolder):
+        assert packed.sumBy("folder", "size", keyFunc) == plain.sumBy("folder", "size", keyFunc)
+        assert packed.sumBy("folder", "ratio", keyFunc) == pytest.approx(plain.sumBy("folder", "ratio", keyFunc))
+    assert packed.topN("size", 50) == plain.topN("size", 50)
+    assert packed.topNBy("folder", "size", 3, mailstore.columnar.userFolder) == plain.topNBy("folder", "size", 3, mailstore.columnar.userFolder)
+
+
+def testColumnarCall(newClient):
+    client = newClient()
+    records = client.GetFolderStatistics()["result"]
+    stats = client.GetFolderStatistics(columnar=True)
+    assert len(stats) == len(records)
+    assert mailstore.columnar.folderSizePerUser(stats) == {
+        user: sum(record["size"] for record in records if record["folder"].startswith(user + "/"))
+        for user in {record["folder"].split("/")[0] for record in records}}
+    assert stats.topN("size", 1) == [max(records, key=lambda record: record["size"])]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of mailstore.errors"""
+
+import pytest
+
+import mailstore
+
+
+def testErrorsDoNotPrint(newClient, capsys):
+    client = newClient()
+    with pytest.raises(mailstore.errors.MailStoreNoTokenError) as excinfo:
+        client.GetStatus({"token": None})
+    assert "token" in str(excinfo.value)
+    assert capsys.readouterr().out == ""
+
+
+def testErrorKeepsTheCause(newClient, server):
+    client = newClient(port=1)
+    with pytest.raises(mailstore.errors.MailStoreBaseError) as excinfo:
+        client.GetStores()
+    assert isinstance(excinfo.value.msg, ConnectionRefusedError)
+    assert str(excinfo.value) == str(excinfo.value.msg)
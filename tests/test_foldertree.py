@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the lazy walking of the folder hierarchy"""
+
+import asyncio
+
+import pytest
+
+import mailstore
+import mailstore.foldertree
+
+
+@pytest.fixture
+def failing(server, monkeypatch):
+    """Folders for which GetChildFolders returns an error."""
+    failing = set()
+    invoke = server.invoke
+
+    def failingInvoke(method, arguments):
+        if method == "GetChildFolders" and arguments.get("folder") in failing:
+            return {"error": {"message": "Folder not found"}, "token": None, "statusCode": "failed", "result": None}
+        return invoke(method, arguments)
+    monkeypatch.setattr(server, "invoke", failingInvoke)
+    return failing
+
+
+def testWalk(newClient, server):
+    with newClient().FolderTree() as tree:
+        folders = [mailstore.foldertree.folderPath(item) for item in tree.walk()]
+        # 10 user archives with Inbox and Sent Items, each with Inbox and Sent Items again
+        assert len(folders) == 70
+        assert folders[:2] == ["user0", "user1"]
+        assert "user3/Sent Items/Inbox" in folders
+        requests = server.requests
+        assert len(list(tree.walk())) == 70
+        assert server.requests == requests
+        assert tree.executor is not None
+    assert tree.executor is None
+
+
+def testWalkWithPredicateAndMaxDepth(newClient):
+    with newClient().FolderTree() as tree:
+        assert len(list(tree.walk(maxDepth=1))) == 10
+        assert len(list(tree.walk("user1"))) == 6
+        inboxes = list(tree.walk(predicate=lambda item: not item["folder"].endswith("Sent Items")))
+        assert len(inboxes) == 10 + 10 + 10
+
+
+def testInvalidate(newClient, server):
+    with newClient().FolderTree() as tree:
+        list(tree.walk())
+        tree.invalidate("user1")
+        requests = server.requests
+        assert len(list(tree.walk())) == 70
+        # user1, its 2 children and their 4 children
+        assert server.requests == requests + 7
+
+
+def testFailedFetchRaisesAndIsNotCached(newClient, failing):
+    failing.add("user2/Inbox")
+    with newClient().FolderTree() as tree:
+        with pytest.raises(mailstore.errors.MailStoreResponseError):
+            list(tree.walk())
+        with pytest.raises(mailstore.errors.MailStoreResponseError):
+            tree.children("user2/Inbox")
+        failing.clear()
+        assert len(list(tree.walk())) == 70
+
+
+def testAsyncWalk(newClient, failing):
+    async def main():
+        async with newClient(mailstore.server.AsyncClient) as client:
+            tree = client.FolderTree()
+            folders = [item["folder"] async for item in tree.walk()]
+            assert len(folders) == 70
+            assert len([item async for item in tree.walk("user1", maxDepth=1)]) == 2
+
+            failing.add("user4")
+            tree.invalidate("user4")
+            with pytest.raises(mailstore.errors.MailStoreResponseError):
+                await tree.children("user4")
+            assert "user4" not in tree.expanded
+            failing.clear()
+            assert len(await tree.children("user4")) == 2
+    asyncio.run(main())
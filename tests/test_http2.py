@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the HTTP/2 transports, which need httpx with HTTP/2
+support. The mock server speaks HTTP/1.1, which httpx falls back to."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("h2")
+
+import mailstore
+
+
+def testHTTP2Transport(newClient, server):
+    transport = mailstore.transport.HTTP2Transport()
+    client = newClient(transport=transport)
+    assert transport.sslContext is client.sslContext
+    assert client.GetServerInfo()["error"] is None
+    assert len(list(client.GetMessages("admin/Inbox", stream=True))) == server.messages
+    assert client.VerifyStore(1)["statusCode"] == "succeeded"
+
+
+def testAsyncHTTP2Transport(newClient, server):
+    async def run():
+        transport = mailstore.transport.AsyncHTTP2Transport()
+        async with newClient(mailstore.server.AsyncClient, transport=transport) as client:
+            assert (await client.GetServerInfo())["error"] is None
+            messages = [message async for message in await client.GetMessages("admin/Inbox", stream=True)]
+            assert len(messages) == server.messages
+            assert (await client.VerifyStore(1))["statusCode"] == "succeeded"
+        assert transport.client is None
+    asyncio.run(run())
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the local message index"""
+
+import pytest
+
+import mailstore
+import mailstore.messageindex
+
+
+@pytest.fixture
+def index(server, newClient, tmp_path):
+    server.messages = 5
+    with mailstore.messageindex.MessageIndex(newClient(), str(tmp_path / "messages.db")) as index:
+        yield index
+
+
+def testRefreshKeepsFoldersWithoutStatistics(server, index):
+    crawled = index.crawl()
+    folders = index.indexedFolders()
+    assert crawled == len(folders) > 0
+    assert index.count() == 5 * crawled
+
+    index.refresh()
+    assert set(folders) <= set(index.indexedFolders())
+    assert index.count("user0") == index.count("user0/Inbox") + index.count("user0/Sent Items") + 5
+    assert len(index.search(sender="sender1@example.com", folder="user3")) == len(index.search(folder="user3")) // 5
+
+
+def testRefreshRemovesDeletedFolders(server, index, monkeypatch):
+    index.crawl()
+    deleted = [path for path in index.indexedFolders() if path.startswith("user1")]
+    resultGetChildFolders = server.resultGetChildFolders
+    monkeypatch.setattr(server, "resultGetChildFolders",
+                        lambda arguments: [item for item in resultGetChildFolders(arguments) if item["folder"] != "user1"])
+    index.refresh()
+    assert deleted and not set(deleted) & set(index.indexedFolders())
+    assert index.count("user2") > 0
+
+
+def testRefreshFetchesChangedFolders(server, index):
+    index.crawl()
+    server.messages = 6
+    statistics = index.folderStatistics()
+    assert index.refresh() == len(set(statistics) | set(index.indexedFolders()))
+    assert index.count("user4/Inbox/Folder 4") == 6
+
+
+@pytest.mark.parametrize("failing", [{"GetFolderStatistics"}, {"GetChildFolders"}, {"GetFolderStatistics", "GetChildFolders"}])
+def testFailedCallsLeaveTheIndexUntouched(server, index, monkeypatch, failing):
+    index.crawl()
+    folders, count = index.indexedFolders(), index.count()
+    invoke = server.invoke
+    monkeypatch.setattr(server, "invoke", lambda method, arguments: (
+        {"error": {"message": "Internal error"}, "token": None, "statusCode": "failed", "result": None}
+        if method in failing else invoke(method, arguments)))
+    with pytest.raises(mailstore.errors.MailStoreResponseError):
+        index.refresh()
+    assert (index.indexedFolders(), index.count()) == (folders, count)
+
+
+def testEmptyFolderTreeRemovesNothing(server, index, monkeypatch):
+    index.crawl()
+    folders = set(index.indexedFolders())
+    monkeypatch.setattr(server, "resultGetChildFolders", lambda arguments: [])
+    index.refresh()
+    assert folders <= set(index.indexedFolders())
+    index.crawl()
+    assert folders <= set(index.indexedFolders())
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the encoding of API parameters"""
+
+import asyncio
+
+import pytest
+
+import mailstore
+
+
+def echoed(response):
+    """Return the arguments the mock server received for an unknown method."""
+    assert response["error"] is None
+    return response["result"]["arguments"]
+
+
+@pytest.mark.parametrize("arguments, expected", [
+    ({"number": 0, "flag": False, "ratio": 1.5}, {"number": "0", "flag": "false", "ratio": "1.5"}),
+    ({"flag": True, "text": "ä & ü"}, {"flag": "true", "text": "ä & ü"}),
+    ({"items": ["a", 1, True], "config": {"a": [True, None]}}, {"items": "a,1,true", "config": '{"a":[true,null]}'}),
+    ({"missing": None}, {}),
+])
+def testArgumentsAreEncodedByType(newClient, arguments, expected):
+    assert echoed(newClient()._callMethod("Echo", arguments)) == expected
+
+
+def testArgumentsAreEncodedByParameter(newClient):
+    client = newClient()
+    assert echoed(client.SetUserPrivileges("user", ("read", "write"))) == {"userName": "user", "privileges": "read,write"}
+    assert echoed(client.SyncUsersWithDirectoryServices(False)) == {"dryRun": "false"}
+    assert echoed(client.SyncUsersWithDirectoryServices()) == {}
+    assert echoed(client.SetComplianceConfiguration({"enabled": True})) == {"config": '{"enabled":true}'}
+    assert echoed(client.GetProfiles()) == {"raw": "true"}
+
+
+def testAsyncArgumentsAreEncodedByParameter(newClient):
+    async def main():
+        async with newClient(mailstore.server.AsyncClient) as client:
+            return echoed(await client.SetUserPrivileges("user", ["read"])), echoed(await client.GetProfiles(raw=False))
+    assert asyncio.run(main()) == ({"userName": "user", "privileges": "read"}, {"raw": "false"})
+
+
+def testEmptyValuesAreSent():
+    method = mailstore.server.Client.methodTable["SetUserPrivileges"]
+    assert method.encode({"userName": "user", "privileges": []}) == "userName=user&privileges="
+    assert mailstore.methods.encodeArguments({"number": 0, "flag": False, "none": None}) == "number=0&flag=false"
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the call metrics and their Prometheus exposition"""
+
+import math
+import re
+
+import pytest
+
+import mailstore
+import mailstore.metrics
+
+
+# A sample line of the Prometheus text format: name{labels} value
+SAMPLE = re.compile(r'^([a-z_]+)\{((?:[a-z]+="(?:[^"\\]|\\.)*",?)*)\} (\S+)$')
+
+
+def histogram(values, buckets=(1, 2, 4)):
+    histogram = mailstore.metrics.Histogram(buckets)
+    for value in values:
+        histogram.observe(value)
+    return histogram
+
+
+def record(method, duration, bytesReceived=0, error=None):
+    record = mailstore.metrics.CallRecord(method, {})
+    record.finish(error)
+    record.duration = duration
+    record.bytesReceived = bytesReceived
+    return record
+
+
+def testHistogramBuckets():
+    result = histogram([0.5, 1, 1.5, 2, 3, 10])
+    assert result.counts == [2, 2, 1, 1]
+    assert result.cumulative() == [(1, 2), (2, 4), (4, 5), (math.inf, 6)]
+    assert (result.count, result.sum, result.max) == (6, 18, 10)
+
+
+def testQuantileInterpolatesWithinBuckets():
+    result = histogram([0.5, 1.5, 1.5, 3])
+    # The 2nd of 4 values is the first of 2 values in (1, 2]
+    assert result.quantile(0.5) == pytest.approx(1.5)
+    assert result.quantile(0.25) == pytest.approx(1.0)
+    assert result.quantile(0.125) == pytest.approx(0.5)
+    # Within (2, 4], capped at the largest value 3
+    assert result.quantile(0.875) == pytest.approx(2.5)
+    assert result.quantile(1.0) == pytest.approx(3)
+    assert histogram([]).quantile(0.5) is None
+
+
+def testQuantileInOverflowBucket():
+    result = histogram([0.5, 5, 7, 9])
+    # Values above the last bound are spread between it and the maximum
+    assert result.quantile(0.5) == pytest.approx(4 + (9 - 4) * 1 / 3)
+    assert result.quantile(1.0) == pytest.approx(9)
+    assert histogram([100]).quantile(0.99) == pytest.approx(4 + 96 * 0.99)
+
+
+def testSnapshot():
+    metrics = mailstore.metrics.Metrics(latencyBuckets=(1, 2, 4))
+    for duration in (0.5, 1.5, 1.5, 3):
+        metrics.afterCall(record("GetStores", duration))
+    snapshot = metrics.snapshot()["GetStores"]
+    assert snapshot["calls"] == 4
+    assert snapshot["latency"]["p50"] == pytest.approx(1.5)
+    assert snapshot["latency"]["buckets"] == {1: 1, 2: 3, 4: 4, math.inf: 4}
+
+
+def testPrometheusExposition():
+    metrics = mailstore.metrics.Metrics(latencyBuckets=(0.1, 1), sizeBuckets=(1000,))
+    metrics.afterCall(record("GetStores", 0.05, 500))
+    metrics.afterCall(record("GetStores", 0.5, 5000))
+    metrics.afterCall(record('Get"Odd\\Name', 2, error=ConnectionResetError()))
+    text = metrics.prometheus()
+    assert text.endswith("\n")
+
+    samples = {}
+    types = {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            name, kind = line[7:].split(" ")
+            assert name not in types
+            types[name] = kind
+            continue
+        if line.startswith("# HELP "):
+            continue
+        match = SAMPLE.match(line)
+        assert match, line
+        samples[(match.group(1), match.group(2))] = float(match.group(3))
+
+    assert types["mailstore_api_call_duration_seconds"] == "histogram"
+    assert types["mailstore_api_calls_in_flight"] == "gauge"
+    assert types["mailstore_api_calls_total"] == "counter"
+    assert [samples[("mailstore_api_call_duration_seconds_bucket", 'method="GetStores",le="{}"'.format(le))]
+            for le in ("0.1", "1.0", "+Inf")] == [1, 2, 2]
+    assert samples[("mailstore_api_call_duration_seconds_sum", 'method="GetStores"')] == pytest.approx(0.55)
+    assert samples[("mailstore_api_call_duration_seconds_count", 'method="GetStores"')] == 2
+    assert samples[("mailstore_api_response_size_bytes_bucket", 'method="GetStores",le="1000.0"')] == 1
+    assert samples[("mailstore_api_response_bytes_total", 'method="GetStores"')] == 5500
+    assert samples[("mailstore_api_errors_total", 'method="Get\\"Odd\\\\Name",error="ConnectionResetError"')] == 1
+    assert ("mailstore_api_errors_total", 'method="GetStores",error="ConnectionResetError"') not in samples
+
+
+def testMetricsOfClientCalls(newClient):
+    metrics = mailstore.metrics.Metrics()
+    client = newClient(hooks=[metrics])
+    client.GetStores()
+    client.VerifyStore(1)
+    snapshot = metrics.snapshot()
+    assert snapshot["GetStores"]["calls"] == 1
+    assert snapshot["VerifyStore"]["polls"] == snapshot["get-status"]["calls"] > 0
+    assert snapshot["GetStores"]["bytesReceived"] > 0
+    assert 'mailstore_api_calls_total{method="VerifyStore"} 1' in metrics.prometheus().splitlines()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the polling policies for long running tasks"""
+
+import pytest
+
+import mailstore
+import mailstore.metrics
+import mailstore.polling
+
+
+def simulatePolls(poller, duration, changes=()):
+    """Return the number of status requests of a task running for duration
+    milliseconds whose status changes at the given times, if the server
+    holds every request until the status changes or its wait time passed."""
+    now, version, polls = 0, 0, 0
+    jsonValues = {"statusVersion": version}
+    while now < duration:
+        waitTime = poller.nextWaitTime(jsonValues)
+        nextChange = min([change for change in changes if change > now] + [duration])
+        now = min(now + waitTime, nextChange)
+        polls += 1
+        version = sum(1 for change in changes if change <= now)
+        jsonValues = {"statusVersion": version}
+    return polls
+
+
+def testAdaptivePollerBacksOff():
+    poller = mailstore.polling.AdaptivePoller(100, 1000, 2.0)
+    waits = [poller.nextWaitTime({"statusVersion": 1}) for i in range(6)]
+    assert waits == [100, 200, 400, 800, 1000, 1000]
+    assert poller.nextWaitTime({"statusVersion": 2}) == 100
+    assert poller.nextWaitTime({"statusVersion": 2}) == 200
+
+
+def testProfiles():
+    policy = mailstore.polling.AdaptivePolling(initialWait=300, maxWait=5000, profiles={"VerifyStore": (50, 500)})
+    assert policy.newPoller("VerifyStore").nextWaitTime({}) == 50
+    assert policy.newPoller("CreateStore").nextWaitTime({}) == 100
+    assert policy.newPoller("SomethingElse").nextWaitTime({}) == 300
+
+
+@pytest.mark.parametrize("duration, changes", [(10000, ()), (30000, (5000, 20000)), (60000, range(0, 60000, 7000))])
+def testAdaptivePollingNeedsFewerPolls(duration, changes):
+    fixed = simulatePolls(mailstore.polling.FixedPoller(250), duration, changes)
+    adaptive = simulatePolls(mailstore.polling.AdaptivePoller(250, 15000, 2.0), duration, changes)
+    assert adaptive < fixed / 2
+
+
+def testAdaptivePollingAgainstServer(newClient, server):
+    # The status does not change while the task is running
+    server.taskDuration = 1.5
+    server.progressInterval = 10
+
+    def polls(pollingPolicy):
+        metrics = mailstore.metrics.Metrics()
+        client = newClient(pollingPolicy=pollingPolicy, hooks=[metrics])
+        assert client.VerifyStore(1)["statusCode"] == "succeeded"
+        return metrics.snapshot()["VerifyStore"]["polls"]
+
+    fixed = polls(mailstore.polling.FixedPolling(waitTime=100))
+    adaptive = polls(mailstore.polling.AdaptivePolling(profiles={"VerifyStore": (100, 2000)}))
+    assert fixed >= 10
+    assert adaptive <= 5
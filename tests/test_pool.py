@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the keep-alive connection pools"""
+
+import asyncio
+import time
+import urllib.error
+
+import pytest
+
+import mailstore
+import mockserver
+
+
+def testReusesConnections(newClient, server):
+    client = newClient()
+    for i in range(5):
+        client.GetStores()
+    assert server.requests == 5
+    assert sum(len(idle) for idle in client.transport.idleConnections.values()) == 1
+
+
+def testRequestIsNotSentAgainAfterItWasReceived(newClient, droppingServer):
+    client = newClient()
+    client.GetStores()
+    with pytest.raises(mailstore.errors.MailStoreBaseError):
+        client._callMethod("Drop")
+    # GetStores and a single Drop
+    assert droppingServer.requests == 2
+
+
+def testConnectionClosedByServerIsReplaced(newClient, droppingServer):
+    droppingServer.closeAfterResponse = True
+    client = newClient()
+    for i in range(3):
+        assert client.GetStores()["error"] is None
+        # Let the server close the idle connection
+        time.sleep(0.05)
+    assert droppingServer.requests == 3
+
+
+def testAsyncRequestIsNotSentAgainAfterItWasReceived(newClient, droppingServer):
+    async def run():
+        async with newClient(mailstore.server.AsyncClient) as client:
+            await client.GetStores()
+            with pytest.raises(mailstore.errors.MailStoreBaseError):
+                await client._callMethod("Drop")
+    asyncio.run(run())
+    assert droppingServer.requests == 2
+
+
+def testAsyncConnectionClosedByServerIsReplaced(newClient, droppingServer):
+    droppingServer.closeAfterResponse = True
+
+    async def run():
+        async with newClient(mailstore.server.AsyncClient) as client:
+            for i in range(3):
+                assert (await client.GetStores())["error"] is None
+                # Let the server close the idle connection
+                await asyncio.sleep(0.05)
+    asyncio.run(run())
+    assert droppingServer.requests == 3
+
+
+def testNewConnectionsResumeTheTLSSession(newClient, monkeypatch):
+    connections = []
+    newConnection = mailstore.pool.ConnectionPool.newConnection
+
+    def collect(pool, host, port):
+        connections.append(newConnection(pool, host, port))
+        return connections[-1]
+    monkeypatch.setattr(mailstore.pool.ConnectionPool, "newConnection", collect)
+
+    client = newClient()
+    client.GetStores()
+    client.transport.clear()
+    client.GetStores()
+    client.GetStores()
+    assert len(connections) == 2
+    assert not connections[0].sock
+    assert connections[1].sock.session_reused
+    assert connections[1].sock.session == client.transport.sessions["127.0.0.1:{}".format(client.port)]
+
+
+def testErrorResponseIsClosed(newClient, monkeypatch):
+    responses = []
+    request = mailstore.pool.ConnectionPool.request
+
+    def collect(pool, *args, **kwargs):
+        responses.append(request(pool, *args, **kwargs))
+        return responses[-1]
+    monkeypatch.setattr(mailstore.pool.ConnectionPool, "request", collect)
+
+    client = newClient(password="wrong")
+    with pytest.raises(urllib.error.HTTPError) as info:
+        client.GetStores()
+    assert info.value.code == 401
+    assert responses[0].isclosed()
+    assert responses[0].connection is None
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the client-side rate and concurrency limits"""
+
+import asyncio
+import threading
+import time
+import urllib.error
+
+import pytest
+
+import mailstore
+import mailstore.ratelimit
+
+
+def httpError(code):
+    return urllib.error.HTTPError("https://host", code, "Error", None, None)
+
+
+def testTokenBucketRefill():
+    bucket = mailstore.ratelimit.TokenBucket(rate=100, burst=5)
+    assert [bucket.reserve() for i in range(5)] == [0.0] * 5
+    assert 0.005 < bucket.reserve() <= 0.01
+    time.sleep(0.06)
+    assert bucket.reserve() == 0.0
+    started = time.monotonic()
+    for i in range(8):
+        bucket.acquire()
+    # 4 tokens were left, the other 4 are refilled within 0.04 seconds
+    assert time.monotonic() - started >= 0.03
+
+
+def testGovernorBlocksAtMaxInFlight():
+    governor = mailstore.ratelimit.Governor(mailstore.ratelimit.Limit(maxInFlight=2), adaptive=False)
+    governor.acquire()
+    governor.acquire()
+    admitted = threading.Event()
+    thread = threading.Thread(target=lambda: (governor.acquire(), admitted.set()))
+    thread.start()
+    assert not admitted.wait(0.1)
+    governor.release(latency=0.01)
+    assert admitted.wait(5)
+    thread.join()
+    assert governor.inFlight == 2
+
+
+def testAsyncGovernorPassesOnWakeUpOfCancelledWaiter():
+    governor = mailstore.ratelimit.Governor(mailstore.ratelimit.Limit(maxInFlight=1), adaptive=False)
+
+    async def main():
+        await governor.acquireAsync()
+        first = asyncio.ensure_future(governor.acquireAsync())
+        second = asyncio.ensure_future(governor.acquireAsync())
+        await asyncio.sleep(0.01)
+        governor.release()
+        first.cancel()
+        await asyncio.wait_for(second, 5)
+        assert first.cancelled()
+    asyncio.run(main())
+    assert governor.inFlight == 1
+
+
+@pytest.mark.parametrize("code", [429, 503])
+def testBackoffAndRecovery(code):
+    governor = mailstore.ratelimit.Governor(mailstore.ratelimit.Limit(maxInFlight=10))
+    governor.acquire()
+    governor.release(error=httpError(code))
+    assert governor.limit == pytest.approx(7.0)
+    time.sleep(0.001)
+    governor.acquire()
+    governor.release(error=httpError(code))
+    assert governor.limit == pytest.approx(4.9)
+    governor.acquire()
+    governor.release(error=httpError(500))
+    assert governor.limit == pytest.approx(4.9)
+
+    for i in range(100):
+        governor.acquire()
+        governor.release(latency=0.01)
+    assert governor.limit == 10
+
+
+def testBackoffOnRisingLatency():
+    governor = mailstore.ratelimit.Governor(mailstore.ratelimit.Limit(maxInFlight=4, minInFlight=2))
+    for latency in (0.001, 0.001, 0.1, 0.1, 0.1):
+        governor.acquire()
+        governor.release(latency=latency)
+    # At most one decrease per round trip
+    assert governor.limit == pytest.approx(2.8)
+    governor.acquire()
+    time.sleep(0.11)
+    governor.release(latency=0.1)
+    assert governor.limit == 2
+
+
+def testClientRateLimit(newClient):
+    limiter = mailstore.ratelimit.RateLimiter(limits={"read": mailstore.ratelimit.Limit(rate=20, burst=1)})
+    client = newClient(rateLimiter=limiter)
+    started = time.monotonic()
+    for i in range(5):
+        client.GetStores()
+    assert time.monotonic() - started >= 4 / 20
+    assert limiter.governor("127.0.0.1:{}".format(client.port), "get-status") is None
+    assert limiter.governor("127.0.0.1:{}".format(client.port), "CreateStore") is None
+
+
+def testHostLimitsOverrideDefaults():
+    limiter = mailstore.ratelimit.RateLimiter(hosts={"archive2:8463": {"write": mailstore.ratelimit.Limit(maxInFlight=1)}})
+    assert limiter.governor("archive2:8463", "CreateStore").maxInFlight == 1
+    assert limiter.governor("archive1:8463", "CreateStore").maxInFlight == 4
+    assert limiter.governor("archive2:8463", "GetStores").maxInFlight == 16
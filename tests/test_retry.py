@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of retried API calls and circuit breakers"""
+
+import asyncio
+import logging
+import time
+import urllib.error
+
+import pytest
+
+import mailstore
+import mailstore.retry
+
+
+def testReceivedRequestIsNotRetried(newClient, droppingServer):
+    client = newClient(retryPolicy=mailstore.retry.RetryPolicy(baseDelay=0, breakerThreshold=None))
+    with pytest.raises(mailstore.errors.MailStoreBaseError):
+        client._callMethod("Drop")
+    assert droppingServer.requests == 1
+
+
+def testIdempotentRequestIsRetried(newClient, droppingServer):
+    policy = mailstore.retry.RetryPolicy(maxAttempts=3, baseDelay=0, breakerThreshold=None, idempotent=["Drop"])
+    client = newClient(retryPolicy=policy)
+    with pytest.raises(mailstore.errors.MailStoreBaseError):
+        client._callMethod("Drop")
+    assert droppingServer.requests == 3
+    assert client.GetStores()["error"] is None
+
+
+def testIdempotentRequestIsRetriedAsync(newClient, droppingServer):
+    async def main():
+        policy = mailstore.retry.RetryPolicy(maxAttempts=3, baseDelay=0, breakerThreshold=None, idempotent=["Drop"])
+        async with newClient(mailstore.server.AsyncClient, retryPolicy=policy) as client:
+            with pytest.raises(mailstore.errors.MailStoreBaseError):
+                await client._callMethod("Drop")
+    asyncio.run(main())
+    assert droppingServer.requests == 3
+
+
+@pytest.mark.parametrize("method, error, retryable", [
+    ("GetStores", ConnectionResetError(), True),
+    ("MergeStore", ConnectionResetError(), False),
+    ("MergeStore", ConnectionRefusedError(), True),
+    ("GetStores", urllib.error.HTTPError("https://host", 503, "Service Unavailable", None, None), True),
+    ("GetStores", urllib.error.HTTPError("https://host", 500, "Internal Server Error", None, None), False),
+])
+def testIsRetryable(method, error, retryable):
+    assert mailstore.retry.RetryPolicy().isRetryable(method, error) is retryable
+
+
+def testOpenBreakerFailsFast(newClient, droppingServer, capsys):
+    client = newClient(retryPolicy=mailstore.retry.RetryPolicy(maxAttempts=1, breakerThreshold=2))
+    for i in range(2):
+        with pytest.raises(mailstore.errors.MailStoreBaseError):
+            client._callMethod("Drop")
+    with pytest.raises(mailstore.errors.MailStoreCircuitOpenError) as info:
+        client.GetStores()
+    assert str(info.value) == "Circuit breaker for 127.0.0.1:{} is open".format(droppingServer.port)
+    assert droppingServer.requests == 2
+    assert capsys.readouterr().out == ""
+
+
+def testCancelledTrialCallReleasesTheBreaker():
+    policy = mailstore.retry.RetryPolicy(maxAttempts=1, breakerThreshold=1, breakerTimeout=0.05)
+    log = logging.getLogger(__name__)
+
+    def fail():
+        raise ConnectionResetError()
+
+    async def block():
+        await asyncio.sleep(10)
+
+    async def main():
+        trial = asyncio.ensure_future(policy.callAsync("host", "GetStores", block, log))
+        await asyncio.sleep(0.01)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+    def interrupt():
+        raise KeyboardInterrupt()
+
+    with pytest.raises(ConnectionResetError):
+        policy.call("host", "GetStores", fail, log)
+    with pytest.raises(mailstore.errors.MailStoreCircuitOpenError):
+        policy.call("host", "GetStores", fail, log)
+    time.sleep(0.06)
+    asyncio.run(main())
+    with pytest.raises(KeyboardInterrupt):
+        policy.call("host", "GetStores", interrupt, log)
+    assert policy.call("host", "GetStores", lambda: "result", log) == "result"
+    assert not policy.breaker("host").isOpen
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the multi-instance methods of mailstore.spe"""
+
+import asyncio
+
+import pytest
+
+import mailstore
+
+
+def testFanOut(newClient):
+    client = newClient(mailstore.spe.Client)
+    results = dict(client.FanOut("GetStores"))
+    assert sorted(results) == ["instance{}".format(i) for i in range(10)]
+    assert all(result.ok and result.result["result"] for result in results.values())
+
+
+def testFanOutWithResultModels(newClient):
+    client = newClient(mailstore.spe.Client, resultModels=True)
+    results = dict(client.FanOut("GetStores"))
+    assert sorted(results) == ["instance{}".format(i) for i in range(10)]
+    assert all(result.ok and result.result["result"][0].name == "Store 1" for result in results.values())
+
+    async def run():
+        async with newClient(mailstore.spe.AsyncClient, resultModels=True) as client:
+            return [instanceID async for instanceID, result in client.FanOut("GetStores")]
+    assert sorted(asyncio.run(run())) == sorted(results)
+
+
+def testFanOutRaisesIfGetInstancesFails(newClient, server, monkeypatch):
+    monkeypatch.setattr(server, "resultGetInstances", lambda arguments: None)
+    client = newClient(mailstore.spe.Client)
+    with pytest.raises(mailstore.errors.MailStoreResponseError):
+        list(client.FanOut("GetStores"))
+
+    async def run():
+        async with newClient(mailstore.spe.AsyncClient) as client:
+            with pytest.raises(mailstore.errors.MailStoreResponseError):
+                async for instanceID, result in client.FanOut("GetStores"):
+                    pass
+    asyncio.run(run())
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of streamed results"""
+
+import asyncio
+import gc
+import io
+import zlib
+
+import pytest
+
+import mailstore
+import mailstore.metrics
+import mockserver
+
+
+def rawDeflate(body, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(body) + compressor.flush()
+
+
+# Content codings sent by the mock server, by test id
+CODINGS = {"gzip": ("gzip", mockserver.COMPRESSORS["gzip"]),
+           "deflate": ("deflate", mockserver.COMPRESSORS["deflate"]),
+           "rawDeflate": ("deflate", rawDeflate)}
+
+
+class BodyResponse():
+    """Transport response of a fixed body."""
+    def __init__(self, body, headers):
+        self.body = io.BytesIO(body)
+        self.headers = headers
+
+    def read(self, amt=None):
+        return self.body.read(amt)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def responses(monkeypatch):
+    """Responses returned by the transports of all clients."""
+    responses = []
+    for transportClass in (mailstore.pool.ConnectionPool, mailstore.aio.AsyncConnectionPool):
+        def wrap(request):
+            if asyncio.iscoroutinefunction(request):
+                async def wrapper(*args, **kwargs):
+                    responses.append(await request(*args, **kwargs))
+                    return responses[-1]
+            else:
+                def wrapper(*args, **kwargs):
+                    responses.append(request(*args, **kwargs))
+                    return responses[-1]
+            return wrapper
+        monkeypatch.setattr(transportClass, "request", wrap(transportClass.request))
+    return responses
+
+
+def testStream(newClient):
+    client = newClient()
+    messages = list(client.GetMessages("user1/Inbox", stream=True))
+    assert messages == client.GetMessages("user1/Inbox")["result"]
+    assert len(messages) == 2000
+
+
+def testClosedStreamReleasesConnection(newClient, responses):
+    metrics = mailstore.metrics.Metrics()
+    client = newClient(hooks=[metrics])
+    messages = client.GetMessages("user1/Inbox", stream=True)
+    next(messages)
+    messages.close()
+    unstarted = client.GetMessages("user1/Inbox", stream=True)
+    del unstarted
+    gc.collect()
+    assert all(response.connection is None for response in responses)
+    snapshot = metrics.snapshot()["GetMessages"]
+    assert (snapshot["calls"], snapshot["cancelled"], snapshot["inFlight"], snapshot["errors"]) == (2, 2, 0, {})
+
+
+def testAsyncClosedStreamReleasesConnection(newClient, responses):
+    metrics = mailstore.metrics.Metrics()
+
+    async def run():
+        async with newClient(mailstore.server.AsyncClient, hooks=[metrics]) as client:
+            messages = await client.GetMessages("user1/Inbox", stream=True)
+            await messages.__anext__()
+            await messages.aclose()
+            assert len([message async for message in await client.GetMessages("user1/Inbox", stream=True)]) == 2000
+    asyncio.run(run())
+    assert all(response.connection is None for response in responses)
+    snapshot = metrics.snapshot()["GetMessages"]
+    assert (snapshot["calls"], snapshot["cancelled"], snapshot["inFlight"], snapshot["errors"]) == (2, 1, 0, {})
+
+
+def testStreamedAPIError(newClient, server, monkeypatch, capsys):
+    monkeypatch.setattr(server, "invoke", lambda method, arguments: {"error": {"message": "Folder not found"},
+                                                                      "token": None, "statusCode": "failed",
+                                                                      "result": None})
+    client = newClient()
+    with pytest.raises(mailstore.errors.MailStoreResponseError) as excinfo:
+        list(client.GetMessages("missing", stream=True))
+    assert "Folder not found" in str(excinfo.value)
+    assert capsys.readouterr().out == ""
+
+
+@pytest.mark.parametrize("coding", CODINGS)
+@pytest.mark.parametrize("asynchronous", [False, True], ids=["sync", "async"])
+def testCompressedStream(newClient, server, monkeypatch, coding, asynchronous):
+    monkeypatch.setattr(mockserver, "COMPRESSORS", dict([CODINGS[coding]]))
+
+    async def fetchAsync(client):
+        async with client:
+            return [message async for message in await client.GetMessages("user1/Inbox", stream=True)]
+
+    def fetch():
+        metrics = mailstore.metrics.Metrics()
+        if asynchronous:
+            messages = asyncio.run(fetchAsync(newClient(mailstore.server.AsyncClient, hooks=[metrics])))
+        else:
+            messages = list(newClient(hooks=[metrics]).GetMessages("user1/Inbox", stream=True))
+        return messages, metrics.snapshot()["GetMessages"]["bytesReceived"]
+
+    messages, compressedSize = fetch()
+    server.compression = False
+    expected, size = fetch()
+    assert messages == expected
+    assert len(messages) == 2000
+    assert 0 < compressedSize * 5 < size
+
+
+@pytest.mark.parametrize("coding", CODINGS)
+def testDecodedResponseSmallReads(coding):
+    name, compress = CODINGS[coding]
+    body = b"".join(b"line %d\n" % i for i in range(10000))
+    compressed = compress(body, 6)
+    response = mailstore.transport.decodeResponse(BodyResponse(compressed, {"Content-Encoding": name}))
+    parts = list(iter(lambda: response.read(7), b""))
+    assert b"".join(parts) == body
+    assert max(len(part) for part in parts) == 7
+    assert response.rawBytes == len(compressed)
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of mailstore.tasks"""
+
+import concurrent.futures
+
+import pytest
+
+import mailstore
+import mailstore.tasks
+
+
+def testWaitAll(newClient):
+    client = newClient()
+    with mailstore.tasks.TaskManager(client) as tasks:
+        for store in range(3):
+            tasks.add(client.VerifyStore(store, autoHandleToken=False), name=store)
+        results = tasks.waitAll(timeout=10)
+    assert [result["statusCode"] for result in results] == ["succeeded"] * 3
+
+
+@pytest.mark.parametrize("wait", [True, False])
+def testShutdownCancelsRunningTasks(newClient, server, wait):
+    server.taskDuration = 5
+    client = newClient()
+    tasks = mailstore.tasks.TaskManager(client)
+    task = tasks.add(client.VerifyStore(1, autoHandleToken=False))
+    tasks.shutdown(wait=wait)
+    with pytest.raises(concurrent.futures.CancelledError):
+        tasks.waitAll(timeout=10)
+    assert task.future.cancelled()
+    assert list(tasks.asCompleted(timeout=10)) == [task]
+
+
+def testRunningResponseWithoutTokenIsNotAdded(newClient):
+    client = newClient()
+    with mailstore.tasks.TaskManager(client) as tasks:
+        task = tasks.add(client.VerifyStore(1, autoHandleToken=False))
+        with pytest.raises(mailstore.errors.MailStoreNoTokenError):
+            tasks.add({"error": None, "token": None, "statusCode": "running", "statusVersion": 0, "result": None})
+        assert tasks.tasks == [task]
+        assert [result["statusCode"] for result in tasks.waitAll(timeout=10)] == ["succeeded"]
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the TLS settings of transports passed to the clients"""
+
+import asyncio
+import ssl
+
+import pytest
+
+import mailstore
+import mockserver
+
+
+def mockThumbprint():
+    with open(mockserver.CERT_FILE) as f:
+        return mailstore.tls.certificateThumbprint(ssl.PEM_cert_to_DER_cert(f.read()))
+
+
+class CustomTransport(mailstore.transport.Transport):
+    pass
+
+
+def testTransportUsesTheClientsContext(newClient):
+    transport = mailstore.pool.ConnectionPool()
+    client = newClient(transport=transport)
+    assert transport.sslContext is client.sslContext
+    assert client.GetServerInfo()["error"] is None
+
+
+def testAsyncTransportUsesTheClientsContext(newClient):
+    async def main():
+        transport = mailstore.aio.AsyncConnectionPool()
+        async with newClient(mailstore.server.AsyncClient, transport=transport) as client:
+            assert transport.sslContext is client.sslContext
+            assert (await client.GetServerInfo())["error"] is None
+    asyncio.run(main())
+
+
+def testTransportWithOtherContextIsRejected(newClient):
+    transport = mailstore.pool.ConnectionPool(sslContext=ssl.create_default_context())
+    with pytest.raises(ValueError):
+        newClient(transport=transport)
+    assert newClient(transport=transport, caFile=None).transport is transport
+
+
+@pytest.mark.parametrize("transport", [CustomTransport(), mailstore.pool.ConnectionPool()])
+def testUnenforcedThumbprintIsRejected(newClient, transport):
+    with pytest.raises(ValueError):
+        newClient(transport=transport, caFile=None, thumbprint=mockThumbprint())
+
+
+def testPinningTransport(newClient):
+    thumbprint = mockThumbprint()
+    transport = mailstore.pool.ConnectionPool(thumbprint=thumbprint.upper())
+    client = newClient(transport=transport, caFile=None, thumbprint=thumbprint)
+    assert client.GetServerInfo()["error"] is None
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2012, 2013, 2014 MailStore Software GmbH
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+__doc__ = """Tests of the incremental GetWorkerResults synchronization"""
+
+import datetime
+
+import pytest
+
+import mailstore
+import mailstore.workersync
+
+
+def testSyncUntilNowInUTC(server, newClient, tmp_path, monkeypatch):
+    calls = []
+    resultGetWorkerResults = server.resultGetWorkerResults
+    monkeypatch.setattr(server, "resultGetWorkerResults", lambda arguments: calls.append(arguments) or resultGetWorkerResults(arguments))
+
+    with mailstore.workersync.WorkerResultSync(newClient(), str(tmp_path / "sync.db"), chunkSize=datetime.timedelta(days=30)) as sync:
+        results = list(sync.sync())
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        assert results
+        assert {arguments["timeZoneID"] for arguments in calls} == {"UTC"}
+        assert abs(sync.watermark - now) < datetime.timedelta(minutes=1)
+        assert list(sync.sync()) == []
+
+
+def testSyncInOtherTimeZoneRequiresUntil(newClient, tmp_path):
+    with mailstore.workersync.WorkerResultSync(newClient(), str(tmp_path / "sync.db"), timeZoneID="$Local") as sync:
+        with pytest.raises(ValueError):
+            next(sync.sync())
+        assert list(sync.sync(until="2020-01-02T00:00:00"))
+        assert sync.watermark == datetime.datetime(2020, 1, 2)